@@ -0,0 +1,105 @@
+"""
+Benchmark of call number normalization in lpa_reclass_utils.
+
+Runs the call number analysis `lpa_reclass.reclass` performs for a
+synthetic bib with 500 attached items, once with the previous regex based
+`normalize_callnumber` and once with the current translation table based
+one. The cache is cleared before each bib so that only repeated
+normalization within a single bib is counted.
+
+To run it, from the root of the repository enter:
+$ python -m benchmarks.bench_callnumbers
+"""
+
+import logging
+import re
+import timeit
+
+from src import lpa_reclass_utils
+from src.lpa_reclass_utils import (
+    analyze_items,
+    cleanup_bib_varFields,
+    normalize_callnumber,
+)
+
+
+def legacy_normalize_callnumber(value: str) -> str:
+    norm_value = re.sub(r'\.|,|\(|\)|"|-', "", value).strip()
+    return norm_value
+
+
+def callnumber_field(fieldTag: str, value: str) -> dict:
+    return {
+        "fieldTag": fieldTag,
+        "marcTag": "852",
+        "ind1": "8",
+        "ind2": " ",
+        "subfields": [{"tag": "h", "content": value}],
+    }
+
+
+def synthetic_bib(items_count: int = 500) -> tuple[list[dict], list[dict]]:
+    """
+    Returns bib varFields and items of a score set with a handful of
+    call numbers shared by many volumes
+    """
+    items = []
+    for n in range(items_count):
+        location = "pam11" if n % 3 else "rcmb8"
+        callnumber = f"*MUS (Beethoven, L. v. Works. 1862) v. {n % 40}"
+        items.append(
+            {
+                "id": f"{10000000 + n}",
+                "location": {"code": location},
+                "varFields": [
+                    {"fieldTag": "b", "content": f"33433{n:09}"},
+                    callnumber_field("c", callnumber),
+                ],
+            }
+        )
+    bib_varFields = [
+        callnumber_field("q", f"*MUS (Beethoven, L. v. Works. 1862) v. {n}")
+        for n in range(40)
+    ]
+    return bib_varFields, items
+
+
+def analyze(bib_varFields: list[dict], items: list[dict]) -> list[dict]:
+    summary = analyze_items(items)
+    return cleanup_bib_varFields(
+        bib_varFields, summary.callnumbers4del, summary.other_callnumbers
+    )
+
+
+def per_bib(bib_varFields: list[dict], items: list[dict], number: int) -> float:
+    """
+    Returns average time per bib in milliseconds
+    """
+
+    def run_bib():
+        normalize_callnumber.cache_clear()
+        analyze(bib_varFields, items)
+
+    return timeit.timeit(run_bib, number=number) / number * 1_000
+
+
+def run(number: int = 50) -> None:
+    logging.disable(logging.DEBUG)
+    bib_varFields, items = synthetic_bib()
+    current_result = analyze(bib_varFields, items)
+
+    lpa_reclass_utils.normalize_callnumber = legacy_normalize_callnumber
+    try:
+        assert analyze(bib_varFields, items) == current_result
+        legacy = per_bib(bib_varFields, items, number)
+    finally:
+        lpa_reclass_utils.normalize_callnumber = normalize_callnumber
+    current = per_bib(bib_varFields, items, number)
+
+    print(f"legacy:  {legacy:.2f} ms/bib")
+    print(f"current: {current:.2f} ms/bib")
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    run()
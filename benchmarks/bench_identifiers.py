@@ -0,0 +1,161 @@
+"""
+Benchmark of identifier extraction with `src.utils.FieldIndex`.
+
+Extracts identifiers from 100,000 synthetic Sierra bibs the way
+`enhance_bib.parse_identifiers` and `song_index.parse4query` do, once
+with lookups that scan the record for every tag and once with a
+`FieldIndex` built in a single pass per record. Each bib has a few dozen
+fields, similar to score records with a song index.
+
+To run it, from the root of the repository enter:
+$ python -m benchmarks.bench_identifiers
+"""
+
+import time
+
+from pymarc import Field, Record, Subfield
+
+from src.enhance_bib import parse_identifiers
+from src.song_index import (
+    get_isbns,
+    get_lccn,
+    get_oclc_no,
+    get_publisher_nos,
+    get_standard_nos,
+)
+from src.utils import FieldIndex
+
+
+def subfields(*pairs: str) -> list[Subfield]:
+    return [Subfield(code, value) for code, value in zip(pairs[::2], pairs[1::2])]
+
+
+def synthetic_bib(n: int) -> Record:
+    bib = Record()
+    bib.add_field(Field(tag="001", data=f"ocm{n:08}"))
+    bib.add_field(Field(tag="003", data="OCoLC"))
+    bib.add_field(Field(tag="008", data="120827t20122004nyua          000 0 eng d"))
+    bib.add_field(
+        Field(tag="010", indicators=[" ", " "], subfields=subfields("a", f" {n}"))
+    )
+    for i in range(2):
+        bib.add_field(
+            Field(
+                tag="020",
+                indicators=[" ", " "],
+                subfields=subfields("a", f"978{n:09}{i} (pbk.)"),
+            )
+        )
+    bib.add_field(
+        Field(tag="024", indicators=["1", " "], subfields=subfields("a", f"8{n:011}"))
+    )
+    bib.add_field(
+        Field(tag="028", indicators=["3", "2"], subfields=subfields("a", f"ED {n}"))
+    )
+    bib.add_field(
+        Field(tag="035", indicators=[" ", " "], subfields=subfields("a", f"(OCoLC){n}"))
+    )
+    bib.add_field(
+        Field(
+            tag="100",
+            indicators=["1", " "],
+            subfields=subfields("a", "Composer, A.,", "e", "composer."),
+        )
+    )
+    bib.add_field(
+        Field(
+            tag="245",
+            indicators=["1", "4"],
+            subfields=subfields("a", f"The songs {n} /", "c", "A. Composer."),
+        )
+    )
+    for i in range(20):
+        bib.add_field(
+            Field(
+                tag="505",
+                indicators=["0", "0"],
+                subfields=subfields("t", f"Song {i} --"),
+            )
+        )
+    for i in range(5):
+        bib.add_field(
+            Field(
+                tag="650",
+                indicators=[" ", "0"],
+                subfields=subfields("a", f"Songs {i}."),
+            )
+        )
+    bib.add_field(
+        Field(tag="907", indicators=[" ", " "], subfields=subfields("a", f".b{n}x"))
+    )
+    bib.add_field(
+        Field(tag="998", indicators=[" ", " "], subfields=subfields("d", "c", "e", "-"))
+    )
+    return bib
+
+
+def legacy_parse_identifiers(bib: Record) -> tuple:
+    bib_no = bib["907"]["a"][1:]
+    control_no = bib["001"].data.strip() if "001" in bib else None
+    lc_no = bib["010"].value().strip() if "010" in bib else None
+    author = bib.author
+    t245 = bib["245"]
+    title = t245["a"][int(t245.indicator2) :].strip()
+    pubyear = bib["008"].data[7:10] if "008" in bib else None
+    bib_format = bib["998"]["d"][0]
+    opac = bib["998"]["e"]
+    return (bib_no, control_no, lc_no, author, title, pubyear, bib_format, opac)
+
+
+def legacy_query_data(bib: Record) -> tuple:
+    oclc_no = None
+    if "003" in bib and "OCoLC" in bib["003"].data:
+        oclc_no = bib["001"].data.replace("ocm", "").strip()
+    lccn = bib["010"]["a"].strip() if "010" in bib else None
+    isbns = [f["a"].strip().split(" ")[0] for f in bib.get_fields("020") if "a" in f]
+    standard_nos = [f["a"].strip() for f in bib.get_fields("024") if "a" in f]
+    publisher_nos = [f["a"].strip() for f in bib.get_fields("028") if "a" in f]
+    return (oclc_no, lccn, isbns, standard_nos, publisher_nos)
+
+
+def legacy(bib: Record) -> tuple:
+    return legacy_parse_identifiers(bib), legacy_query_data(bib)
+
+
+def current(bib: Record) -> tuple:
+    fields = FieldIndex(bib)
+    query_data = (
+        get_oclc_no(bib, fields),
+        get_lccn(bib, fields),
+        get_isbns(bib, fields),
+        get_standard_nos(bib, fields),
+        get_publisher_nos(bib, fields),
+    )
+    return parse_identifiers(bib, fields), query_data
+
+
+def per_record(extract, bibs: list[Record]) -> float:
+    """
+    Returns average time per record in microseconds
+    """
+    start = time.perf_counter()
+    for bib in bibs:
+        extract(bib)
+    return (time.perf_counter() - start) / len(bibs) * 1_000_000
+
+
+def run(count: int = 100_000) -> None:
+    bibs = [synthetic_bib(n) for n in range(count)]
+    assert all(legacy(bib) == current(bib) for bib in bibs[:100])
+
+    legacy_time = per_record(legacy, bibs)
+    current_time = per_record(current, bibs)
+
+    print(f"{count} records, {len(bibs[0].fields)} fields each")
+    print(f"legacy:  {legacy_time:.2f} us/record")
+    print(f"current: {current_time:.2f} us/record")
+    print(f"speedup: {legacy_time / current_time:.2f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,82 @@
+"""
+Microbenchmark of maps_crosswalk subject parsing.
+
+Compares the current `construct_subject_subfields` with the previous
+implementation that compiled its patterns on every call and stripped
+trailing punctuation one character at a time.
+
+To run it, from the root of the repository enter:
+$ python -m benchmarks.bench_maps_subjects
+"""
+
+import re
+import timeit
+import warnings
+
+from src.maps_crosswalk import SuspiciousDataWarning, construct_subject_subfields
+
+SUBJECTS = [
+    "United States -- Maps",
+    "Minnesota - Maps",
+    "New Hampshire --Maps",
+    "Chicago (Ill.) - Guidebooks",
+    "Klondike River Valley (Yukon) - Gold discoveries - Maps.",
+    "United States -- History -- Civil War, 1861-1865 -- Maps.",
+    "Mount Auburn Cemetery (Cambridge, Mass.) -- Maps",
+    "Europe -- Boundaries -- Maps ;. ",
+    "United States",
+]
+
+
+def legacy_construct_subject_subfields(s):
+    m = re.compile(r".*\S\-\S.*").match(s)
+    if m and "--" not in s:
+        warnings.warn(f"{s}", SuspiciousDataWarning)
+    s, n = re.subn(r"\s-{1,}|-{1,}\s|-{2,}", "@", s)
+    elems = [e.strip() for e in s.split("@")]
+
+    def norm_last_subfield(sub):
+        while re.compile(r".*[\s.,;]$").match(sub):
+            sub = sub[:-1]
+        return f"{sub}."
+
+    subA = elems[0]
+    subV = elems[-1]
+    if len(elems) == 1:
+        subA = norm_last_subfield(subA)
+    subV = norm_last_subfield(subV)
+    subfields = ["a", subA]
+    for sub in elems[1:-1]:
+        if any(k in sub.lower() for k in ["history", "discoveries"]):
+            subfields.extend(["x", sub])
+        elif any(k in sub.lower() for k in ["war"]):
+            subfields.extend(["y", sub])
+        else:
+            subfields.extend(["z", sub])
+    if len(elems) > 1:
+        subfields.extend(["v", f"{subV}"])
+    return subfields
+
+
+def per_subject(func, number: int) -> float:
+    """
+    Returns average time per subject in microseconds
+    """
+    elapsed = timeit.timeit(lambda: [func(s) for s in SUBJECTS], number=number)
+    return elapsed / (number * len(SUBJECTS)) * 1_000_000
+
+
+def run(number: int = 20_000) -> None:
+    warnings.simplefilter("ignore", SuspiciousDataWarning)
+    for s in SUBJECTS:
+        assert construct_subject_subfields(s) == legacy_construct_subject_subfields(s)
+
+    legacy = per_subject(legacy_construct_subject_subfields, number)
+    current = per_subject(construct_subject_subfields, number)
+    print(f"legacy:  {legacy:.2f} us/subject")
+    print(f"current: {current:.2f} us/subject")
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    run()
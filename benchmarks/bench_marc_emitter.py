@@ -0,0 +1,76 @@
+"""
+Benchmark of MARC21 serialization of generated map records.
+
+Compares building a `pymarc.Record` and calling `as_marc()` with
+encoding the same fields straight into `utils.RawMarcBuilder`, which
+does not create `pymarc.Field` objects. Reports the best of several
+repeats, as `timeit` does.
+
+To run it, from the root of the repository enter:
+$ python -m benchmarks.bench_marc_emitter
+"""
+
+import time
+import warnings
+
+from src.maps_crosswalk import (
+    BatchContext,
+    MapData,
+    SuspiciousDataWarning,
+    make_bib,
+    make_bib_marc,
+)
+
+
+ROW = MapData(
+    barcode="33433000000001",
+    t100="Bartholomew, J. G. (John George), 1860-1920",
+    t110="",
+    t245="Map of the United States",
+    t246="United States",
+    t250="2nd ed.",
+    t255="1:800,000",
+    t260="[186-]",
+    t490="Folded maps",
+    t500="Folded",
+    t505="",
+    t600="",
+    t610="",
+    t611="",
+    t650="Railroads -- United States -- Maps",
+    t651="United States -- History -- Civil War, 1861-1865 -- Maps; Ohio -- Maps",
+    t655="Maps",
+    t852="Map Div. 21-12345",
+)
+
+
+def per_record(func, number: int, repeat: int) -> float:
+    """
+    Returns best average time per record in microseconds
+    """
+    batch = BatchContext()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for n in range(number):
+            func(ROW, f"{n:08}", batch)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / number * 1_000_000
+
+
+def run(number: int = 20_000, repeat: int = 5) -> None:
+    warnings.simplefilter("ignore", SuspiciousDataWarning)
+    batch = BatchContext()
+    assert make_bib_marc(ROW, "00000001", batch) == (
+        make_bib(ROW, "00000001", batch).as_marc()
+    )
+
+    pymarc_path = per_record(lambda *args: make_bib(*args).as_marc(), number, repeat)
+    raw_path = per_record(make_bib_marc, number, repeat)
+    print(f"pymarc Record.as_marc: {pymarc_path:.2f} us/record")
+    print(f"RawMarcBuilder:        {raw_path:.2f} us/record")
+    print(f"speedup: {pymarc_path / raw_path:.2f}x")
+
+
+if __name__ == "__main__":
+    run()
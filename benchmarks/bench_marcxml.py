@@ -0,0 +1,134 @@
+"""
+Benchmark of MARCXML decoding with `src.marcxml` against pymarc.
+
+Decodes synthetic Worldcat style records two ways: one response per
+record, as `enhance_bib.get_full_bib` does, and one large collection, as
+`as2worldcat.xml2marc` does. Each is run with `pymarc.parse_xml_to_array`
+and with the streaming `iter_marcxml`. Reports CPU time per record and
+peak memory traced while decoding. Records are consumed as they are
+decoded and not kept.
+
+To run it, from the root of the repository enter:
+$ python -m benchmarks.bench_marcxml
+"""
+
+from io import BytesIO
+import time
+import tracemalloc
+from typing import Callable, Iterable
+
+from pymarc import Field, Record, Subfield, parse_xml_to_array, record_to_xml
+
+from src.marcxml import iter_marcxml
+
+
+def synthetic_record(n: int) -> Record:
+    record = Record()
+    record.add_field(Field(tag="001", data=f"ocm{n:08}"))
+    record.add_field(Field(tag="008", data="120827t20122004nyua          000 0 eng d"))
+    record.add_field(
+        Field(
+            tag="020",
+            indicators=[" ", " "],
+            subfields=[Subfield("a", f"978{n:010}")],
+        )
+    )
+    record.add_field(
+        Field(
+            tag="245",
+            indicators=["1", "0"],
+            subfields=[
+                Subfield("a", f"Synthetic title {n} :"),
+                Subfield("b", "a subtitle /"),
+                Subfield("c", "by An Author."),
+            ],
+        )
+    )
+    for i in range(20):
+        record.add_field(
+            Field(
+                tag="505",
+                indicators=["0", "0"],
+                subfields=[Subfield("t", f"Song {i} --"), Subfield("r", "Composer.")],
+            )
+        )
+    for i in range(5):
+        record.add_field(
+            Field(
+                tag="650",
+                indicators=[" ", "0"],
+                subfields=[Subfield("a", f"Subject {i}"), Subfield("v", "Scores.")],
+            )
+        )
+    return record
+
+
+def responses(count: int) -> list[bytes]:
+    return [
+        b"<?xml version='1.0' encoding='UTF-8'?>\n"
+        + record_to_xml(synthetic_record(n), namespace=True)
+        for n in range(count)
+    ]
+
+
+def collection(count: int) -> bytes:
+    records = b"".join(
+        record_to_xml(synthetic_record(n), namespace=False) for n in range(count)
+    )
+    return (
+        b"<?xml version='1.0' encoding='UTF-8'?>\n"
+        b'<collection xmlns="http://www.loc.gov/MARC21/slim">'
+        + records
+        + b"</collection>"
+    )
+
+
+def measure(decode: Callable[[], Iterable[Record]]) -> tuple[int, float, int]:
+    """
+    Returns number of records, CPU seconds, and peak traced memory in bytes
+    """
+    start = time.process_time()
+    count = sum(1 for _ in decode())
+    cpu = time.process_time() - start
+
+    tracemalloc.start()
+    sum(1 for _ in decode())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, cpu, peak
+
+
+def report(label: str, count: int, cpu: float, peak: int) -> None:
+    print(
+        f"{label:<28} {cpu / count * 1_000_000:8.1f} us/record "
+        f"{peak / 1024:10.1f} KiB peak"
+    )
+
+
+def run(count: int = 5_000) -> None:
+    single = responses(count)
+    document = collection(count)
+
+    print(f"{count} single record responses")
+    report(
+        "  parse_xml_to_array",
+        *measure(lambda: (parse_xml_to_array(BytesIO(r))[0] for r in single)),
+    )
+    report(
+        "  iter_marcxml",
+        *measure(lambda: (next(iter_marcxml(r)) for r in single)),
+    )
+
+    print(f"collection of {count} records ({len(document) / 1024:.0f} KiB)")
+    report(
+        "  parse_xml_to_array",
+        *measure(lambda: parse_xml_to_array(BytesIO(document))),
+    )
+    report(
+        "  iter_marcxml",
+        *measure(lambda: iter_marcxml(BytesIO(document))),
+    )
+
+
+if __name__ == "__main__":
+    run()
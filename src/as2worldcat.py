@@ -34,10 +34,17 @@ import os
 import json
 
 from pymarc import Field, MARCReader, Record
-from pymarc.marcxml import record_to_xml, parse_xml_to_array
+from pymarc.marcxml import record_to_xml
 
 from bookops_worldcat import WorldcatAccessToken, MetadataSession
 
+try:
+    from .marcxml import iter_marcxml
+    from .rate_limit import WORLDCAT_RATE, RateLimiter
+except ImportError:
+    from marcxml import iter_marcxml
+    from rate_limit import WORLDCAT_RATE, RateLimiter
+
 
 def marc2xml(marcfile: str):
     with open(marcfile, "rb") as file:
@@ -50,12 +57,9 @@ def marc2xml(marcfile: str):
 def xml2marc(xmlfile: str) -> Record:
     """
     Serializes MARC XML to pymarc `Record` object
-    for manipulation
+    for manipulation. Records are decoded one at a time.
     """
-    with open(xmlfile, "r", encoding="utf-8") as f:
-        reader = parse_xml_to_array(f)
-        for record in reader:
-            yield record
+    yield from iter_marcxml(xmlfile)
 
 
 def has_invalid_subfields(subfields):
@@ -177,6 +181,7 @@ if __name__ == "__main__":
 
     token = get_token()
     with MetadataSession(authorization=token, timeout=10) as session:
+        RateLimiter(WORLDCAT_RATE).attach(session)
         reader = marc2xml(marcfile)
         for record in reader:
             result = session.create_bib(inst="13437", instSymbol="BKL", xmldata=record)
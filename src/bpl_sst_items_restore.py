@@ -10,7 +10,7 @@ from collections import namedtuple
 from pymarc import Record, Field
 
 
-from utils import save2csv, save2marc
+from utils import MarcWriter, save2csv
 
 
 Item = namedtuple(
@@ -111,12 +111,13 @@ if __name__ == "__main__":
     out = "src/files/SST/SST-355-399-230424.mrc"
 
     items = parse_items(src)
-    for i in items:
-        bib = create_bib(i)
-        try:
-            save2marc(out, bib)
-        except UnicodeEncodeError:
-            print(i.barcode)
+    with MarcWriter(out) as writer:
+        for i in items:
+            bib = create_bib(i)
+            try:
+                writer.write(bib)
+            except UnicodeEncodeError:
+                print(i.barcode)
 
     # out = "src/files/SST/bibNos.csv"
     # get_bibNos(src, out)
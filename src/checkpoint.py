@@ -0,0 +1,96 @@
+"""
+Append-only checkpoint journal used to resume long running jobs.
+"""
+
+import os
+import threading
+from typing import Iterator, Optional
+
+
+class CheckpointJournal:
+    """
+    Journal of completed work. Each entry is a tab separated line with the
+    entry kind, its key, and optional values. Entries are flushed and
+    fsync'd before `record` returns, so they survive a crash of the process
+    or the machine. A partially written last line is dropped when the
+    journal is resumed. An existing journal is never truncated; opening a
+    non-empty journal without `resume` raises `FileExistsError`.
+
+    Args:
+        fh:                     path to journal file
+        resume:                 keep entries of previous runs, otherwise
+                                the journal must be new or empty
+    """
+
+    def __init__(self, fh: str, resume: bool = False) -> None:
+        self.fh = fh
+        self._entries: dict[tuple[str, str], list[str]] = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(fh):
+            self.truncate_partial_entry(fh)
+            for kind, key, *values in self.read(fh):
+                self._entries[(kind, key)] = values
+        elif os.path.exists(fh) and os.path.getsize(fh) > 0:
+            raise FileExistsError(
+                f"Journal {fh} of a previous run exists. Resume the run "
+                "or remove the journal to start over."
+            )
+        self._file = open(fh, "a", encoding="utf-8")
+
+    def __enter__(self) -> "CheckpointJournal":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def read(fh: str) -> Iterator[list[str]]:
+        """
+        Yields complete entries of a journal file
+        """
+        with open(fh, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield line[:-1].split("\t")
+
+    @staticmethod
+    def truncate_partial_entry(fh: str) -> None:
+        """
+        Removes an incomplete last line left by an interrupted write
+        """
+        with open(fh, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def done(self, kind: str, key: str) -> bool:
+        return (kind, key) in self._entries
+
+    def get(self, kind: str, key: str) -> Optional[list[str]]:
+        """
+        Returns values of an entry or None if not recorded
+        """
+        return self._entries.get((kind, key))
+
+    def record(self, kind: str, key: str, *values: str) -> None:
+        """
+        Durably appends an entry to the journal
+
+        Args:
+            kind:                   entry kind, for example "bib" or "item"
+            key:                    entry key unique within its kind
+            values:                 additional values of the entry, must not
+                                    include tabs or new lines
+        """
+        line = "\t".join([kind, key, *values])
+        with self._lock:
+            self._file.write(f"{line}\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._entries[(kind, key)] = list(values)
+
+    def close(self) -> None:
+        self._file.close()
@@ -1,14 +1,44 @@
 """
 A set of scripts to be used to enahance records exported from Sierra with data from Worldcat
 """
-from io import BytesIO
+import argparse
+from collections import Counter, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
 import logging
 import os
-import sys
+from typing import Iterable, Optional, Union
 
 from bookops_worldcat import WorldcatAccessToken, MetadataSession
-from pymarc import Field, Record, MARCReader, parse_xml_to_array
+from pymarc import Field, Record, MARCReader, Subfield
+
+try:
+    from .marcxml import iter_marcxml
+    from .rate_limit import WORLDCAT_RATE, RateLimiter
+    from .utils import FieldIndex, MarcRouter, add_ordered_fields
+    from .worldcat_cache import (
+        CACHE_FH,
+        CachedMetadataSession,
+        CacheMiss,
+        WorldcatCache,
+    )
+except ImportError:
+    from marcxml import iter_marcxml
+    from rate_limit import WORLDCAT_RATE, RateLimiter
+    from utils import FieldIndex, MarcRouter, add_ordered_fields
+    from worldcat_cache import (
+        CACHE_FH,
+        CachedMetadataSession,
+        CacheMiss,
+        WorldcatCache,
+    )
+
+
+BibOutcome = namedtuple(
+    "BibOutcome",
+    ["bib", "worldcat_bib", "has_oclc_no", "has_lc_no", "brief_avoided"],
+    defaults=[False],
+)
 
 
 def get_creds(creds_fh):
@@ -38,30 +68,35 @@ def is_oclc_no(value: str) -> bool:
             return True
 
 
-def parse_identifiers(bib: Record):
-    bib_no = bib["907"]["a"][1:]
-    if "001" in bib:
-        control_no = bib["001"].data.strip()
+def parse_identifiers(bib: Record, fields: Optional[FieldIndex] = None):
+    if fields is None:
+        fields = FieldIndex(bib)
+
+    bib_no = fields["907"]["a"][1:]
+    if "001" in fields:
+        control_no = fields["001"].data.strip()
     else:
         control_no = None
-    if "010" in bib:
-        lc_no = bib["010"].value().strip()
+    if "010" in fields:
+        lc_no = fields["010"].value().strip()
     else:
         lc_no = None
 
-    author = bib.author()
+    author_field = fields.get("100") or fields.get("110") or fields.get("111")
+    author = author_field.format_field() if author_field else None
 
-    t245 = bib["245"]
+    t245 = fields["245"]
     start = int(t245.indicator2)
     title = t245["a"][start:].strip()
 
-    if "008" in bib:
-        pubyear = bib["008"][7:10]
+    if "008" in fields:
+        pubyear = fields["008"].data[7:10]
     else:
         pubyear = None
 
-    bib_format = bib["998"]["d"][0]
-    opac = bib["998"]["e"]
+    t998 = fields["998"]
+    bib_format = t998["d"][0]
+    opac = t998["e"]
 
     return (bib_no, control_no, lc_no, author, title, pubyear, bib_format, opac)
 
@@ -82,10 +117,32 @@ def get_current_oclc_no(response):
     return response["oclcNumber"]
 
 
+def norm_oclc_no(value: str) -> str:
+    return value.strip().lstrip("ocmn").lstrip("0")
+
+
+def bib_has_isbn(bib: Record) -> bool:
+    """
+    Checks full Worldcat bib the same way `response_has_isbn` checks
+    brief bib response
+    """
+    for field in bib.get_fields("020"):
+        if field.get("a"):
+            return True
+    return False
+
+
+def get_bib_oclc_no(bib: Record) -> str:
+    """
+    Returns current oclc # of full Worldcat bib. Worldcat returns the
+    current record for merged oclc #s, which are listed in its 019 tag.
+    """
+    return norm_oclc_no(bib["001"].data)
+
+
 def get_full_bib(session, oclc_no):
     response = session.get_full_bib(oclc_no)
-    data = BytesIO(response.content)
-    bib = parse_xml_to_array(data)[0]
+    bib = next(iter_marcxml(response.content))
     return bib
 
 
@@ -97,7 +154,7 @@ def save2marc(bib, out):
 def prepare_bib(bib, bib_no, bib_format_code, opac):
 
     # remove unsupported subject terms
-    subjects = bib.subjects()
+    subjects = bib.subjects
     for field in subjects:
         if field.tag.startswith("69"):
             bib.remove_field(field)
@@ -110,14 +167,16 @@ def prepare_bib(bib, bib_no, bib_format_code, opac):
             else:
                 bib.remove_field(field)
 
+    new_fields = []
+
     # add bib # matchopoint
-    bib.add_ordered_field(
-        Field(tag="907", indicators=[" ", " "], subfields=["a", f".{bib_no}"])
+    new_fields.append(
+        Field(tag="907", indicators=[" ", " "], subfields=[Subfield("a", f".{bib_no}")])
     )
 
     # add initiatls
-    bib.add_ordered_field(
-        Field(tag="947", indicators=[" ", " "], subfields=["a", "tak/bot"])
+    new_fields.append(
+        Field(tag="947", indicators=[" ", " "], subfields=[Subfield("a", "tak/bot")])
     )
 
     # add command tag
@@ -126,18 +185,141 @@ def prepare_bib(bib, bib_no, bib_format_code, opac):
     if opac != "-":
         commands.append(f"b3={opac}")
     command_str = ";".join(commands)
-    bib.add_ordered_field(
-        Field(tag="949", indicators=[" ", " "], subfields=["a", f"*{command_str};"])
+    new_fields.append(
+        Field(
+            tag="949",
+            indicators=[" ", " "],
+            subfields=[Subfield("a", f"*{command_str};")],
+        )
     )
 
+    add_ordered_fields(bib, new_fields)
 
-def enhance(marc_fh: str) -> None:
+
+def enhance_record(
+    session: Union[MetadataSession, CachedMetadataSession],
+    bib: Record,
+    full_only: bool = False,
+) -> BibOutcome:
     """
-    Use to launch enhancing process
+    Looks up Sierra bib in Worldcat and prepares matching Worldcat record
+    for import. Safe to run concurrently for different bibs. In offline
+    mode bibs with responses missing from the cache are not enhanced.
+
+    Args:
+        session:                session instance shared by workers
+        bib:                    Sierra bib as `pymarc.Record`
+        full_only:              skip brief bib lookup and check ISBN and
+                                current oclc # in the full bib instead
+
+    Returns:
+        `BibOutcome` with prepared Worldcat record or None if not enhanced
     """
-    # out files
-    enhanced_fh = f"{marc_fh[:-4]}-ENHANCED.mrc"
-    skipped_fh = f"{marc_fh[:-4]}-SKIPPED.mrc"
+    (
+        bib_no,
+        control_no,
+        lc_no,
+        author,
+        title,
+        pubyear,
+        bib_format,
+        opac,
+    ) = parse_identifiers(bib)
+    logging.debug(f"{bib_no}=cn:{control_no}, ln:{lc_no}")
+
+    worldcat_bib = None
+    brief_avoided = False
+    has_oclc_no = is_oclc_no(control_no)
+    if has_oclc_no and full_only:
+        try:
+            worldcat_bib = get_full_bib(session, control_no)
+        except CacheMiss as exc:
+            logging.warning(f"{bib_no}: {exc}")
+        else:
+            brief_avoided = True
+            oclc_no = get_bib_oclc_no(worldcat_bib)
+            if oclc_no != norm_oclc_no(control_no):
+                logging.debug(f"{bib_no}={control_no} merged into {oclc_no}")
+            if bib_has_isbn(worldcat_bib):
+                prepare_bib(worldcat_bib, bib_no, bib_format, opac)
+            else:
+                worldcat_bib = None
+    elif has_oclc_no:
+        try:
+            response = oclc_no_query(session, control_no)
+            if response_has_isbn(response):
+                oclc_no = get_current_oclc_no(response)
+                worldcat_bib = get_full_bib(session, oclc_no)
+                prepare_bib(worldcat_bib, bib_no, bib_format, opac)
+        except CacheMiss as exc:
+            logging.warning(f"{bib_no}: {exc}")
+    return BibOutcome(
+        bib,
+        worldcat_bib,
+        bool(has_oclc_no),
+        lc_no is not None,
+        brief_avoided,
+    )
+
+
+def save_outcome(outcome: BibOutcome, router: MarcRouter, counts: Counter) -> None:
+    counts["bibs"] += 1
+    if outcome.brief_avoided:
+        counts["brief_avoided"] += 1
+    if outcome.has_oclc_no:
+        counts["oclc_no"] += 1
+        if outcome.worldcat_bib is not None:
+            counts["enhanced"] += 1
+            router.write("enhanced", outcome.worldcat_bib)
+    else:
+        router.write("skipped", outcome.bib)
+        if outcome.has_lc_no:
+            counts["lc_no"] += 1
+    print(f"Processing record {counts['bibs']}.")
+
+
+def enhance_bibs(
+    reader: Iterable[Record],
+    session: Union[MetadataSession, CachedMetadataSession],
+    router: MarcRouter,
+    workers: int = 4,
+    full_only: bool = False,
+) -> Counter:
+    """
+    Enhances bibs with a pool of workers querying Worldcat concurrently.
+    Bibs are read only when fewer than `workers * 2` are waiting to be
+    saved, and results are saved in the order of the source file.
+
+    Args:
+        reader:                 source of Sierra bibs, e.g. `MARCReader`
+        session:                session instance shared by workers
+        router:                 `MarcRouter` with "enhanced" and "skipped"
+                                destinations
+        workers:                number of bibs looked up at the same time
+        full_only:              skip brief bib lookups, see `enhance_record`
+
+    Returns:
+        counts of bibs, bibs with oclc #, bibs with lccn, enhanced bibs,
+        and brief bib lookups avoided
+    """
+    counts = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: deque[Future] = deque()
+        for bib in reader:
+            pending.append(executor.submit(enhance_record, session, bib, full_only))
+            if len(pending) >= workers * 2:
+                save_outcome(pending.popleft().result(), router, counts)
+        while pending:
+            save_outcome(pending.popleft().result(), router, counts)
+    return counts
+
+
+def open_session(rate: float, offline: bool) -> Optional[MetadataSession]:
+    """
+    Returns rate limited Worldcat session or None in offline mode
+    """
+    if offline:
+        return None
 
     logging.info("Obtaining Worldcat access token.")
     creds_fh = os.path.join(os.environ["USERPROFILE"], ".oclc/bpl_overload.json")
@@ -151,54 +333,87 @@ def enhance(marc_fh: str) -> None:
     )
 
     logging.info("Opening Worldcat session...")
-    with MetadataSession(authorization=token) as session:
+    session = MetadataSession(authorization=token)
+    return RateLimiter(rate).attach(session)
+
+
+def enhance(
+    marc_fh: str,
+    rate: float = WORLDCAT_RATE,
+    workers: int = 4,
+    offline: bool = False,
+    cache_fh: str = CACHE_FH,
+    full_only: bool = False,
+) -> None:
+    """
+    Use to launch enhancing process. Worldcat responses are cached, so
+    re-running the same file does not query Worldcat again.
+
+    Args:
+        marc_fh:                path to MARC21 file with Sierra bibs
+        rate:                   max number of Worldcat requests per second
+        workers:                number of bibs looked up at the same time
+        offline:                use only responses cached by previous runs
+        cache_fh:               path to Worldcat cache database
+        full_only:              request only full bibs from Worldcat
+    """
+    # out files
+    enhanced_fh = f"{marc_fh[:-4]}-ENHANCED.mrc"
+    skipped_fh = f"{marc_fh[:-4]}-SKIPPED.mrc"
 
+    with (
+        WorldcatCache(cache_fh) as cache,
+        CachedMetadataSession(open_session(rate, offline), cache, offline) as session,
+        MarcRouter({"enhanced": enhanced_fh, "skipped": skipped_fh}) as router,
+    ):
         logging.info("Reading src marc file...")
         with open(marc_fh, "rb") as fin:
             reader = MARCReader(fin)
-            n = 0
-            o = 0
-            l = 0
-            i = 0
-            for bib in reader:
-                n += 1
-
-                (
-                    bib_no,
-                    control_no,
-                    lc_no,
-                    author,
-                    title,
-                    pubyear,
-                    bib_format,
-                    opac,
-                ) = parse_identifiers(bib)
-                logging.debug(f"{bib_no}=cn:{control_no}, ln:{lc_no}")
-
-                if is_oclc_no(control_no):
-                    o += 1
-                    response = oclc_no_query(session, control_no)
-                    if response_has_isbn(response):
-                        i += 1
-                        oclc_no = get_current_oclc_no(response)
-                        worldcat_bib = get_full_bib(session, oclc_no)
-                        prepare_bib(worldcat_bib, bib_no, bib_format, opac)
-                        save2marc(worldcat_bib, enhanced_fh)
-                else:
-                    save2marc(bib, skipped_fh)
-
-                if not is_oclc_no(control_no) and lc_no is not None:
-                    l += 1
-
-                print(f"Processing record {n}.")
+            counts = enhance_bibs(reader, session, router, workers, full_only)
 
     logging.info(
-        f"Found {n} bibs in {marc_fh}. The set includs {o} oclc # and {l} lccn."
+        f"Found {counts['bibs']} bibs in {marc_fh}. The set includs "
+        f"{counts['oclc_no']} oclc # and {counts['lc_no']} lccn."
+    )
+    logging.info(f"Successfuly enhanced {counts['enhanced']} bibs.")
+    if full_only:
+        logging.info(f"Avoided {counts['brief_avoided']} brief bib lookups.")
+    logging.info(
+        f"Worldcat cache served {cache.hits} responses, missed {cache.misses}."
     )
-    logging.info(f"Successfuly enhanced {i} bibs.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Enhance Sierra bibs with records from Worldcat."
+    )
+    parser.add_argument("marc_fh", help="path to MARC21 file with Sierra bibs")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="number of bibs looked up at the same time",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=WORLDCAT_RATE,
+        help="max number of Worldcat requests per second",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="use only Worldcat responses cached by previous runs",
+    )
+    parser.add_argument(
+        "--cache", default=CACHE_FH, help="path to Worldcat cache database"
+    )
+    parser.add_argument(
+        "--full-only",
+        action="store_true",
+        help="request only full bibs, one Worldcat request per bib",
+    )
+    args = parser.parse_args()
 
     logging.basicConfig(
         filename="enhance_log.log",
@@ -208,4 +423,11 @@ if __name__ == "__main__":
     )
     logging.info("Launching enhancing process...")
 
-    enhance(sys.argv[1])
+    enhance(
+        args.marc_fh,
+        args.rate,
+        args.workers,
+        args.offline,
+        args.cache,
+        args.full_only,
+    )
@@ -11,9 +11,9 @@ import os
 import sys
 from typing import Optional
 
-from pymarc import Field, MARCReader, Record
+from pymarc import Field, MARCReader, Record, Subfield
 
-from utils import save2marc, save2csv
+from utils import CsvSink, MarcRouter, add_ordered_fields
 
 
 def processed_file_path(file: str, suffix: str) -> str:
@@ -95,9 +95,16 @@ def add_oclc_fields(bib: Record) -> None:
     """
 
     controlNo = bib["001"].data.strip()
-    bib.add_ordered_field(Field(tag="003", data="OCoLC"))
-    bib.add_ordered_field(
-        Field(tag="035", indicators=[" ", " "], subfields=["a", f"(OCoLC){controlNo}"])
+    add_ordered_fields(
+        bib,
+        [
+            Field(tag="003", data="OCoLC"),
+            Field(
+                tag="035",
+                indicators=[" ", " "],
+                subfields=[Subfield(code="a", value=f"(OCoLC){controlNo}")],
+            ),
+        ],
     )
 
 
@@ -159,10 +166,12 @@ def process(file: str) -> None:
     except FileNotFoundError:
         pass
 
-    with open(file, "rb") as marcfile:
+    with (
+        open(file, "rb") as marcfile,
+        MarcRouter({"PRC": proc_file, "DUP": dup_file, "ERR": err_file}) as router,
+        CsvSink("src/flourish-registry.csv") as registry_log,
+    ):
         reader = MARCReader(marcfile)
-        p = 0
-        d = 0
         for bib in reader:
 
             add_oclc_fields(bib)
@@ -176,18 +185,18 @@ def process(file: str) -> None:
             control_no = bib["001"].data.strip()
             if callno is None:
                 print(f"Isolating bib without call number (oclc # {control_no})")
-                save2marc(err_file, bib)
+                router.write("ERR", bib)
 
             elif control_no not in registry:
-                save2marc(proc_file, bib)
-                save2csv("src/flourish-registry.csv", [control_no, callno, file])
+                router.write("PRC", bib)
+                registry_log.writerow([control_no, callno, file])
                 registry.add(control_no)
-                p += 1
             else:
-                d += 1
-                save2marc(dup_file, bib)
+                router.write("DUP", bib)
                 print(f"Found duplicate control # {control_no} in the file.")
 
+    p = router.count("PRC")
+    d = router.count("DUP")
     print(f"Total # of records in src file: {p + d}.")
     print(f"{p} records have been maniuplated and saved to {proc_file}")
     print(f"Found {d} duplicate records.")
@@ -7,9 +7,9 @@ import csv
 from pymarc import MARCReader, Record, Field, Subfield, Indicators
 
 try:
-    from utils import save2marc
+    from utils import MarcRouter
 except ImportError:
-    from .utils import save2marc
+    from .utils import MarcRouter
 
 
 def cleanup_locs(value: str) -> str:
@@ -48,7 +48,8 @@ def process_bib(bib: Record, bibs2update: dict) -> None:
 
 def process_batch(marcfile: str, csvfile: str, out: str) -> None:
     bibs2update = get_bibs2update(csvfile)
-    with open(marcfile, "rb") as f:
+    destinations = {"ser": f"{out}-ser.mrc", "mono": f"{out}-mono.mrc"}
+    with open(marcfile, "rb") as f, MarcRouter(destinations) as router:
         reader = MARCReader(f)
         for bib in reader:
             controlNo = bib["001"].data
@@ -83,7 +84,7 @@ def process_batch(marcfile: str, csvfile: str, out: str) -> None:
                         subfields=[Subfield(code="a", value="RL")],
                     )
                 )
-                save2marc(f"{out}-{bib_type}.mrc", bib)
+                router.write(bib_type, bib)
 
 
 if __name__ == "__main__":
@@ -8,7 +8,7 @@ import warnings
 from bookops_marc import SierraBibReader
 from pymarc import Field, Subfield, Indicators
 
-from utils import save2marc
+from utils import MarcRouter, add_ordered_fields
 
 
 def is_serial(leader: str) -> bool:
@@ -35,7 +35,8 @@ def construct_command_field() -> Field:
 
 
 def prep_bibs(marcfile: str, out: str) -> None:
-    with open(marcfile, "rb") as f:
+    destinations = {"ser": f"{out}-ser.mrc", "mon": f"{out}-mon.mrc"}
+    with open(marcfile, "rb") as f, MarcRouter(destinations) as router:
         reader = SierraBibReader(f, library="nypl")
         for bib in reader:
             bib.normalize_oclc_control_number()
@@ -48,14 +49,13 @@ def prep_bibs(marcfile: str, out: str) -> None:
                 warnings.warn(f"Record {bib["001"].data} lacks 086 classification")
 
             callNo_field = construct_callno(gpo_class)
-            bib.add_ordered_field(callNo_field)
             command_field = construct_command_field()
-            bib.add_ordered_field(command_field)
+            add_ordered_fields(bib, [callNo_field, command_field])
 
             if is_serial(bib.leader):
-                save2marc(f"{out}-ser.mrc", bib)
+                router.write("ser", bib)
             else:
-                save2marc(f"{out}-mon.mrc", bib)
+                router.write("mon", bib)
 
 
 if __name__ == "__main__":
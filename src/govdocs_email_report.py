@@ -1,4 +1,4 @@
-from utils import save2csv
+from utils import CsvSink
 
 
 def get_marcfile_name(value: str):
@@ -35,10 +35,11 @@ def parse_report(fh: str) -> tuple[str, list[tuple[str, str]]]:
 
 
 def save_data(marcfile: str, data: list[tuple[str, str]], out: str) -> None:
-    save2csv(out, [marcfile, ""])
-    save2csv(out, ["file block", "title"])
-    for elem in data:
-        save2csv(out, elem)
+    with CsvSink(out) as sink:
+        sink.writerow([marcfile, ""])
+        sink.writerow(["file block", "title"])
+        for elem in data:
+            sink.writerow(elem)
 
 
 if __name__ == "__main__":
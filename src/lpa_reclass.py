@@ -1,31 +1,38 @@
+import argparse
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import batched
 import csv
 from datetime import datetime
 import logging
 import json
 import os
-from typing import Generator, Union
+from typing import Generator, Iterable, Optional, TextIO, Union
 
 from bookops_sierra.errors import BookopsSierraError
 from bookops_sierra import SierraSession, SierraToken
 
 from src.lpa_reclass_utils import (
-    MultiCallNumError,
+    analyze_items,
     change_item_varFields,
     cleanup_bib_varFields,
     construct_subfields_for_lcc,
     construct_lcc_field,
-    determine_safe_to_delete_item_callnumbers,
     get_item_nos_from_bib_response,
-    get_other_item_callnumbers,
-    is_lpa_ref_location,
-    item_is_updated,
-    split_into_batches,
 )
-from src.utils import save2csv
+from src.checkpoint import CheckpointJournal
+from src.lpa_reclass_index import ReclassIndex
+from src.rate_limit import SIERRA_RATE, RateLimiter
+from src.utils import CsvSink
 
 
 logger = logging.getLogger(__name__)
 
+# without the limit param bibs & items endpoints return at most 50 entries
+BIB_BATCH_SIZE = 50
+ITEM_BATCH_SIZE = 50
+
 
 def get_reclass_data(fh: str) -> Generator[tuple[str, bool, str], None, None]:
     with open(fh, "r") as csvfile:
@@ -63,23 +70,523 @@ def get_bib(sid: Union[str, int], conn: SierraSession) -> dict:
     return res.json()
 
 
+def get_bibs(sids: str, conn: SierraSession) -> list[dict]:
+    res = conn.bibs_get(sids=sids, fields="id,varFields,items")
+    bibs = res.json()["entries"]
+    return bibs
+
+
 def get_items(sids: str, conn: SierraSession) -> list[dict]:
     res = conn.items_get(sids=sids, fields="location,varFields")
     items = res.json()["entries"]
     return items
 
 
+def is_rejected_request(exc: BookopsSierraError) -> bool:
+    """
+    Checks if Sierra rejected the request itself (4xx response, for example
+    414 URL too long). Error messages of Sierra responses start with their
+    status code; server errors and connection errors are not rejections.
+    """
+    status = str(exc).split(":", 1)[0].strip()
+    return status.isdigit() and 400 <= int(status) < 500
+
+
+def fetch_items(
+    itemNos: list[str], conn: SierraSession, batch_size: int = ITEM_BATCH_SIZE
+) -> tuple[list[dict], int]:
+    """
+    Retrieves items in batches of up to `batch_size` ids. When Sierra
+    rejects a batch (URL too long, 4xx) the batch size is halved for the
+    rest of the items, so an error is raised only when a single item can
+    not be retrieved. Other errors, such as 5xx responses already retried
+    by the rate limiter, are raised right away.
+
+    Args:
+        itemNos:                Sierra item numbers without prefix
+        conn:                   `SierraSession` instance
+        batch_size:             max number of item ids in a single request
+
+    Returns:
+        tuple of retrieved items and number of requests made
+    """
+    items = []
+    req_no = 0
+    start = 0
+    while start < len(itemNos):
+        batch = itemNos[start : start + batch_size]
+        req_no += 1
+        try:
+            items.extend(get_items(sids=",".join(batch), conn=conn))
+        except BookopsSierraError as exc:
+            if len(batch) == 1 or not is_rejected_request(exc):
+                raise
+            batch_size = len(batch) // 2
+            logger.debug(f"Items request rejected. Batch size lowered to {batch_size}")
+            continue
+        start += len(batch)
+    return items, req_no
+
+
 def update_bib(sid: Union[str, int], data: dict, conn: SierraSession) -> int:
     out = conn.bib_update(sid=sid, data=data, data_format="application/json")
     return out.status_code
 
 
-def reclass(src_fh: str, row=2) -> None:
+BibResult = namedtuple(
+    "BibResult", ["sid", "lcc", "log_row", "error_rows", "error", "requests"]
+)
+BibPlan = namedtuple("BibPlan", ["items", "bib", "error_rows"])
+FetchedBib = namedtuple("FetchedBib", ["bib", "items", "requests"])
+
+
+def fetch_bibs(sids: list[str], conn: SierraSession) -> dict[str, dict]:
+    """
+    Retrieves multiple bibs with a single request
+
+    Args:
+        sids:                   Sierra bib numbers without prefix and check digit
+        conn:                   `SierraSession` instance
+
+    Returns:
+        bibs found by their Sierra bib number, empty if the request failed
+    """
+    try:
+        bibs = get_bibs(",".join(sids), conn)
+    except BookopsSierraError:
+        logger.warning(f"Unable to retrieve bibs b{sids[0]}a-b{sids[-1]}a at once.")
+        return {}
+    return {str(bib["id"]): bib for bib in bibs}
+
+
+def fetch_bib(
+    sid: str, conn: SierraSession, bibs: Optional[Future] = None
+) -> Optional[FetchedBib]:
+    """
+    Retrieves bib and all its attached items. A bib missing from prefetched
+    bibs is requested on its own.
+
+    Args:
+        sid:                    Sierra bib number without prefix and check digit
+        conn:                   `SierraSession` instance
+        bibs:                   future of `fetch_bibs` result that includes
+                                the bib
+
+    Returns:
+        `FetchedBib` or None if the bib does not exist
+    """
+    req_no = 0
+    bib = None
+    if bibs is not None:
+        bib = bibs.result().get(sid)
+    if bib is None:
+        try:
+            req_no += 1
+            bib = get_bib(sid, conn)
+        except BookopsSierraError:
+            logger.error(f"BIB NOT FOUND: b{sid}a")
+            return None
+    logger.info(f"Retrieved b{sid}a")
+
+    itemNos = get_item_nos_from_bib_response(bib["items"])
+    logger.debug(f"Bib b{sid}a has {len(itemNos)} items attached.")
+    items, items_req_no = fetch_items(itemNos, conn)
+    return FetchedBib(bib, items, req_no + items_req_no)
+
+
+def plan_bib(sid: str, spec_cutter: bool, lcc: str, data: FetchedBib) -> BibPlan:
+    """
+    Constructs new varFields of the bib and its LPA reference items
+    without sending anything to Sierra
+
+    Args:
+        sid:                    Sierra bib number without prefix and check digit
+        spec_cutter:            indicates if LC class number has special cutter
+        lcc:                    new LC class number
+        data:                   retrieved bib and item data
+
+    Returns:
+        `BibPlan` with item updates as (item id, data) tuples, bib update
+        data (None if no LPA REF item needs an update), and error log rows
+    """
+    logger.info(f"Constructing new MARC fields for b{sid}a")
+    summary = analyze_items(data.items)
+    callnumbers4del = summary.callnumbers4del
+    logger.debug(f"Callnumbers4del: {callnumbers4del}")
+
+    lcc_subfields = construct_subfields_for_lcc(lcc, spec_cutter)
+
+    # LPA REF item records
+    new_lcc_item_field = construct_lcc_field(lcc_subfields, fieldTag="c")
+    item_updates = []
+    error_rows = []
+    for item in summary.ref_items:
+        if item["id"] in summary.updated:
+            continue
+        if item["id"] in summary.conflicts:
+            logger.error(f"MultiCallnumberError: b{sid}a. Skipping item.")
+            error_rows.append([sid, item["id"]])
+            continue
+        new_varFields = change_item_varFields(item, new_lcc_item_field)
+        item_updates.append((item["id"], {"varFields": new_varFields}))
+
+    if not item_updates:
+        return BibPlan([], None, error_rows)
+
+    # bib record
+    new_lcc_bib_field = construct_lcc_field(lcc_subfields, fieldTag="q")
+    bib_new_varFields = cleanup_bib_varFields(
+        data.bib["varFields"], callnumbers4del, summary.other_callnumbers
+    )
+    bib_new_varFields.append(new_lcc_bib_field)
+    return BibPlan(item_updates, {"varFields": bib_new_varFields}, error_rows)
+
+
+def process_bib(
+    sid: str,
+    spec_cutter: bool,
+    lcc: str,
+    conn: SierraSession,
+    row: int,
+    fetched: Optional[Future] = None,
+    bibs: Optional[Future] = None,
+    journal: Optional[CheckpointJournal] = None,
+) -> BibResult:
+    """
+    Reclassifies a single bib and its LPA reference items. Item records are
+    always updated before the bib record. Nothing is written to the csv logs
+    here so that bibs can be processed concurrently.
+
+    When a journal is given, the new bib data is recorded in it before any
+    item is updated. A bib interrupted by a crash is then completed with
+    the same bib data even though its items no longer need an update.
+    Item updates are not journaled: items already updated are recognized
+    from their Sierra data, which is fetched again on resume, so an item
+    entry would never be read and would cost an fsync per item update.
+
+    Args:
+        sid:                    Sierra bib number without prefix and check digit
+        spec_cutter:            indicates if LC class number has special cutter
+        lcc:                    new LC class number
+        conn:                   `SierraSession` instance shared by all workers
+        row:                    source csv row number
+        fetched:                future of prefetched `fetch_bib` result,
+                                if not given the bib is retrieved here
+        bibs:                   future of `fetch_bibs` result that includes
+                                the bib
+        journal:                checkpoint journal of the reclass run
+
+    Returns:
+        `BibResult` with an audit log row (None if the bib was not updated),
+        error log rows, an exception that should stop the reclass run, and
+        number of requests made (None if the bib was not found)
+    """
+    # get Sierra bib & item data
+    timestamp = datetime.now()
+    if fetched is None:
+        data = fetch_bib(sid, conn, bibs)
+    else:
+        data = fetched.result()
+    if data is None:
+        log_row = [timestamp, sid, lcc, "ERROR-BIB NOT FOUND"]
+        return BibResult(sid, lcc, log_row, [], None, None)
+
+    req_no = data.requests
+    plan = plan_bib(sid, spec_cutter, lcc, data)
+    new_bib_data = plan.bib
+    error_rows = plan.error_rows
+    if journal is not None:
+        planned = journal.get("plan", sid)
+        if planned:
+            logger.info(f"Completing b{sid}a interrupted in a previous run.")
+            new_bib_data = json.loads(planned[0])
+        elif new_bib_data is not None:
+            journal.record("plan", sid, json.dumps(new_bib_data))
+    if new_bib_data is None:
+        return BibResult(sid, lcc, None, error_rows, None, req_no)
+
+    # update LPA REF item records
+    items_updated = []
+    for item_id, new_item_data in plan.items:
+        try:
+            req_no += 1
+            res = conn.item_update(sid=item_id, data=new_item_data)
+            logger.debug(f"Updated item:{res.url}")
+            items_updated.append(item_id)
+        except BookopsSierraError as exc:
+            logger.error(f"BookopsSierraError: b{sid}a | {item_id}. Verify.")
+            error_rows.append([sid, item_id])
+            return BibResult(sid, lcc, None, error_rows, exc, req_no)
+
+    # update bib record
+    req_no += 1
+    res = update_bib(sid, new_bib_data, conn)
+    logger.debug(f"Updating b{sid}a ({row}) result: {res}")
+    end = datetime.now()
+    elapsed = end - timestamp
+    log_row = [
+        timestamp,
+        sid,
+        lcc,
+        len(items_updated),
+        ",".join(items_updated),
+        req_no,
+        elapsed,
+    ]
+    return BibResult(sid, lcc, log_row, error_rows, None, req_no)
+
+
+def prefetch_bibs(
+    src_data: Iterable[tuple[str, bool, str]],
+    conn: SierraSession,
+    reader: ThreadPoolExecutor,
+    row: int = 2,
+    journal: Optional[CheckpointJournal] = None,
+    index: Optional[ReclassIndex] = None,
+    window: int = BIB_BATCH_SIZE,
+) -> Generator[tuple[str, bool, str, int, Future], None, None]:
+    """
+    Reads reclass data ahead in windows and requests all bibs of a window
+    at once in the reader pool. Bibs completed according to the journal
+    or already reclassified with the same LCC according to the index are
+    skipped without being requested.
+
+    Yields:
+        reclass data and source csv row number of each bib with future of
+        its window `fetch_bibs` result
+    """
+    rows = ((sid, cutter, lcc, n) for n, (sid, cutter, lcc) in enumerate(src_data, row))
+    if journal is not None:
+        rows = (r for r in rows if not journal.done("bib", r[0]))
+    if index is not None:
+        rows = (r for r in rows if not index.skip_bib(r[0], r[2]))
+    for window_rows in batched(rows, window):
+        sids = [sid for sid, *_ in window_rows]
+        bibs = reader.submit(fetch_bibs, sids, conn)
+        for sid, spec_cutter, lcc, n in window_rows:
+            yield sid, spec_cutter, lcc, n, bibs
+
+
+def save_result(
+    future: Future,
+    audit_log: CsvSink,
+    errors_log: CsvSink,
+    journal: Optional[CheckpointJournal] = None,
+    index: Optional[ReclassIndex] = None,
+) -> Optional[Exception]:
+    """
+    Writes outcome of a processed bib to the csv logs and marks it as
+    completed in the journal and the index. The logs are flushed to disk
+    before the bib is journaled, so a resumed run never skips a bib whose
+    log rows were lost. Only bibs updated in Sierra without item errors
+    are added to the index; bibs that were not found or needed no update
+    are not.
+
+    Returns:
+        exception raised while processing the bib, if any
+    """
+    try:
+        result = future.result()
+    except Exception as exc:
+        return exc
+    for error_row in result.error_rows:
+        errors_log.writerow(error_row)
+    if result.log_row is not None:
+        logger.info(f"Saving b{result.sid}a actions to csv.")
+        audit_log.writerow(result.log_row)
+    if result.error is not None:
+        return result.error
+    if journal is not None:
+        audit_log.flush(sync=True)
+        errors_log.flush(sync=True)
+        journal.record("bib", result.sid)
+    if (
+        index is not None
+        and result.log_row is not None
+        and result.requests is not None
+        and not result.error_rows
+    ):
+        # bib updated, a bib not found has a log row but no requests
+        index.record_bib(result.sid, result.lcc, result.requests)
+    return None
 
-    # setup logging
+
+def reclass_bibs(
+    src_data: Iterable[tuple[str, bool, str]],
+    conn: SierraSession,
+    audit_log: CsvSink,
+    errors_log: CsvSink,
+    workers: int = 4,
+    row: int = 2,
+    prefetch: int = 0,
+    journal: Optional[CheckpointJournal] = None,
+    index: Optional[ReclassIndex] = None,
+) -> None:
+    """
+    Reclassifies bibs concurrently using a bounded pool of worker threads.
+    Results are saved in the order of the source data regardless of the order
+    in which workers finish. After the first failure no new bibs are started,
+    bibs already in progress are completed and logged, and the error is raised.
+    Bibs are retrieved in windows of `BIB_BATCH_SIZE` with a single request.
+
+    Args:
+        src_data:               reclass data as yielded by `get_reclass_data`
+        conn:                   `SierraSession` instance shared by all workers
+        audit_log:              audit log csv sink
+        errors_log:             errors csv sink
+        workers:                max number of bibs processed at the same time
+        row:                    source csv row number of the first bib
+        prefetch:               number of bibs ahead of the workers for which
+                                bib and item data is retrieved in advance
+        journal:                checkpoint journal, bibs completed in it
+                                are skipped
+        index:                  index of records already reclassified,
+                                bibs with the same LCC in it are skipped
+    """
+    error = None
+    with (
+        ThreadPoolExecutor(max_workers=workers) as executor,
+        ThreadPoolExecutor(max_workers=max(prefetch, 1)) as reader,
+    ):
+        ahead: deque[tuple] = deque()
+        pending: deque[Future] = deque()
+        for sid, spec_cutter, lcc, row, bibs in prefetch_bibs(
+            src_data, conn, reader, row, journal, index
+        ):
+            fetched = reader.submit(fetch_bib, sid, conn, bibs) if prefetch else None
+            ahead.append((sid, spec_cutter, lcc, conn, row, fetched, bibs, journal))
+            if len(ahead) <= prefetch:
+                continue
+            pending.append(executor.submit(process_bib, *ahead.popleft()))
+            if len(pending) >= workers * 2:
+                error = save_result(
+                    pending.popleft(), audit_log, errors_log, journal, index
+                )
+                if error is not None:
+                    break
+        if error is None:
+            pending.extend(executor.submit(process_bib, *args) for args in ahead)
+        else:
+            for sid, spec_cutter, lcc, conn, row, fetched, *_ in ahead:
+                fetched.cancel()
+        while pending:
+            exc = save_result(pending.popleft(), audit_log, errors_log, journal, index)
+            error = error or exc
+    if error is not None:
+        raise error
+
+
+def diff_varFields(old: list[dict], new: list[dict]) -> dict[str, list[dict]]:
+    """
+    Compares varFields of a record before and after the transformation
+
+    Returns:
+        dictionary with removed and added varFields
+    """
+    return {
+        "removed": [f for f in old if f not in new],
+        "added": [f for f in new if f not in old],
+    }
+
+
+def diff_bib(sid: str, spec_cutter: bool, lcc: str, data: Optional[FetchedBib]) -> dict:
+    """
+    Runs the full transformation of a bib and its items and describes
+    the changes that `process_bib` would send to Sierra
+
+    Args:
+        sid:                    Sierra bib number without prefix and check digit
+        spec_cutter:            indicates if LC class number has special cutter
+        lcc:                    new LC class number
+        data:                   retrieved bib and item data, None if the bib
+                                does not exist
+
+    Returns:
+        JSON serializable diff of the bib
+    """
+    if data is None:
+        return {"bibNo": sid, "lcc": lcc, "status": "not found"}
+
+    plan = plan_bib(sid, spec_cutter, lcc, data)
+    old_items = {item["id"]: item["varFields"] for item in data.items}
+    diff = {
+        "bibNo": sid,
+        "lcc": lcc,
+        "status": "no change" if plan.bib is None else "update",
+        "items": [
+            {"id": item_id, **diff_varFields(old_items[item_id], new["varFields"])}
+            for item_id, new in plan.items
+        ],
+        "errors": [item_id for _, item_id in plan.error_rows],
+    }
+    if plan.bib is not None:
+        diff["bib"] = diff_varFields(data.bib["varFields"], plan.bib["varFields"])
+    return diff
+
+
+def save_snapshot(fh: str, data: Optional[FetchedBib]) -> None:
+    """
+    Saves retrieved bib and item data as JSON, bibs not found are saved
+    as null so they are not requested again
+    """
+    snapshot = None if data is None else {"bib": data.bib, "items": data.items}
+    with open(fh, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+def load_snapshot(fh: str) -> Optional[FetchedBib]:
+    with open(fh, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if snapshot is None:
+        return None
+    return FetchedBib(snapshot["bib"], snapshot["items"], 0)
+
+
+def dry_run_bibs(
+    src_data: Iterable[tuple[str, bool, str]],
+    diff_out: TextIO,
+    snapshot_dir: str,
+    conn: Optional[SierraSession] = None,
+    row: int = 2,
+) -> int:
+    """
+    Writes a compact JSON diff line for each bib without updating anything
+    in Sierra. Bib and item data is loaded from snapshots and only bibs
+    without a snapshot are retrieved from Sierra and snapshotted.
+
+    Args:
+        src_data:               reclass data as yielded by `get_reclass_data`
+        diff_out:               text file the diff lines are written to
+        snapshot_dir:           directory of bib snapshots
+        conn:                   `SierraSession` instance, if None bibs without
+                                a snapshot are reported as "no snapshot"
+        row:                    source csv row number of the first bib
+
+    Returns:
+        number of bibs retrieved from Sierra
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fetched = 0
+    for n, (sid, spec_cutter, lcc) in enumerate(src_data, row):
+        fh = os.path.join(snapshot_dir, f"{sid}.json")
+        if os.path.exists(fh):
+            diff = diff_bib(sid, spec_cutter, lcc, load_snapshot(fh))
+        elif conn is None:
+            diff = {"bibNo": sid, "lcc": lcc, "status": "no snapshot"}
+        else:
+            data = fetch_bib(sid, conn)
+            fetched += 1
+            save_snapshot(fh, data)
+            diff = diff_bib(sid, spec_cutter, lcc, data)
+        line = json.dumps({"row": n, **diff}, separators=(",", ":"))
+        diff_out.write(f"{line}\n")
+    return fetched
+
+
+def setup_logging() -> None:
     logging.basicConfig(
         filename="src/files/LPALCReclass/lpa-main-log.log",
-        format="%(levelname)s|%(asctime)s|%(message)s",
+        format="%(levelname)s|%(threadName)s|%(asctime)s|%(message)s",
         datefmt="%m-%d-%Y %I:%M:%S %p",
         encoding="utf-8",
         level=logging.DEBUG,
@@ -90,110 +597,169 @@ def reclass(src_fh: str, row=2) -> None:
     console.setFormatter(formatter)
     logging.getLogger("").addHandler(console)
 
+
+def dry_run(src_fh: str, row=2, offline: bool = False) -> None:
+    """
+    Writes JSON lines diff of all changes `reclass` would make
+
+    Args:
+        src_fh:                 path to reclass csv file
+        row:                    source csv row number of the first bib
+        offline:                use only existing snapshots and do not
+                                connect to Sierra at all
+    """
+    setup_logging()
+    src_data = get_reclass_data(src_fh)
+    diff_fh = f"{os.path.splitext(src_fh)[0]}-dry-run.jsonl"
+    snapshot_dir = "src/files/LPALCReclass/snapshots"
+
+    with open(diff_fh, "w", encoding="utf-8") as diff_out:
+        if offline:
+            fetched = dry_run_bibs(src_data, diff_out, snapshot_dir, row=row)
+        else:
+            token = get_access_token()
+            with SierraSession(authorization=token, timeout=15) as conn:
+                RateLimiter(SIERRA_RATE).attach(conn)
+                fetched = dry_run_bibs(src_data, diff_out, snapshot_dir, conn, row)
+    logger.info(f"Dry run saved to {diff_fh}. Retrieved {fetched} bibs from Sierra.")
+
+
+def reclass(
+    src_fh: str,
+    row=2,
+    workers: int = 4,
+    rate: float = SIERRA_RATE,
+    prefetch: int = 0,
+    resume: bool = False,
+    use_index: bool = True,
+    reset_index: bool = False,
+) -> None:
+    """
+    Args:
+        src_fh:                 path to reclass csv file
+        row:                    source csv row number of the first bib
+        workers:                max number of bibs processed at the same time
+        rate:                   max number of Sierra API requests per second
+                                shared by all workers, lowered automatically
+                                when the API responds with 429 or 5xx
+        prefetch:               number of bibs ahead of the workers for which
+                                bib and item data is retrieved in advance
+        resume:                 continue previous run of the same source file
+                                skipping bibs completed according to its
+                                checkpoint journal; required while the
+                                journal of a previous run exists
+        use_index:              skip bibs reclassified with the same LCC in
+                                any previous run without contacting Sierra
+        reset_index:            forget bibs reclassified in previous runs,
+                                for example after a fix of reclass rules
+
+    Bibs reclassified with the same LCC in any previous run are looked up
+    in a local index and skipped without contacting Sierra.
+    """
+
+    setup_logging()
+
     # prep output files
     src_data = get_reclass_data(src_fh)
     log_fh = "src/files/LPALCReclass/LPAReclas-log.csv"
-    save2csv(
-        log_fh,
-        ["timestamp", "bibNo", "lcc", "items_updated", "requests_made", "elapsed_time"],
-    )
     errors_fh = "src/files/LPALCReclass/LPAReclass-errors.csv"
+    journal_fh = f"{os.path.splitext(src_fh)[0]}-journal.tsv"
+    index_fh = "src/files/LPALCReclass/LPAReclass-index.db"
 
     # process
     token = get_access_token()
-    with SierraSession(authorization=token, timeout=15, delay=1) as conn:
+    with (
+        CsvSink(log_fh) as audit_log,
+        CsvSink(errors_fh) as errors_log,
+        CheckpointJournal(journal_fh, resume=resume) as journal,
+        ReclassIndex(index_fh) if use_index else nullcontext() as index,
+        SierraSession(authorization=token, timeout=15) as conn,
+    ):
+        RateLimiter(rate).attach(conn)
+        if index is not None and reset_index:
+            logger.info("Resetting index of reclassified records.")
+            index.reset()
+        if resume:
+            logger.info(f"Resuming reclass with {len(journal)} journal entries.")
+        else:
+            audit_log.writerow(
+                [
+                    "timestamp",
+                    "bibNo",
+                    "lcc",
+                    "items_updated",
+                    "requests_made",
+                    "elapsed_time",
+                ]
+            )
         logger.info("Established Sierra API session.")
-        for sid, spec_cutter, lcc in src_data:
-            req_no = 0
-            # get Sierra bib data
-            timestamp = datetime.now()
-            try:
-                req_no += 1
-                bib = get_bib(sid, conn)
-                logger.info(f"Retrieved b{sid}a")
-            except BookopsSierraError:
-                logger.error(f"BIB NOT FOUND: b{sid}a")
-                save2csv(log_fh, [timestamp, sid, lcc, "ERROR-BIB NOT FOUND"])
-                continue
-
-            bib_varFields = bib["varFields"]
-
-            # get Sierra item data
-            itemNos = get_item_nos_from_bib_response(bib["items"])
-            logger.debug(f"Bib b{sid}a has {len(itemNos)} items attached.")
-            retrieved_items = []
-            for batch in split_into_batches(itemNos, batch_size=5):
-                itemNos_str = ",".join(batch)
-                items = get_items(sids=itemNos_str, conn=conn)
-                req_no += 1
-                retrieved_items.extend(items)
-
-            logger.info(f"Constructing new MARC fields for b{sid}a")
-            callnumbers4del = determine_safe_to_delete_item_callnumbers(retrieved_items)
-            other_loc_callnumbers = get_other_item_callnumbers(retrieved_items)
-            logger.debug(f"Callnumbers4del: {callnumbers4del}")
-
-            lcc_subfields = construct_subfields_for_lcc(lcc, spec_cutter)
-
-            # update LPA REF item records
-            new_lcc_item_field = construct_lcc_field(lcc_subfields, fieldTag="c")
-            item_update_count = 0
-            items_updated = []
-
-            lpa_ref_item_exists = False
-            for item in retrieved_items:
-                if is_lpa_ref_location(item) and not item_is_updated(item):
-                    try:
-                        new_varFields = change_item_varFields(item, new_lcc_item_field)
-                        lpa_ref_item_exists = True
-                    except MultiCallNumError:
-                        logger.error(f"MultiCallnumberError: b{sid}a. Skipping item.")
-                        save2csv(errors_fh, [sid, item["id"]])
-                        continue
-
-                    new_item_data = {"varFields": new_varFields}
-                    try:
-                        req_no += 1
-                        res = conn.item_update(sid=item["id"], data=new_item_data)
-                        logger.debug(f"Updated item:{res.url}")
-                        item_update_count += 1
-                        items_updated.append(item["id"])
-                    except BookopsSierraError:
-                        logger.error(
-                            f"BookopsSierraError: b{sid}a | {item["id"]}. Verify."
-                        )
-                        save2csv(errors_fh, [sid, item["id"]])
-                        raise
-
-            # update bib record
-            if lpa_ref_item_exists:
-                new_lcc_bib_field = construct_lcc_field(lcc_subfields, fieldTag="q")
-                bib_new_varFields = cleanup_bib_varFields(
-                    bib_varFields, callnumbers4del, other_loc_callnumbers
-                )
-                bib_new_varFields.append(new_lcc_bib_field)
-                new_bib_data = {"varFields": bib_new_varFields}
-                req_no += 1
-                res = update_bib(sid, new_bib_data, conn)
-                logger.debug(f"Updating b{sid}a ({row}) result: {res}")
-                end = datetime.now()
-                elapsed = end - timestamp
-                logger.info(f"Saving b{sid}a actions to csv.")
-                save2csv(
-                    log_fh,
-                    [
-                        timestamp,
-                        sid,
-                        lcc,
-                        item_update_count,
-                        ",".join(items_updated),
-                        req_no,
-                        elapsed,
-                    ],
+        try:
+            reclass_bibs(
+                src_data,
+                conn,
+                audit_log,
+                errors_log,
+                workers,
+                row,
+                prefetch,
+                journal,
+                index,
+            )
+        finally:
+            if index is not None:
+                logger.info(
+                    f"Skipped {index.skipped_bibs} bibs already reclassified, "
+                    f"saved {index.requests_saved} requests."
                 )
-            row += 1
 
 
 if __name__ == "__main__":
-    # reclass("src/files/LPALCReclass/LPAOpenShelfRef-TEST.csv")
-    reclass("src/files/LPALCReclass/LPAOpenShelfRef.csv")
+    parser = argparse.ArgumentParser(description="Reclassify LPA REF items & bibs")
+    parser.add_argument(
+        "src_fh",
+        nargs="?",
+        default="src/files/LPALCReclass/LPAOpenShelfRef.csv",
+        help="path to reclass csv file",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=SIERRA_RATE)
+    parser.add_argument("--prefetch", type=int, default=0)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip bibs completed by a previous run of the same file, "
+        "required while its journal exists",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="do not skip bibs reclassified in previous runs",
+    )
+    parser.add_argument(
+        "--reset-index",
+        action="store_true",
+        help="forget bibs reclassified in previous runs before starting",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="write JSON diff of planned changes without updating Sierra",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="dry run using only saved snapshots",
+    )
+    args = parser.parse_args()
+    if args.dry_run:
+        dry_run(args.src_fh, offline=args.offline)
+    else:
+        reclass(
+            args.src_fh,
+            workers=args.workers,
+            rate=args.rate,
+            prefetch=args.prefetch,
+            resume=args.resume,
+            use_index=not args.no_index,
+            reset_index=args.reset_index,
+        )
@@ -0,0 +1,89 @@
+"""
+Local SQLite index of bibs already reclassified by lpa_reclass.
+
+The index outlives a single run and lets `reclass` skip bibs that
+already carry the requested LC class number without contacting Sierra.
+"""
+
+from datetime import datetime
+import sqlite3
+import threading
+from typing import Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bibs (
+    sid TEXT PRIMARY KEY,
+    lcc TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    updated TEXT NOT NULL
+);
+"""
+
+
+class ReclassIndex:
+    """
+    Records which LC class number was applied to each bib.
+    Counts bibs skipped by `skip_bib` and the number of Sierra API
+    requests that were saved this way.
+
+    Args:
+        db_fh:                  path to SQLite database file
+    """
+
+    def __init__(self, db_fh: str) -> None:
+        self.db_fh = db_fh
+        self.skipped_bibs = 0
+        self.requests_saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_fh, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "ReclassIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def bib_requests(self, sid: str, lcc: str) -> Optional[int]:
+        """
+        Returns number of requests the reclassification of the bib took
+        or None if the bib was not reclassified with the given LCC
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT requests FROM bibs WHERE sid = ? AND lcc = ?", (sid, lcc)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def skip_bib(self, sid: str, lcc: str) -> bool:
+        """
+        Checks if bib was already reclassified with the given LCC and
+        counts the requests saved by skipping it
+        """
+        requests = self.bib_requests(sid, lcc)
+        if requests is None:
+            return False
+        self.skipped_bibs += 1
+        self.requests_saved += requests
+        return True
+
+    def record_bib(self, sid: str, lcc: str, requests: int) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO bibs VALUES (?, ?, ?, ?)",
+            (sid, lcc, requests, datetime.now().isoformat()),
+        )
+
+    def reset(self) -> None:
+        """
+        Forgets all recorded bibs
+        """
+        self._write("DELETE FROM bibs", ())
+
+    def _write(self, sql: str, params: tuple) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(sql, params)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,20 +1,73 @@
 from datetime import datetime
+from functools import lru_cache
 import logging
 import re
-from typing import Union
+from typing import Iterable, NamedTuple, Union
 
 
 class MultiCallNumError(Exception):
     pass
 
 
+class ItemsSummary(NamedTuple):
+    """
+    Items attached to a bib as classified by `analyze_items`. Call numbers
+    are normalized, `updated` and `conflicts` hold ids of items already
+    reclassified and items with multiple call number fields.
+    """
+
+    ref_items: list[dict]
+    other_items: list[dict]
+    ref_callnumbers: set[str]
+    other_callnumbers: set[str]
+    updated: set[str]
+    conflicts: set[str]
+
+    @property
+    def callnumbers4del(self) -> set[str]:
+        """
+        Call numbers unique to LPA REF items
+        """
+        return self.ref_callnumbers - self.other_callnumbers
+
+
 mlogger = logging.getLogger("lc_reclass.utils")
 
 LCC_PATTERN = re.compile(r"(^.*\.\d{1,})(\..*)")
+CALLNUMBER_PUNCTUATION = str.maketrans("", "", '.,()"-')
+CALLNUMBER_CACHE_SIZE = 8192
 
 # MARC MANIPULATION
 
 
+def analyze_items(items: list[dict]) -> ItemsSummary:
+    """
+    Classifies items and collects their call numbers in a single traversal
+    of items and their varFields
+    """
+    summary = ItemsSummary([], [], set(), set(), set(), set())
+    for item in items:
+        if is_lpa_ref_location(item):
+            summary.ref_items.append(item)
+            callnumbers = summary.ref_callnumbers
+        else:
+            summary.other_items.append(item)
+            callnumbers = summary.other_callnumbers
+
+        callnumber_fields = 0
+        for f in item["varFields"]:
+            if f.get("marcTag") != "852":
+                continue
+            if f.get("ind1") == "0":
+                summary.updated.add(item["id"])
+            if f.get("fieldTag") in ("c", "q"):
+                callnumber_fields += 1
+                callnumbers.add(normalize_callnumber(get_callnumber(f)))
+        if callnumber_fields > 1:
+            summary.conflicts.add(item["id"])
+    return summary
+
+
 def change_item_varFields(item: dict, callnumber_field: dict) -> list[dict]:
     """
     Returns updated with LCC item varFields
@@ -48,24 +101,26 @@ def cleanup_bib_varFields(
     varFields: list[dict], callnumbers4del: set[str], other_loc_callnumbers: set[str]
 ) -> list[dict]:
     new_varFields = []
-    orphan_callnumbers = set()  # not normalized
+    orphan_callnumbers: dict[str, None] = {}  # not normalized, in bib order
     for f in varFields:
         if is_callnumber_field(f):
             callnumber = get_callnumber(f)  # ignores $m & $z
             norm_callnumber = normalize_callnumber(callnumber)
             if norm_callnumber and norm_callnumber in callnumbers4del:
-                orphan_callnumbers.add(callnumber)
+                orphan_callnumbers[callnumber] = None
             # elif norm_callnumber not in other_loc_callnumbers:
             #     orphan_callnumbers.add(callnumber)
             else:
                 new_varFields.append(f)
         else:
             new_varFields.append(f)
-    mlogger.debug(f"Orphan callnumbers: {orphan_callnumbers}")
+    mlogger.debug(f"Orphan callnumbers: {list(orphan_callnumbers)}")
     deduped_orphan_callnumbers = dedup_orphan_callnumbers(
         orphan_callnumbers
     )  # using normalization
-    for callnumber in deduped_orphan_callnumbers:
+    for callnumber, variants in deduped_orphan_callnumbers.items():
+        if len(variants) > 1:
+            mlogger.debug(f"Collapsed callnumber variants: {variants}")
         new_947_field = construct_947_field(callnumber)
         new_varFields.append(new_947_field)
 
@@ -130,19 +185,10 @@ def determine_safe_to_delete_item_callnumbers(items: list[dict]) -> set[str]:
     """
     Considers only call numbers on item records
     """
-    # callnumber belonging to other locations
-    other_callnumbers = get_other_item_callnumbers(items)
-    mlogger.debug(f"Other callnumbers: {other_callnumbers}")
-    # callnumber unique to pam11 & pah11
-    ref_callnumbers = get_ref_item_callnumbers(items)
-    mlogger.debug(f"REF callnumbers: {ref_callnumbers}")
-
-    callnumbers4del = set()
-    for callnumber in ref_callnumbers:
-        if callnumber not in other_callnumbers:
-            callnumbers4del.add(callnumber)
-
-    return callnumbers4del
+    summary = analyze_items(items)
+    mlogger.debug(f"Other callnumbers: {summary.other_callnumbers}")
+    mlogger.debug(f"REF callnumbers: {summary.ref_callnumbers}")
+    return summary.callnumbers4del
 
 
 def get_bib_callnumber(bib: dict) -> set[str]:
@@ -170,28 +216,11 @@ def get_callnumber(var_field: dict) -> str:
 
 
 def get_other_item_callnumbers(items: list[dict]) -> set[str]:
-    callnumbers = set()
-    for i in items:
-        if not is_lpa_ref_location(i):
-            for f in i["varFields"]:
-                if is_callnumber_field(f):
-                    callnumber = get_callnumber(f)
-                    norm_callnumber = normalize_callnumber(callnumber)
-                    mlogger.debug(f"Norm callnumber: {norm_callnumber}")
-                    callnumbers.add(norm_callnumber)
-    return callnumbers
+    return analyze_items(items).other_callnumbers
 
 
 def get_ref_item_callnumbers(items: list[dict]) -> set[str]:
-    callnumbers = set()
-    for i in items:
-        if is_lpa_ref_location(i):
-            for f in i["varFields"]:
-                if is_callnumber_field(f):
-                    callnumber = get_callnumber(f)
-                    norm_callnumber = normalize_callnumber(callnumber)
-                    callnumbers.add(norm_callnumber)
-    return callnumbers
+    return analyze_items(items).ref_callnumbers
 
 
 def get_item_nos_from_bib_response(urls: list[str]) -> list[str]:
@@ -228,22 +257,29 @@ def item_is_updated(item: dict) -> bool:
     return False
 
 
+@lru_cache(maxsize=CALLNUMBER_CACHE_SIZE)
 def normalize_callnumber(value: str) -> str:
-    norm_value = re.sub(r'\.|,|\(|\)|"|-', "", value).strip()
-    return norm_value
+    """
+    Removes punctuation from call number. Results are cached since the same
+    call numbers repeat across items and fields of a bib.
+    """
+    return value.translate(CALLNUMBER_PUNCTUATION).strip()
+
 
+def dedup_orphan_callnumbers(callnumbers: Iterable[str]) -> dict[str, list[str]]:
+    """
+    Deduplicates call numbers using normalization. The first variant of each
+    normalized call number is kept and call numbers stay in input order.
 
-def dedup_orphan_callnumbers(callnumbers: set[str]) -> set[str]:
-    norm_callnumbers = []
-    deduped_callnumbers = set()
+    Returns:
+        kept call numbers mapped to all raw variants collapsed into them
+    """
+    variants_by_norm: dict[str, list[str]] = {}
     for c in callnumbers:
-        norm_c = normalize_callnumber(c)
-        if norm_c in norm_callnumbers:
-            continue
-        else:
-            norm_callnumbers.append(norm_c)
-            deduped_callnumbers.add(c)
-    return deduped_callnumbers
+        variants = variants_by_norm.setdefault(normalize_callnumber(c), [])
+        if c not in variants:
+            variants.append(c)
+    return {variants[0]: variants for variants in variants_by_norm.values()}
 
 
 def split_into_batches(lst: list[str], batch_size=5) -> list[list[str]]:
@@ -2,19 +2,23 @@
 Crosswalk between map csv data and MARC21
 """
 
-from collections import namedtuple
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import csv
-from datetime import datetime, date
+from datetime import datetime, timezone
+from functools import lru_cache
+import os
 import re
+from typing import Iterator, Optional
 import warnings
 
-from pymarc import Record, Field
+from pymarc import Record, Field, Subfield
 
 
 try:
-    from .utils import save2marc
+    from .utils import MarcWriter, RawMarcBuilder, add_ordered_fields, encode_field
 except ImportError:
-    from utils import save2marc
+    from utils import MarcWriter, RawMarcBuilder, add_ordered_fields, encode_field
 
 
 class SuspiciousDataWarning(Warning):
@@ -46,15 +50,128 @@ MapData = namedtuple(
 )
 
 
+MAP_LEADER = "00000cem a2200000Mi 4500"
+SUBJECT_CACHE_SIZE = 4096
+
+TRUE_HYPHEN_PATTERN = re.compile(r"\S-\S")
+SUBFIELD_SEPARATOR_PATTERN = re.compile(r"\s-{1,}|-{1,}\s|-{2,}")
+INVALID_LAST_CHR_PATTERN = re.compile(r"[\s.,;]+\Z")
+
+TOPICAL_SUBDIVISIONS = ("history", "discoveries")
+TIME_SUBDIVISIONS = ("war",)
+# subject subdivision keywords and subfield codes they are coded with,
+# topical keywords take precedence over chronological ones
+SUBDIVISION_SUBFIELDS = {
+    **{keyword: "x" for keyword in TOPICAL_SUBDIVISIONS},
+    **{keyword: "y" for keyword in TIME_SUBDIVISIONS},
+}
+
+
 def determine_control_number_sequence(n):
     return str(n).zfill(8)
 
 
-def create_timestamp():
-    ts = datetime.utcnow()
+def create_timestamp(ts: Optional[datetime] = None):
+    if ts is None:
+        ts = datetime.now(timezone.utc)
     return ts.strftime("%Y%m%d%H%M%S.0")
 
 
+def clone_field(field: Field) -> Field:
+    """
+    Returns a copy of the field that does not share its subfield list.
+    `pymarc.Subfield` and `pymarc.Indicators` are immutable and reused.
+    """
+    if field.control_field:
+        return Field(tag=field.tag, data=field.data)
+    return Field(
+        tag=field.tag, indicators=field.indicators, subfields=list(field.subfields)
+    )
+
+
+class BatchContext:
+    """
+    Values shared by all records created in one run of `create_bibs`.
+
+    Timestamps are frozen when the batch is created, so all records
+    of a batch carry the same load date, and fields identical for every
+    record are built only once. Use `field` to get a per-record copy.
+
+    Args:
+        created:                batch creation time, defaults to now
+    """
+
+    def __init__(self, created: Optional[datetime] = None) -> None:
+        if created is None:
+            created = datetime.now()
+        self.created = created
+        self.timestamp = create_timestamp(created.astimezone(timezone.utc))
+        self.date_created = f"{created:%y%m%d}"
+        self.fields = {
+            "003": Field(tag="003", data="BookOps"),
+            "005": Field(tag="005", data=self.timestamp),
+            "007": Field(tag="007", data="aj canzn"),
+            "300": Field(
+                tag="300",
+                indicators=[" ", " "],
+                subfields=[
+                    Subfield(code="a", value="1 folded map :"),
+                    Subfield(code="b", value="color"),
+                ],
+            ),
+            "336": Field(
+                tag="336",
+                indicators=[" ", " "],
+                subfields=[
+                    Subfield(code="a", value="cartographic image"),
+                    Subfield(code="b", value="cri"),
+                    Subfield(code="2", value="rdacontent"),
+                ],
+            ),
+            "337": Field(
+                tag="337",
+                indicators=[" ", " "],
+                subfields=[
+                    Subfield(code="a", value="unmediated"),
+                    Subfield(code="b", value="n"),
+                    Subfield(code="2", value="rddcontent"),
+                ],
+            ),
+            "338": Field(
+                tag="338",
+                indicators=[" ", " "],
+                subfields=[
+                    Subfield(code="a", value="sheet"),
+                    Subfield(code="b", value="nb"),
+                    Subfield(code="2", value="rdacontent"),
+                ],
+            ),
+            "901": Field(
+                tag="901",
+                indicators=[" ", " "],
+                subfields=[
+                    Subfield(code="a", value="MAP DIV folded maps project"),
+                    Subfield(code="n", value=f"{created:%Y%m%d}"),
+                ],
+            ),
+            "910": Field(
+                tag="910",
+                indicators=[" ", " "],
+                subfields=[Subfield(code="a", value="RL")],
+            ),
+            "949": Field(
+                tag="949",
+                indicators=[" ", " "],
+                subfields=[Subfield(code="a", value="*b2=e;b3=k;bn=map;")],
+            ),
+        }
+
+        self.encoded = {tag: encode_field(f) for tag, f in self.fields.items()}
+
+    def field(self, tag: str) -> Field:
+        return clone_field(self.fields[tag])
+
+
 def encode_scale(scale):
     if ":" in scale:
         idx = scale.index(":")
@@ -89,14 +206,9 @@ def norm_pub_date_text(pub_date):
 
 
 def has_true_hyphen(s):
-    m = re.compile(r".*\S\-\S.*").match(s)
-    if m:
-        if "--" in s:
-            return False
-        else:
-            return True
-    else:
+    if "--" in s:
         return False
+    return TRUE_HYPHEN_PATTERN.search(s) is not None
 
 
 def norm_subfield_separator(s):
@@ -106,9 +218,7 @@ def norm_subfield_separator(s):
     if has_true_hyphen(s):
         warnings.warn(f"{s}", SuspiciousDataWarning)
 
-    s, n = re.subn(r"\s-{1,}|-{1,}\s|-{2,}", "@", s)
-
-    return s
+    return SUBFIELD_SEPARATOR_PATTERN.sub("@", s)
 
 
 def split_subject_elements(s):
@@ -120,73 +230,45 @@ def split_subject_elements(s):
     return [e.strip() for e in data]
 
 
-def is_topical_subdivision(sub):
-    found = False
-    topical = ["history", "discoveries"]
-    for s in topical:
-        if s in sub.lower():
-            found = True
-            break
-    return found
-
+def subdivision_subfield_code(sub, subdivisions=SUBDIVISION_SUBFIELDS):
+    """
+    Returns subfield code of the first keyword found in the subdivision
+    or "z" (geographic) if none matches
 
-def is_time_subdivision(sub):
-    found = False
-    period = ["war"]
-    for s in period:
-        if s in sub.lower():
-            found = True
-            break
-    return found
+    Args:
+        sub:                    subject subdivision
+        subdivisions:           mapping of keywords to subfield codes,
+                                keywords are checked in mapping order
+    """
+    sub = sub.lower()
+    for keyword, code in subdivisions.items():
+        if keyword in sub:
+            return code
+    return "z"
 
 
 def has_invalid_last_chr(sub):
-    pattern = re.compile(r".*[\s.,;]$")
-    if pattern.match(sub):
-        return True
-    else:
-        return False
+    return INVALID_LAST_CHR_PATTERN.search(sub) is not None
 
 
 def norm_last_subfield(sub):
-    while has_invalid_last_chr(sub):
-        sub = sub[:-1]
-    return f"{sub}."
+    return f"{INVALID_LAST_CHR_PATTERN.sub('', sub)}."
 
 
-def construct_subject_subfields(s):
+def construct_subject_subfields(s, subdivisions=SUBDIVISION_SUBFIELDS):
     """
     Generates subject subfields for 651 tag as a pymarc list
 
     """
     elems = split_subject_elements(s)
 
-    subA = elems[0]
-    subV = elems[-1]
-
     if len(elems) == 1:
-        subA = norm_last_subfield(subA)
-
-    subV = norm_last_subfield(subV)
-
-    if len(elems) > 2:
-        other_subs = elems[1:-1]
-    else:
-        other_subs = []
+        return ["a", norm_last_subfield(elems[0])]
 
-    subfields = []
-    subfields.extend(["a", subA])
-    if other_subs:
-        for sub in other_subs:
-            if is_topical_subdivision(sub):
-                subfields.extend(["x", sub])
-            elif is_time_subdivision(sub):
-                subfields.extend(["y", sub])
-            else:
-                subfields.extend(["z", sub])
-
-    if len(elems) > 1:
-        subfields.extend(["v", f"{subV}"])
+    subfields = ["a", elems[0]]
+    for sub in elems[1:-1]:
+        subfields.extend([subdivision_subfield_code(sub, subdivisions), sub])
+    subfields.extend(["v", norm_last_subfield(elems[-1])])
     return subfields
 
 
@@ -270,6 +352,17 @@ def construct_corporate_author_subfields(s):
     return subfields
 
 
+def to_subfields(subfields: list[str]) -> list[Subfield]:
+    """
+    Converts a flat list of subfield codes and values into
+    a list of `pymarc.Subfield`
+    """
+    return [
+        Subfield(code=code, value=value)
+        for code, value in zip(subfields[::2], subfields[1::2])
+    ]
+
+
 def subject_indicators(tag):
     if tag == "600":
         indicators = ["1", "0"]
@@ -282,75 +375,143 @@ def subject_indicators(tag):
     return indicators
 
 
+@lru_cache(maxsize=SUBJECT_CACHE_SIZE)
+def encode_subject_subfields(tag: str, s: str) -> tuple[Subfield, ...]:
+    """
+    Parses subject string into subfields. Results are cached per
+    (tag, subject string) since the same subjects repeat across
+    the map inventory. The returned tuple and `pymarc.Subfield`
+    are immutable, so they can be safely shared between records.
+    """
+    return tuple(to_subfields(construct_subject_subfields(s)))
+
+
+def subject_cache_usage(start) -> tuple[int, int]:
+    """
+    Returns number of subject cache hits and misses since `start`
+    """
+    info = encode_subject_subfields.cache_info()
+    return (info.hits - start.hits, info.misses - start.misses)
+
+
+def split_subjects(sub_str):
+    return [s.strip() for s in sub_str.split(";") if s.strip() != ""]
+
+
 def encode_subjects(sub_str, tag):
 
     indicators = subject_indicators(tag)
 
     fields = []
-    subjects = [s.strip() for s in sub_str.split(";") if s.strip() != ""]
-    for s in subjects:
-        subfields = construct_subject_subfields(s)
+    for s in split_subjects(sub_str):
+        subfields = list(encode_subject_subfields(tag, s))
         fields.append(Field(tag=tag, indicators=indicators, subfields=subfields))
     return fields
 
 
-def make_bib(row: namedtuple, sequence: int):
-    bib = Record()
-    # leader
-    bib.leader = "00000cem a2200000Mi 4500"
+class FieldCollector:
+    """
+    Collects fields passed to `write_fields` as `pymarc.Field`.
+    Subfield lists are copied, so collected fields can be modified.
+
+    Args:
+        batch:                  `BatchContext` of the run
+    """
+
+    def __init__(self, batch: BatchContext) -> None:
+        self.batch = batch
+        self.fields: list[Field] = []
+
+    def add_control_field(self, tag: str, data: str) -> None:
+        self.fields.append(Field(tag=tag, data=data))
+
+    def add_data_field(self, tag: str, indicators, subfields) -> None:
+        self.fields.append(
+            Field(tag=tag, indicators=indicators, subfields=list(subfields))
+        )
+
+    def add_constant_field(self, tag: str) -> None:
+        self.fields.append(self.batch.field(tag))
 
-    tags = []
+
+class EncodedFieldWriter:
+    """
+    Writes fields passed to `write_fields` straight to `utils.RawMarcBuilder`.
+    Constant fields are written from bytes encoded once per batch.
+
+    Args:
+        builder:                `utils.RawMarcBuilder` of the record
+        batch:                  `BatchContext` of the run
+    """
+
+    def __init__(self, builder: RawMarcBuilder, batch: BatchContext) -> None:
+        self.batch = batch
+        self.add_control_field = builder.add_control_field
+        self.add_data_field = builder.add_data_field
+        self._add_encoded = builder.add_encoded
+
+    def add_constant_field(self, tag: str) -> None:
+        self._add_encoded(tag, self.batch.encoded[tag])
+
+
+def write_fields(row: namedtuple, sequence: int, batch: BatchContext, writer) -> None:
+    """
+    Passes fields of a map record ordered by tag to the writer.
+
+    Args:
+        row:                    map csv data
+        sequence:               control number sequence
+        batch:                  `BatchContext` of the run
+        writer:                 `FieldCollector` or `EncodedFieldWriter`, any
+                                object with `add_control_field`,
+                                `add_data_field`, and `add_constant_field`
+                                methods
+    """
+    add_control_field = writer.add_control_field
+    add_data_field = writer.add_data_field
+    constant = writer.add_constant_field
 
     # 001 tag
     control_no = f"bkops-map-{sequence}"
-    tags.append(Field(tag="001", data=f"{control_no}"))
+    add_control_field("001", f"{control_no}")
 
     # 003 tag
-    tags.append(Field(tag="003", data="BookOps"))
+    constant("003")
 
     # 005 tag
-
-    timestamp = create_timestamp()
-    tags.append(Field(tag="005", data=timestamp))
+    constant("005")
 
     # 007 tag
-
-    tags.append(
-        Field(
-            tag="007",
-            data="aj canzn",
-        )
-    )
+    constant("007")
 
     # 008 tag
-    dateCreated = date.strftime(date.today(), "%y%m%d")
+    dateCreated = batch.date_created
     pub_year = encode_pub_date(row.t260)
     data = f"{dateCreated}s{pub_year}    xx |||||| a  |  |   und d"
-    tags.append(Field(tag="008", data=data))
+    add_control_field("008", data)
 
     # 034 tag
 
     esc = encode_scale(row.t255)
     if esc is not None:
-        tags.append(
-            Field(tag="034", indicators=["1", " "], subfields=["a", "a", "b", esc])
+        add_data_field(
+            "034",
+            ["1", " "],
+            [
+                Subfield(code="a", value="a"),
+                Subfield(code="b", value=esc),
+            ],
         )
 
     # 100 tag
     if row.t100:
         subfields = construct_personal_author_subfields(row.t100)
-        tags.append(Field(tag="100", indicators=["1", " "], subfields=subfields))
+        add_data_field("100", ["1", " "], to_subfields(subfields))
 
     # 110 tag
     if row.t110 and not row.t100:
         subfields = construct_corporate_author_subfields(row.t110)
-        tags.append(
-            Field(
-                tag="110",
-                indicators=["1", " "],
-                subfields=subfields,
-            )
-        )
+        add_data_field("110", ["1", " "], to_subfields(subfields))
 
     # 245 tag
     if not row.t100 and not row.t110:
@@ -359,31 +520,23 @@ def make_bib(row: namedtuple, sequence: int):
         indicators = ["1", "0"]
 
     if row.t245:
-        tags.append(
-            Field(
-                tag="245",
-                indicators=indicators,
-                subfields=["a", f"{row.t245.strip()}."],
-            )
+        add_data_field(
+            "245", indicators, [Subfield(code="a", value=f"{row.t245.strip()}.")]
         )
     else:
         warnings.warn(f"{control_no} record missing title", SuspiciousDataWarning)
 
     # 246 tag
     if row.t246:
-        tags.append(
-            Field(tag="246", indicators=["3", " "], subfields=["a", row.t246.strip()])
-        )
+        add_data_field("246", ["3", " "], [Subfield(code="a", value=row.t246.strip())])
 
     # 250 tag
     if row.t250:
-        tags.append(
-            Field(tag="250", indicators=[" ", " "], subfields=["a", row.t250.strip()])
-        )
+        add_data_field("250", [" ", " "], [Subfield(code="a", value=row.t250.strip())])
 
     # 255 tag
     nsc = norm_scale_text(row.t255)
-    tags.append(Field(tag="255", indicators=[" ", " "], subfields=["a", nsc]))
+    add_data_field("255", [" ", " "], [Subfield(code="a", value=nsc)])
 
     # 264 tag
     # if row.t100:
@@ -394,111 +547,62 @@ def make_bib(row: namedtuple, sequence: int):
         publisher = "[Publisher not identified]"
     npub_date = norm_pub_date_text(row.t260)
 
-    tags.append(
-        Field(
-            tag="264",
-            indicators=[" ", "1"],
-            subfields=[
-                "a",
-                "[Place of publication not identified] :",
-                "b",
-                f"{publisher},",
-                "c",
-                npub_date,
-            ],
-        )
+    add_data_field(
+        "264",
+        [" ", "1"],
+        [
+            Subfield(code="a", value="[Place of publication not identified] :"),
+            Subfield(code="b", value=f"{publisher},"),
+            Subfield(code="c", value=npub_date),
+        ],
     )
 
     # tag 300
-    tags.append(
-        Field(
-            tag="300",
-            indicators=[" ", " "],
-            subfields=["a", "1 folded map :", "b", "color"],
-        )
-    )
+    constant("300")
 
-    tags.append(
-        Field(
-            tag="336",
-            indicators=[" ", " "],
-            subfields=["a", "cartographic image", "b", "cri", "2", "rdacontent"],
-        )
-    )
-    tags.append(
-        Field(
-            tag="337",
-            indicators=[" ", " "],
-            subfields=["a", "unmediated", "b", "n", "2", "rddcontent"],
-        )
-    )
-    tags.append(
-        Field(
-            tag="338",
-            indicators=[" ", " "],
-            subfields=["a", "sheet", "b", "nb", "2", "rdacontent"],
-        )
-    )
+    # tags 336-338
+    constant("336")
+    constant("337")
+    constant("338")
 
     # 490 tag
     if row.t490:
-        tags.append(
-            Field(tag="490", indicators=["0", " "], subfields=["a", row.t490.strip()])
-        )
+        add_data_field("490", ["0", " "], [Subfield(code="a", value=row.t490.strip())])
 
     # 500 tag
     if row.t500:
-        tags.append(
-            Field(
-                tag="500",
-                indicators=[" ", " "],
-                subfields=["a", f"{row.t500.strip()}."],
-            )
+        add_data_field(
+            "500", [" ", " "], [Subfield(code="a", value=f"{row.t500.strip()}.")]
         )
 
     # 505 tag
     if row.t505:
-        tags.append(
-            Field(
-                tag="505",
-                indicators=["0", " "],
-                subfields=["a", f"{row.t505.strip()}."],
-            )
+        add_data_field(
+            "505", ["0", " "], [Subfield(code="a", value=f"{row.t505.strip()}.")]
         )
 
-    # 600 tags
-    if row.t600:
-        subject_fields = encode_subjects(row.t600, "600")
-        tags.extend(subject_fields)
-
-    # 610 tags
-    if row.t610:
-        subject_fields = encode_subjects(row.t610, "610")
-        tags.extend(subject_fields)
-
-    # 611 tags
-    if row.t611:
-        subject_fields = encode_subjects(row.t611, "611")
-        tags.extend(subject_fields)
-
-    # 650 tags
-    if row.t650:
-        subject_fields = encode_subjects(row.t650, "650")
-        tags.extend(subject_fields)
-
-    # 651 tags
-    if row.t651:
-        subject_fields = encode_subjects(row.t651, "651")
-        tags.extend(subject_fields)
+    # 600, 610, 611, 650, and 651 tags
+    for tag, sub_str in (
+        ("600", row.t600),
+        ("610", row.t610),
+        ("611", row.t611),
+        ("650", row.t650),
+        ("651", row.t651),
+    ):
+        if sub_str:
+            indicators = subject_indicators(tag)
+            for s in split_subjects(sub_str):
+                add_data_field(tag, indicators, encode_subject_subfields(tag, s))
 
     # 655 tag
     if row.t655:
-        tags.append(
-            Field(
-                tag="655",
-                indicators=[" ", "7"],
-                subfields=["a", f"{row.t655}.", "2", "lcgft"],
-            )
+        add_data_field(
+            "655",
+            [" ", "7"],
+            [
+                Subfield(code="a", value=f"{row.t655}."),
+                Subfield(code="2", value="lcgft"),
+            ],
         )
 
     # tag 852
@@ -510,50 +614,160 @@ def make_bib(row: namedtuple, sequence: int):
         warnings.warn(f"{control_no} has malformed call number", SuspiciousDataWarning)
 
     if call_no:
-        tags.append(Field(tag="852", indicators=["8", " "], subfields=["h", call_no]))
+        add_data_field("852", ["8", " "], [Subfield(code="h", value=call_no)])
 
     # add 901 tag
-    tags.append(
-        Field(
-            tag="901",
-            indicators=[" ", " "],
-            subfields=[
-                "a",
-                "MAP DIV folded maps project",
-                "n",
-                f"{datetime.now():%Y%m%d}",
-            ],
-        )
-    )
+    constant("901")
 
     # add 910 tag for Research libraries
-    tags.append(Field(tag="910", indicators=[" ", " "], subfields=["a", "RL"]))
+    constant("910")
 
     # 949 tag with Sierra commands
-    tags.append(
-        Field(tag="949", indicators=[" ", " "], subfields=["a", "*b2=e;b3=k;bn=map;"])
-    )
+    constant("949")
+
+
+def build_fields(row: namedtuple, sequence: int, batch: BatchContext) -> list[Field]:
+    """
+    Creates fields of a map record ordered by tag.
 
-    for t in tags:
-        bib.add_ordered_field(t)
+    Args:
+        row:                    map csv data
+        sequence:               control number sequence
+        batch:                  `BatchContext` of the run
+    """
+    collector = FieldCollector(batch)
+    write_fields(row, sequence, batch, collector)
+    return collector.fields
+
+
+def make_bib(row: namedtuple, sequence: int, batch: Optional[BatchContext] = None):
+    if batch is None:
+        batch = BatchContext()
+
+    bib = Record()
+    # leader
+    bib.leader = MAP_LEADER
+
+    add_ordered_fields(bib, build_fields(row, sequence, batch))
 
     return bib
 
 
+def make_bib_marc(
+    row: namedtuple, sequence: int, batch: Optional[BatchContext] = None
+) -> bytes:
+    """
+    Creates serialized MARC21 record without building `pymarc.Record`
+    or `pymarc.Field` objects. Fields are encoded straight into
+    `utils.RawMarcBuilder` and constant fields are written from bytes
+    encoded once per batch. The output is identical to
+    `make_bib(row, sequence, batch).as_marc()`.
+    """
+    if batch is None:
+        batch = BatchContext()
+
+    builder = RawMarcBuilder(MAP_LEADER)
+    write_fields(row, sequence, batch, EncodedFieldWriter(builder, batch))
+    return builder.as_marc()
+
+
 def source_reader(fh: str):
     for row in map(MapData._make, csv.reader(open(fh, "r", encoding="utf-8"))):
         if row.barcode != "Barcode":
             yield row
 
 
-def create_bibs(src_fh: str, out_fh: str, start_sequence: int):
+def chunk_rows(
+    reader: Iterator[MapData], start_sequence: int, chunk_size: int
+) -> Iterator[list[tuple[int, MapData]]]:
+    """
+    Groups source rows into chunks of (sequence, row) pairs. Sequences are
+    assigned here, in source order, so they do not depend on which worker
+    builds the record.
+    """
+    chunk = []
+    for sequence, row in enumerate(reader, start=start_sequence):
+        chunk.append((sequence, row))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_chunk(
+    chunk: list[tuple[int, MapData]], batch: BatchContext
+) -> tuple[list[bytes], int, int]:
+    """
+    Builds and serializes records for a chunk of rows
+
+    Returns:
+        serialized records, subject cache hits and misses
+    """
+    start = encode_subject_subfields.cache_info()
+    records = [
+        make_bib_marc(row, determine_control_number_sequence(sequence), batch)
+        for sequence, row in chunk
+    ]
+    hits, misses = subject_cache_usage(start)
+    return (records, hits, misses)
+
+
+def build_in_pool(
+    chunks: Iterator[list[tuple[int, MapData]]], workers: int, batch: BatchContext
+) -> Iterator[tuple[list[bytes], int, int]]:
+    """
+    Builds chunks on a pool of processes and yields results in the order
+    chunks were submitted. At most two chunks per worker are in flight.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(build_chunk, chunk, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def create_bibs(
+    src_fh: str,
+    out_fh: str,
+    start_sequence: int,
+    workers: Optional[int] = 1,
+    chunk_size: int = 500,
+):
+    """
+    Converts map csv data to MARC21 file.
+
+    With `workers` other than 1 records are built in chunks by a pool of
+    processes (`None` uses all cores). Chunks are written in source order,
+    so the output is the same as in the serial mode.
+    """
     reader = source_reader(src_fh)
-    sequence = start_sequence
-    for row in reader:
-        s = determine_control_number_sequence(sequence)
-        bib = make_bib(row, s)
-        save2marc(out_fh, bib)
-        sequence += 1
+    batch = BatchContext()
+    with MarcWriter(out_fh) as writer:
+        if workers == 1:
+            start = encode_subject_subfields.cache_info()
+            sequence = start_sequence
+            for row in reader:
+                s = determine_control_number_sequence(sequence)
+                writer.write_raw(make_bib_marc(row, s, batch))
+                sequence += 1
+            hits, misses = subject_cache_usage(start)
+        else:
+            hits = misses = 0
+            chunks = chunk_rows(reader, start_sequence, chunk_size)
+            workers = workers or os.cpu_count() or 1
+            for records, chunk_hits, chunk_misses in build_in_pool(
+                chunks, workers, batch
+            ):
+                for data in records:
+                    writer.write_raw(data)
+                hits += chunk_hits
+                misses += chunk_misses
+
+    print(f"Subject cache: {hits} hits, {misses} misses.")
 
 
 if __name__ == "__main__":
@@ -562,4 +776,4 @@ if __name__ == "__main__":
     out_fh = "./files/Maps/folded-maps-220331-national-geo.mrc"
 
     # check start sequence in NYPL Sierra
-    create_bibs(src_fh, out_fh, 830)
+    create_bibs(src_fh, out_fh, 830, workers=None)
@@ -0,0 +1,123 @@
+"""
+Pre-flight validation of map csv data before running maps_crosswalk.
+
+Loads the whole spreadsheet at once as columns and flags all rows that
+`maps_crosswalk.make_bib` would report with `SuspiciousDataWarning`.
+
+To run the script, open your command-line tool, and enter:
+$ python src/maps_validator.py [src csv file path] [report csv file path]
+"""
+
+import sys
+from typing import Optional
+
+import pandas as pd
+
+try:
+    from .maps_crosswalk import MapData, TRUE_HYPHEN_PATTERN
+except ImportError:
+    from maps_crosswalk import MapData, TRUE_HYPHEN_PATTERN
+
+
+SUBJECT_COLUMNS = ["t600", "t610", "t611", "t650", "t651"]
+REPORT_COLUMNS = ["row", "barcode", "control_no", "column", "issue", "value"]
+
+
+def load_map_data(src_fh: str) -> pd.DataFrame:
+    """
+    Reads map csv data into a data frame with `MapData` columns.
+    Header rows are dropped and the 1-based csv row number is kept
+    in the `row` column.
+
+    Args:
+        src_fh:                 path to map csv file
+
+    Returns:
+        `pandas.DataFrame` instance
+    """
+    df = pd.read_csv(
+        src_fh,
+        header=None,
+        names=MapData._fields,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+    )
+    df["row"] = df.index + 1
+    return df[df["barcode"] != "Barcode"].reset_index(drop=True)
+
+
+def issues_frame(
+    df: pd.DataFrame, mask: pd.Series, column: str, issue: str
+) -> pd.DataFrame:
+    flagged = df.loc[mask, ["row", "barcode", "control_no", column]]
+    return flagged.rename(columns={column: "value"}).assign(column=column, issue=issue)
+
+
+def find_hyphen_issues(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    Flags individual subjects in a column that include a hyphen
+    that is not a subfield separator
+    """
+    subjects = df[column].str.split(";").explode().str.strip()
+    subjects = subjects[subjects != ""]
+    mask = subjects.str.contains(TRUE_HYPHEN_PATTERN) & ~subjects.str.contains(
+        "--", regex=False
+    )
+    subjects = subjects[mask]
+    flagged = df.loc[subjects.index, ["row", "barcode", "control_no"]]
+    return flagged.assign(
+        column=column, issue="hyphen in subject", value=subjects.values
+    )
+
+
+def validate_map_data(
+    src_fh: str, report_fh: Optional[str] = None, start_sequence: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Finds all suspicious rows of map csv data in one pass.
+
+    Args:
+        src_fh:                 path to map csv file
+        report_fh:              path to csv report to be written
+        start_sequence:         start sequence of control numbers, if given
+                                the report includes control numbers the rows
+                                would be assigned by `create_bibs`
+
+    Returns:
+        `pandas.DataFrame` with one row per issue found
+    """
+    df = load_map_data(src_fh)
+    if start_sequence is None:
+        df["control_no"] = ""
+    else:
+        sequences = pd.Series(range(start_sequence, start_sequence + len(df)))
+        df["control_no"] = "bkops-map-" + sequences.astype(str).str.zfill(8)
+
+    call_no = df["t852"].str.strip()
+    frames = [
+        issues_frame(df, df["t245"] == "", "t245", "missing title"),
+        issues_frame(df, call_no == "", "t852", "missing 852 tag"),
+        issues_frame(
+            df,
+            (call_no != "") & ~call_no.str.contains("Map Div. ", regex=False),
+            "t852",
+            "malformed call number",
+        ),
+    ]
+    frames.extend(find_hyphen_issues(df, column) for column in SUBJECT_COLUMNS)
+
+    report = (
+        pd.concat(frames, ignore_index=True)
+        .sort_values(["row", "column"], kind="stable")
+        .reset_index(drop=True)[REPORT_COLUMNS]
+    )
+
+    if report_fh is not None:
+        report.to_csv(report_fh, index=False, encoding="utf-8")
+    return report
+
+
+if __name__ == "__main__":
+    report = validate_map_data(sys.argv[1], sys.argv[2])
+    print(f"Found {len(report)} issues in {report['row'].nunique()} rows.")
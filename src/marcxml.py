@@ -0,0 +1,141 @@
+"""
+Streaming MARCXML decoder.
+
+Decodes MARCXML into pymarc `Record` objects one record at a time with
+`xml.etree.ElementTree.XMLPullParser`. Each record element is discarded
+as soon as its `Record` is built, so memory use does not grow with the
+number of records. Several complete documents, for example Worldcat
+responses, can be fed to the same decoder one after another.
+"""
+
+import re
+from typing import BinaryIO, Iterable, Iterator, Union
+from xml.etree.ElementTree import Element, XMLPullParser
+
+from pymarc import Field, Indicators, Leader, Record, Subfield
+
+
+READ_CHUNK_SIZE = 64 * 1024  # bytes
+XML_DECLARATION = re.compile(rb"<\?xml\s[^?]*\?>")
+
+
+def local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def element2record(elem: Element) -> Record:
+    """
+    Builds pymarc `Record` from MARCXML record element the same way
+    `pymarc.parse_xml_to_array` does
+    """
+    record = Record()
+    for child in elem:
+        name = local_name(child.tag)
+        if name == "leader":
+            record.leader = Leader(child.text or "")
+        elif name == "controlfield":
+            record.add_field(Field(child.get("tag"), data=child.text or ""))
+        elif name == "datafield":
+            subfields = [
+                Subfield(s.get("code"), s.text or "")
+                for s in child
+                if local_name(s.tag) == "subfield"
+            ]
+            record.add_field(
+                Field(
+                    child.get("tag"),
+                    Indicators(child.get("ind1", " "), child.get("ind2", " ")),
+                    subfields,
+                )
+            )
+    return record
+
+
+class MarcXmlDecoder:
+    """
+    Incremental MARCXML decoder. Data is passed to `feed` as it arrives
+    and decoded records are taken with `read_records`. Documents fed one
+    after another are decoded as if they were a single collection; their
+    XML declarations are dropped.
+    """
+
+    def __init__(self) -> None:
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._parser.feed(b"<batch>")
+        self._stack: list[Element] = []
+        self._tail = b""
+
+    def feed(self, data: bytes) -> None:
+        data = XML_DECLARATION.sub(b"", self._tail + data)
+        # hold back a tag split between chunks, it may be a declaration
+        start = data.rfind(b"<")
+        if start != -1 and b">" not in data[start:]:
+            self._tail = data[start:]
+            data = data[:start]
+        else:
+            self._tail = b""
+        self._parser.feed(data)
+
+    def close(self) -> list[Record]:
+        """
+        Finishes decoding and returns remaining records
+        """
+        self._parser.feed(self._tail + b"</batch>")
+        self._tail = b""
+        records = list(self.read_records())
+        self._parser.close()
+        return records
+
+    def read_records(self) -> Iterator[Record]:
+        """
+        Yields records completed by data fed so far
+        """
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                self._stack.append(elem)
+                continue
+            self._stack.pop()
+            is_record = local_name(elem.tag) == "record"
+            if is_record:
+                record = element2record(elem)
+            # drop decoded records and finished documents
+            if self._stack and (is_record or len(self._stack) == 1):
+                elem.clear()
+                self._stack[-1].remove(elem)
+            if is_record:
+                yield record
+
+
+def iter_marcxml(source: Union[str, bytes, BinaryIO]) -> Iterator[Record]:
+    """
+    Yields records of a MARCXML file or document
+
+    Args:
+        source:                 path to MARCXML file, MARCXML document, or
+                                binary file object; may contain several
+                                concatenated documents
+    """
+    if isinstance(source, bytes):
+        yield from iter_marcxml_documents([source])
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from iter_marcxml(f)
+    else:
+        yield from iter_marcxml_documents(
+            iter(lambda: source.read(READ_CHUNK_SIZE), b"")
+        )
+
+
+def iter_marcxml_documents(chunks: Iterable[bytes]) -> Iterator[Record]:
+    """
+    Yields records of MARCXML documents or chunks of them, for example
+    contents of several Worldcat full bib responses
+
+    Args:
+        chunks:                 consecutive pieces of MARCXML
+    """
+    decoder = MarcXmlDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+        yield from decoder.read_records()
+    yield from decoder.close()
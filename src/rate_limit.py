@@ -0,0 +1,171 @@
+"""
+Request throttling shared by all threads talking to the same web service.
+
+`RateLimiter` is a token bucket that can be attached to any
+`requests.Session` (including `SierraSession` and `MetadataSession`).
+The request rate is adapted to the service responses: it is cut in half
+each time the service answers with 429 or 5xx and recovers gradually with
+successful requests (AIMD). `Retry-After` headers pause all requests
+sharing the limiter for the time the service asked for. Only idempotent
+requests are resent after a 5xx; a POST is resent only when the service
+rejected it with 429 and `Retry-After`, so it cannot be applied twice.
+"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import threading
+import time
+from typing import Optional
+
+
+# default max requests per second
+SIERRA_RATE = 4.0
+WORLDCAT_RATE = 5.0
+
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE"])
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEPS = 20
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Converts `Retry-After` header value (seconds or HTTP date) to seconds
+
+    Args:
+        value:                  `Retry-After` header value
+
+    Returns:
+        number of seconds to wait or None if value is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(method: Optional[str], status_code: int, retry_after) -> bool:
+    """
+    Checks if request can be safely resent after the given response
+
+    Args:
+        method:                 HTTP method of the request
+        status_code:            HTTP status code of the response
+        retry_after:            seconds the service asked to wait or None
+    """
+    if status_code not in RETRY_STATUS:
+        return False
+    if method is not None and method.upper() in IDEMPOTENT_METHODS:
+        return True
+    # service did not process the request and told when to send it again
+    return status_code == 429 and retry_after is not None
+
+
+class RateLimiter:
+    """
+    Token bucket that allows no more than `rate` requests per second on
+    average, regardless of how many threads share the limiter.
+
+    Args:
+        rate:                   max number of requests per second
+        burst:                  max number of requests sent at once after
+                                a period of inactivity
+        min_rate:               lowest rate the limiter backs off to
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.1) -> None:
+        if rate <= 0:
+            raise ValueError("Invalid rate param. Must be a positive number.")
+        if burst < 1:
+            raise ValueError("Invalid burst param. Must be at least 1.")
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self) -> None:
+        """
+        Blocks until the next request is allowed to be sent
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(0.0, self._paused_until - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def feedback(self, status_code: int, retry_after: Optional[float] = None) -> None:
+        """
+        Adapts the request rate to the service response
+
+        Args:
+            status_code:            HTTP status code of the response
+            retry_after:            seconds the service asked to wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if status_code in RETRY_STATUS:
+                self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                    self._tokens = min(self._tokens, 0.0)
+            else:
+                self.rate = min(
+                    self.max_rate, self.rate + self.max_rate / RECOVERY_STEPS
+                )
+
+    def attach(self, session, retries: int = 3):
+        """
+        Throttles every request sent by the given `requests.Session`.
+        Idempotent requests answered with 429 or 5xx, and other requests
+        answered with 429 and `Retry-After`, are resent up to `retries`
+        times; the last response is returned to the caller as is.
+
+        Args:
+            session:                `requests.Session` instance
+            retries:                max number of times a request is resent,
+                                    0 turns retries off
+
+        Returns:
+            the same session
+        """
+        send = session.send
+
+        def throttled_send(request, **kwargs):
+            method = getattr(request, "method", None)
+            for attempt in range(retries + 1):
+                self.acquire()
+                response = send(request, **kwargs)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.feedback(response.status_code, retry_after)
+                if attempt == retries or not is_retryable(
+                    method, response.status_code, retry_after
+                ):
+                    return response
+                response.close()
+
+        session.send = throttled_send
+        return session
@@ -1,20 +1,25 @@
 """
 Use to enrich with 505 note (song index) score records
 """
+import argparse
 from collections import namedtuple
 import csv
 import json
 import os
-from typing import Optional
+from typing import Optional, Union
 
 from bookops_worldcat import WorldcatAccessToken, MetadataSession
 from pymarc import MARCReader, Record
 
 
 if __name__ == "__main__":
-    from utils import save2csv
+    from rate_limit import WORLDCAT_RATE, RateLimiter
+    from utils import CsvSink, FieldIndex, MarcRouter
+    from worldcat_cache import CachedMetadataSession, CacheMiss, WorldcatCache
 else:
-    from src.utils import save2csv
+    from src.rate_limit import WORLDCAT_RATE, RateLimiter
+    from src.utils import CsvSink, FieldIndex, MarcRouter
+    from src.worldcat_cache import CachedMetadataSession, CacheMiss, WorldcatCache
 
 
 BibData = namedtuple(
@@ -45,26 +50,36 @@ def save2marc(out: str, bib: Record) -> None:
         marcfile.write(bib.as_marc())
 
 
-def categorize_bib(bib: Record) -> None:
+def category_destinations(base_dir: str = "./files/SongIndex") -> dict[str, str]:
+    return {
+        "no-505": f"{base_dir}/no-505.mrc",
+        "basic-505": f"{base_dir}/basic-505.mrc",
+        "enhanced-505": f"{base_dir}/enhanced-505.mrc",
+        "unidentified-505": f"{base_dir}/unidentified-505.mrc",
+    }
+
+
+def categorize_bib(bib: Record, router: MarcRouter) -> None:
     content_tag = bib["505"]
-    base_dir = "./files/SongIndex"
     if not content_tag:
-        out = f"{base_dir}/no-505.mrc"
+        category = "no-505"
     elif content_tag.indicator2 == " ":
-        out = f"{base_dir}/basic-505.mrc"
+        category = "basic-505"
     elif content_tag.indicator2 == "0":
-        out = f"{base_dir}/enhanced-505.mrc"
+        category = "enhanced-505"
     else:
-        out = f"{base_dir}/unidentified-505.mrc"
+        category = "unidentified-505"
 
-    with open(out, "ab") as marcfile:
-        marcfile.write(bib.as_marc())
+    router.write(category, bib)
 
 
-def get_oclc_no(bib: Record) -> Optional[str]:
-    if bib["003"] and "OCoLC" in bib["003"].data:
+def get_oclc_no(bib: Record, fields: Optional[FieldIndex] = None) -> Optional[str]:
+    if fields is None:
+        fields = FieldIndex(bib)
+
+    if fields.get("003") and "OCoLC" in fields["003"].data:
         oclc_no = (
-            bib["001"]
+            fields["001"]
             .data.replace("ocn", "")
             .replace("ocm", "")
             .replace("on", "")
@@ -74,8 +89,7 @@ def get_oclc_no(bib: Record) -> Optional[str]:
             return oclc_no
         else:
             return None
-    fields = bib.get_fields("035")
-    for f in fields:
+    for f in fields.get_fields("035"):
         if "(OCoLC)" in f.value():
             oclc_no = f["a"].replace("(OCoLC)", "").strip()
             if oclc_no.isdigit():
@@ -83,25 +97,30 @@ def get_oclc_no(bib: Record) -> Optional[str]:
             else:
                 return None
 
-    if bib["991"]:
-        oclc_no = bib["991"].value().strip()
+    if fields.get("991"):
+        oclc_no = fields["991"].value().strip()
         if oclc_no.isdigit():
             return oclc_no
         else:
             return None
 
 
-def get_lccn(bib: Record) -> Optional[str]:
+def get_lccn(bib: Record, fields: Optional[FieldIndex] = None) -> Optional[str]:
+    if fields is None:
+        fields = FieldIndex(bib)
+
     try:
-        return bib["010"]["a"].strip()
+        return fields.get("010")["a"].strip()
     except (TypeError, AttributeError):
         return None
 
 
-def get_isbns(bib: Record) -> list:
+def get_isbns(bib: Record, fields: Optional[FieldIndex] = None) -> list:
+    if fields is None:
+        fields = FieldIndex(bib)
+
     isbns = []
-    fields = bib.get_fields("020")
-    for f in fields:
+    for f in fields.get_fields("020"):
         if "a" in f:
             value = f["a"].strip()
             value = value.split(" ")
@@ -109,40 +128,45 @@ def get_isbns(bib: Record) -> list:
     return isbns
 
 
-def get_standard_nos(bib: Record) -> list:
+def get_standard_nos(bib: Record, fields: Optional[FieldIndex] = None) -> list:
+    if fields is None:
+        fields = FieldIndex(bib)
+
     standard_nos = []
-    fields = bib.get_fields("024")
-    for f in fields:
+    for f in fields.get_fields("024"):
         if "a" in f:
             standard_nos.append(f["a"].strip())
     return standard_nos
 
 
-def get_publisher_nos(bib: Record) -> list:
+def get_publisher_nos(bib: Record, fields: Optional[FieldIndex] = None) -> list:
+    if fields is None:
+        fields = FieldIndex(bib)
+
     publisher_nos = []
-    fields = bib.get_fields("028")
-    for f in fields:
+    for f in fields.get_fields("028"):
         if "a" in f:
             publisher_nos.append(f["a"].strip())
     return publisher_nos
 
 
-def parse4query(out: str, bib: Record) -> None:
+def parse4query(out: CsvSink, bib: Record) -> None:
     """
     Creates a csv file with data that can be used to
     query Worldcat.
     """
-    bibNo = bib["907"]["a"][1:]
-    title = bib["245"]["a"].replace(":", "").replace("/", "").strip().lower()
-    pubDate = bib["008"][7:10]
-    oclcNo = get_oclc_no(bib)
-    lccn = get_lccn(bib)
-    isbn = get_isbns(bib)
-    standardNo = get_standard_nos(bib)
-    publisherNo = get_publisher_nos(bib)
+    fields = FieldIndex(bib)
+    bibNo = fields["907"]["a"][1:]
+    title = fields["245"]["a"].replace(":", "").replace("/", "").strip().lower()
+    pubDate = fields["008"].data[7:10]
+    oclcNo = get_oclc_no(bib, fields)
+    lccn = get_lccn(bib, fields)
+    isbn = get_isbns(bib, fields)
+    standardNo = get_standard_nos(bib, fields)
+    publisherNo = get_publisher_nos(bib, fields)
 
     data = BibData(bibNo, title, pubDate, oclcNo, lccn, isbn, standardNo, publisherNo)
-    save2csv(out, data)
+    out.writerow(data)
 
 
 def get_token():
@@ -159,7 +183,9 @@ def get_token():
         return token
 
 
-def query_worldcat(session: MetadataSession, query_data: BibData) -> None:
+def query_worldcat(
+    session: Union[MetadataSession, CachedMetadataSession], query_data: BibData
+) -> None:
     payload = dict(
         inCatalogLanguage="eng",
         itemType="",
@@ -185,19 +211,40 @@ if __name__ == "__main__":
     # fin = "./files/SongIndex/no-505.mrc"
     # fout = "./files/SongIndex/query_data.csv"
     # reader = bib_reader(fin)
-    # for bib in reader:
-    #     parse4query(fout, bib)
-    token = get_token()
-    session = MetadataSession(authorization=token)
+    # with CsvSink(fout) as sink:
+    #     for bib in reader:
+    #         parse4query(sink, bib)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="use only Worldcat responses cached by previous runs",
+    )
+    args = parser.parse_args()
+
+    if args.offline:
+        session = None
+    else:
+        token = get_token()
+        session = RateLimiter(WORLDCAT_RATE).attach(
+            MetadataSession(authorization=token)
+        )
+    cache = WorldcatCache()
+    session = CachedMetadataSession(session, cache, offline=args.offline)
 
     with open("./files/SongIndex/query_data.csv", "r", encoding="utf8") as f:
         reader = csv.reader(f)
         for row in reader:
             data = BibData(row)
-            result = query_worldcat(session, data)
+            try:
+                result = query_worldcat(session, data)
+            except CacheMiss as exc:
+                print(exc)
+                continue
             if result is not None:
                 print(result.status_code)
                 print(result.json())
                 break
 
     session.close()
+    cache.close()
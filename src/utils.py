@@ -1,28 +1,405 @@
+from bisect import bisect_right
 import csv
+import os
+import time
+import warnings
 
 
-def save2csv(dst_fh, row):
+MARC_WRITE_BUFFER = 1024 * 1024  # bytes
+LEADER_LEN = 24
+END_OF_FIELD = b"\x1e"
+END_OF_RECORD = b"\x1d"
+CSV_FLUSH_ROWS = 500
+CSV_FLUSH_INTERVAL = 5.0  # seconds
+
+
+class CsvSink:
     """
-    Appends a list with data to a dst_fh csv
-    args:
-        dst_fh: str, output file
-        row: list, list of values to write in a row
+    Appends rows to a csv file using a single long-lived `csv.writer`.
+
+    Rows are buffered and flushed to disk every `flush_rows` rows or
+    every `flush_interval` seconds, whichever comes first. Rows that
+    cannot be encoded are not written; they are collected in `rejected`
+    and reported with a warning.
+
+    Args:
+        dst_fh:                 path to output csv file
+        flush_rows:             number of buffered rows triggering a flush
+        flush_interval:         max number of seconds between flushes
     """
 
-    with open(dst_fh, "a", encoding="utf-8") as csvfile:
-        out = csv.writer(
-            csvfile,
+    def __init__(
+        self,
+        dst_fh: str,
+        flush_rows: int = CSV_FLUSH_ROWS,
+        flush_interval: float = CSV_FLUSH_INTERVAL,
+    ) -> None:
+        self.dst_fh = dst_fh
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.rejected: list[list] = []
+        self._rows: list[list] = []
+        self._last_flush = time.monotonic()
+        self._file = open(dst_fh, "a", encoding="utf-8")
+        self._writer = csv.writer(
+            self._file,
             delimiter=",",
             lineterminator="\n",
             quotechar='"',
             quoting=csv.QUOTE_MINIMAL,
         )
+
+    def __enter__(self) -> "CsvSink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def writerow(self, row) -> None:
+        self._rows.append(row)
+        if (
+            len(self._rows) >= self.flush_rows
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self, sync: bool = False) -> None:
+        """
+        Writes buffered rows to the file
+
+        Args:
+            sync:                   also fsync the file so that the rows
+                                    survive a crash of the machine
+        """
+        for row in self._rows:
+            try:
+                self._writer.writerow(row)
+                self.count += 1
+            except UnicodeEncodeError:
+                self.rejected.append(row)
+                warnings.warn(f"Unable to encode row in {self.dst_fh}: {row}")
+        self._rows = []
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def save2csv(dst_fh, row):
+    """
+    Appends a list with data to a dst_fh csv
+    args:
+        dst_fh: str, output file
+        row: list, list of values to write in a row
+    """
+
+    with CsvSink(dst_fh) as sink:
+        sink.writerow(row)
+
+
+class MarcWriter:
+    """
+    Appends MARC21 records to a file kept open for the whole batch.
+
+    The file is opened on the first write, so no empty files are created
+    for outputs that never receive a record. Use as a context manager
+    or call `close` explicitly when done.
+
+    Args:
+        dst_fh:                 path to output MARC21 file
+        buffer_size:            size of the write buffer in bytes
+    """
+
+    def __init__(self, dst_fh: str, buffer_size: int = MARC_WRITE_BUFFER) -> None:
+        self.dst_fh = dst_fh
+        self.buffer_size = buffer_size
+        self.count = 0
+        self._file = None
+
+    def __enter__(self) -> "MarcWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.dst_fh, "ab", buffering=self.buffer_size)
+        return self._file
+
+    def write(self, record) -> None:
+        """
+        Appends `pymarc.Record` to the output file
+        """
+        self.write_raw(record.as_marc())
+
+    def write_raw(self, data: bytes) -> None:
+        """
+        Appends already serialized MARC21 record to the output file
+        """
+        self._open().write(data)
+        self.count += 1
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MarcRouter:
+    """
+    Routes MARC21 records to one of several output files.
+
+    Keeps one buffered `MarcWriter` per destination key. Writers are
+    created on first use of a key and all of them are closed on exit.
+
+    Args:
+        destinations:           mapping of destination keys to file paths
+        buffer_size:            size of the write buffer of each output
+    """
+
+    def __init__(
+        self, destinations: dict[str, str], buffer_size: int = MARC_WRITE_BUFFER
+    ) -> None:
+        self.destinations = destinations
+        self.buffer_size = buffer_size
+        self._writers: dict[str, MarcWriter] = {}
+
+    def __enter__(self) -> "MarcRouter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _writer(self, key: str) -> MarcWriter:
+        try:
+            return self._writers[key]
+        except KeyError:
+            writer = MarcWriter(self.destinations[key], self.buffer_size)
+            self._writers[key] = writer
+            return writer
+
+    @property
+    def counts(self) -> dict[str, int]:
+        """
+        Number of records written to each destination
+        """
+        return {key: self.count(key) for key in self.destinations}
+
+    def count(self, key: str) -> int:
+        try:
+            return self._writers[key].count
+        except KeyError:
+            return 0
+
+    def write(self, key: str, record) -> None:
+        self._writer(key).write(record)
+
+    def write_raw(self, key: str, data: bytes) -> None:
+        self._writer(key).write_raw(data)
+
+    def flush(self) -> None:
+        for writer in self._writers.values():
+            writer.flush()
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+
+
+def add_ordered_fields(record, fields) -> None:
+    """
+    Adds fields to `pymarc.Record` in a single merge pass.
+
+    The resulting field order is the same as calling
+    `Record.add_ordered_field` for each field in turn: a new field is
+    placed before the first existing field with a higher or non-numeric
+    tag, new fields with the same tag keep their order, and fields with
+    non-numeric tags are appended at the end.
+
+    Args:
+        record:                 `pymarc.Record` instance
+        fields:                 list of `pymarc.Field` to add
+    """
+    existing = record.fields
+
+    # running max of numeric tags up to the first non-numeric tag
+    running_max = []
+    highest = -1
+    for field in existing:
+        if not field.tag.isdigit():
+            break
+        highest = max(highest, int(field.tag))
+        running_max.append(highest)
+
+    # new fields grouped by position of the existing field they precede
+    inserts: dict[int, list] = {}
+    appended = []
+    for field in fields:
+        if field.tag.isdigit():
+            position = bisect_right(running_max, int(field.tag))
+            inserts.setdefault(position, []).append(field)
+        else:
+            appended.append(field)
+
+    merged = []
+    for position, field in enumerate(existing):
+        if position in inserts:
+            merged.extend(sorted(inserts[position], key=lambda f: int(f.tag)))
+        merged.append(field)
+    if len(existing) in inserts:
+        merged.extend(sorted(inserts[len(existing)], key=lambda f: int(f.tag)))
+    merged.extend(appended)
+    record.fields[:] = merged
+
+
+class FieldIndex:
+    """
+    Tag to fields map of a `pymarc.Record` built in a single pass over
+    its fields.
+
+    Lookups mirror `pymarc.Record` ones but do not scan the record. The
+    index reflects the fields of the record at the time it was built.
+
+    Args:
+        record:                 `pymarc.Record` instance
+    """
+
+    def __init__(self, record) -> None:
+        self._fields: dict[str, list] = {}
+        for field in record.fields:
+            try:
+                self._fields[field.tag].append(field)
+            except KeyError:
+                self._fields[field.tag] = [field]
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._fields
+
+    def __getitem__(self, tag: str):
+        """
+        Returns first field with the tag, raises KeyError if not present
+        """
+        return self._fields[tag][0]
+
+    def get(self, tag: str, default=None):
         try:
-            out.writerow(row)
-        except UnicodeEncodeError:
-            pass
+            return self._fields[tag][0]
+        except KeyError:
+            return default
+
+    def get_fields(self, *tags: str) -> list:
+        """
+        Returns fields with given tags. Fields are grouped by tag in the
+        order the tags are given, and keep record order within a tag.
+        """
+        if len(tags) == 1:
+            return list(self._fields.get(tags[0], []))
+        return [field for tag in tags for field in self._fields.get(tag, [])]
+
+
+class RawMarcBuilder:
+    """
+    Builds a MARC21 (ISO 2709) record directly as bytes.
+
+    Meant for generated, write-only records where a full `pymarc.Record`
+    is not needed. Field data and directory entries are appended to
+    byte buffers and fields are emitted in the order they were added,
+    so they must be added already sorted. The output is identical to
+    `pymarc.Record.as_marc` for the same leader and fields.
+
+    Args:
+        leader:                 record leader, length and base address
+                                are calculated when serialized
+        encoding:               character encoding of the record
+    """
+
+    def __init__(self, leader: str, encoding: str = "utf-8") -> None:
+        self.leader = leader
+        self.encoding = encoding
+        self._directory = bytearray()
+        self._data = bytearray()
+
+    def add_encoded(self, tag: str, data: bytes) -> None:
+        """
+        Appends already encoded field data (including field terminator)
+        """
+        if tag.isdigit():
+            tag = f"{int(tag):03}"
+        else:
+            tag = f"{tag:>3}"
+        self._directory += f"{tag}{len(data):04}{len(self._data):05}".encode(
+            self.encoding
+        )
+        self._data += data
+
+    def add_control_field(self, tag: str, data: str) -> None:
+        self.add_encoded(tag, encode_control_field(data, self.encoding))
+
+    def add_data_field(self, tag: str, indicators, subfields) -> None:
+        """
+        Args:
+            tag:                MARC tag
+            indicators:         pair of indicators
+            subfields:          list of `pymarc.Subfield`
+        """
+        self.add_encoded(tag, encode_data_field(indicators, subfields, self.encoding))
+
+    def add_field(self, field) -> None:
+        """
+        Appends `pymarc.Field`
+        """
+        if field.control_field:
+            self.add_control_field(field.tag, field.data)
+        else:
+            self.add_data_field(field.tag, field.indicators, field.subfields)
+
+    def as_marc(self) -> bytes:
+        base_address = LEADER_LEN + len(self._directory) + len(END_OF_FIELD)
+        record_length = base_address + len(self._data) + len(END_OF_RECORD)
+        leader = (
+            f"{record_length:0>5}{self.leader[5:12]}"
+            f"{base_address:0>5}{self.leader[17:]}"
+        )
+        return b"".join(
+            [
+                leader.encode(self.encoding),
+                self._directory,
+                END_OF_FIELD,
+                self._data,
+                END_OF_RECORD,
+            ]
+        )
+
+
+def encode_control_field(data: str, encoding: str = "utf-8") -> bytes:
+    return f"{data}\x1e".encode(encoding)
+
+
+def encode_data_field(indicators, subfields, encoding: str = "utf-8") -> bytes:
+    subs = "".join([f"\x1f{s.code}{s.value}" for s in subfields])
+    return f"{indicators[0]}{indicators[1]}{subs}\x1e".encode(encoding)
+
+
+def encode_field(field, encoding: str = "utf-8") -> bytes:
+    """
+    Encodes `pymarc.Field` for use with `RawMarcBuilder.add_encoded`
+    """
+    if field.control_field:
+        return encode_control_field(field.data, encoding)
+    return encode_data_field(field.indicators, field.subfields, encoding)
 
 
 def save2marc(dst_fh, record):
-    with open(dst_fh, "ab") as marcfile:
-        marcfile.write(record.as_marc())
+    with MarcWriter(dst_fh, buffer_size=-1) as writer:
+        writer.write(record)
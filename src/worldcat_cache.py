@@ -0,0 +1,276 @@
+"""
+Persistent SQLite cache of Worldcat Metadata API responses.
+
+Brief and full bibs are keyed by normalized OCLC number and brief bib
+searches by their query, so re-running or resuming a batch does not query
+Worldcat again for records it already retrieved. OCLC numbers not found
+in Worldcat are cached as well.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from bookops_worldcat import MetadataSession
+from bookops_worldcat.errors import WorldcatRequestError
+from bookops_worldcat.utils import verify_oclc_number
+
+
+CACHE_FH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "files", "worldcat-cache.db"
+)
+CACHE_TTL = 30 * 24 * 60 * 60  # seconds
+CACHE_MAX_SIZE = 512 * 1024 * 1024  # bytes
+CACHEABLE_STATUS = {200, 404}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    content BLOB NOT NULL,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMiss(Exception):
+    """
+    Raised in offline mode when a response is not in the cache
+    """
+
+
+class CachedResponse:
+    """
+    Response served from the cache. Provides the subset of
+    `requests.Response` used by the scripts.
+    """
+
+    def __init__(self, status_code: int, content: bytes) -> None:
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class WorldcatCache:
+    """
+    Stores responses by kind ("brief", "full", "search") and key. Entries
+    older than `ttl` are ignored and replaced on the next request. When
+    the stored content exceeds `max_size` the least recently used entries
+    are evicted. Expired entries are purged when the cache is opened.
+    Safe to use from multiple threads.
+
+    Args:
+        db_fh:                  path to SQLite database file
+        ttl:                    time to live of an entry in seconds
+        max_size:               max total size of stored content in bytes
+    """
+
+    def __init__(
+        self,
+        db_fh: str = CACHE_FH,
+        ttl: float = CACHE_TTL,
+        max_size: int = CACHE_MAX_SIZE,
+    ) -> None:
+        self.db_fh = db_fh
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_fh, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        purged = self.purge_expired()
+        logger.debug(f"Purged {purged} expired responses from Worldcat cache.")
+
+    def __enter__(self) -> "WorldcatCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of stored content in bytes
+        """
+        return self._size
+
+    def get(self, kind: str, key: str) -> Optional[CachedResponse]:
+        """
+        Returns cached response or None if not cached or expired
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status_code, content FROM responses "
+                "WHERE kind = ? AND key = ? AND fetched > ?",
+                (kind, key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE responses SET accessed = ? WHERE kind = ? AND key = ?",
+                    (now, kind, key),
+                )
+            self.hits += 1
+        return CachedResponse(row[0], row[1])
+
+    def put(self, kind: str, key: str, response) -> None:
+        """
+        Stores response if its status code is in `CACHEABLE_STATUS`
+        """
+        if response.status_code not in CACHEABLE_STATUS:
+            return
+        content = bytes(response.content)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                old = self._conn.execute(
+                    "SELECT LENGTH(content) FROM responses WHERE kind = ? AND key = ?",
+                    (kind, key),
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, key, response.status_code, content, now, now),
+                )
+            self._size += len(content) - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._size <= self.max_size:
+            return
+        rows = self._conn.execute(
+            "SELECT kind, key, LENGTH(content) FROM responses ORDER BY accessed"
+        )
+        evicted = []
+        for kind, key, size in rows:
+            if self._size <= self.max_size:
+                break
+            evicted.append((kind, key))
+            self._size -= size
+        rows.close()
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM responses WHERE kind = ? AND key = ?", evicted
+            )
+        logger.debug(f"Evicted {len(evicted)} responses from Worldcat cache.")
+
+    def purge_expired(self) -> int:
+        """
+        Deletes expired entries and returns their number
+        """
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE fetched <= ?",
+                    (time.time() - self.ttl,),
+                )
+            self._size = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(content)), 0) FROM responses"
+            ).fetchone()[0]
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class CachedMetadataSession:
+    """
+    Serves `MetadataSession` lookups used by the scripts from the cache and
+    stores responses of requests sent to Worldcat.
+
+    OCLC numbers are normalized the way `MetadataSession` does, so
+    "ocm00012345" and "12345" share an entry. `MetadataSession` raises
+    `WorldcatRequestError` when Worldcat responds with 404; the response
+    is cached and the error is raised again on later lookups.
+
+    Args:
+        session:                `MetadataSession` instance, may be None
+                                in offline mode
+        cache:                  `WorldcatCache` instance
+        offline:                serve responses only from the cache and
+                                raise `CacheMiss` for anything else
+    """
+
+    def __init__(
+        self,
+        session: Optional[MetadataSession],
+        cache: WorldcatCache,
+        offline: bool = False,
+    ) -> None:
+        if session is None and not offline:
+            raise ValueError("Session is required when not in offline mode.")
+        self.session = session
+        self.cache = cache
+        self.offline = offline
+
+    def __enter__(self) -> "CachedMetadataSession":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get_brief_bib(self, oclcNumber: str):
+        return self._fetch(
+            "brief",
+            verify_oclc_number(oclcNumber),
+            lambda: self.session.get_brief_bib(oclcNumber),
+        )
+
+    def get_full_bib(self, oclcNumber: str):
+        return self._fetch(
+            "full",
+            verify_oclc_number(oclcNumber),
+            lambda: self.session.get_full_bib(oclcNumber),
+        )
+
+    def search_brief_bibs(self, q: str, **kwargs):
+        key = json.dumps(dict(q=q, **kwargs), sort_keys=True)
+        return self._fetch(
+            "search", key, lambda: self.session.search_brief_bibs(q=q, **kwargs)
+        )
+
+    def _fetch(self, kind: str, key: str, request: Callable):
+        response = self.cache.get(kind, key)
+        if response is not None:
+            if response.status_code == 404:
+                raise WorldcatRequestError(
+                    f"404 Client Error: Not Found (cached). Server response: "
+                    f"{response.content.decode('utf-8')}"
+                )
+            return response
+        if self.offline:
+            raise CacheMiss(f"No cached Worldcat {kind} response for {key}.")
+        try:
+            response = request()
+        except WorldcatRequestError as exc:
+            # the HTTPError raised for the response is the implicit context
+            response = getattr(exc.__context__, "response", None)
+            if response is not None and response.status_code == 404:
+                self.cache.put(kind, key, response)
+            raise
+        self.cache.put(kind, key, response)
+        return response
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.session.close()
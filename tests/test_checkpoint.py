@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from src.checkpoint import CheckpointJournal
+
+
+@pytest.fixture
+def journal_fh(tmp_path):
+    return str(tmp_path / "journal.tsv")
+
+
+def test_checkpoint_journal_record(journal_fh):
+    with CheckpointJournal(journal_fh) as journal:
+        journal.record("item", "100", "00000001")
+        journal.record("bib", "00000001")
+
+        assert journal.done("bib", "00000001")
+        assert not journal.done("item", "00000001")
+        assert journal.get("item", "100") == ["00000001"]
+        assert journal.get("bib", "00000002") is None
+        assert len(journal) == 2
+
+    with open(journal_fh, "r", encoding="utf-8") as f:
+        assert f.read() == "item\t100\t00000001\nbib\t00000001\n"
+
+
+def test_checkpoint_journal_fsyncs_each_entry(monkeypatch, journal_fh):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    with CheckpointJournal(journal_fh) as journal:
+        journal.record("bib", "00000001")
+        journal.record("bib", "00000002")
+
+        assert synced == [journal._file.fileno()] * 2
+
+
+def test_checkpoint_journal_resume(journal_fh):
+    with CheckpointJournal(journal_fh) as journal:
+        journal.record("bib", "00000001")
+    with open(journal_fh, "a", encoding="utf-8") as f:
+        f.write("bib\t000000")
+
+    with CheckpointJournal(journal_fh, resume=True) as journal:
+        assert journal.done("bib", "00000001")
+        assert len(journal) == 1
+        journal.record("bib", "00000002")
+
+    assert list(CheckpointJournal.read(journal_fh)) == [
+        ["bib", "00000001"],
+        ["bib", "00000002"],
+    ]
+
+
+def test_checkpoint_journal_resume_missing_file(journal_fh):
+    with CheckpointJournal(journal_fh, resume=True) as journal:
+        assert len(journal) == 0
+
+
+def test_checkpoint_journal_without_resume_keeps_previous_run(journal_fh):
+    with CheckpointJournal(journal_fh) as journal:
+        journal.record("bib", "00000001")
+
+    with pytest.raises(FileExistsError):
+        CheckpointJournal(journal_fh)
+
+    assert list(CheckpointJournal.read(journal_fh)) == [["bib", "00000001"]]
+
+
+def test_checkpoint_journal_without_resume_empty_file(journal_fh):
+    open(journal_fh, "w").close()
+    with CheckpointJournal(journal_fh) as journal:
+        journal.record("bib", "00000001")
+
+    assert list(CheckpointJournal.read(journal_fh)) == [["bib", "00000001"]]
@@ -0,0 +1,317 @@
+import json
+import threading
+import time
+
+from pymarc import Field, MARCReader, Record, Subfield, record_to_xml
+import pytest
+
+from src.enhance_bib import enhance_bibs, enhance_record, parse_identifiers
+from src.utils import MarcRouter
+from src.worldcat_cache import CachedMetadataSession, WorldcatCache
+
+
+def make_bib(bib_no, control_no=None, lc_no=None):
+    bib = Record()
+    if control_no:
+        bib.add_field(Field(tag="001", data=control_no))
+    if lc_no:
+        bib.add_field(
+            Field(tag="010", indicators=[" ", " "], subfields=[Subfield("a", lc_no)])
+        )
+    bib.add_field(
+        Field(
+            tag="245",
+            indicators=["0", "0"],
+            subfields=[Subfield("a", f"Title {bib_no}")],
+        )
+    )
+    bib.add_field(
+        Field(tag="907", indicators=[" ", " "], subfields=[Subfield("a", f".{bib_no}")])
+    )
+    bib.add_field(
+        Field(
+            tag="998",
+            indicators=[" ", " "],
+            subfields=[Subfield("d", "a"), Subfield("e", "-")],
+        )
+    )
+    return bib
+
+
+class StubResponse:
+    def __init__(self, data=None, content=None):
+        self.status_code = 200
+        self.data = data
+        self.content = content if data is None else json.dumps(data).encode()
+
+    def json(self):
+        return self.data
+
+
+class StubMetadataSession:
+    def __init__(self, isbns, delays=None, merged=None):
+        self.isbns = {n.lstrip("ocmn") for n in isbns}
+        self.delays = delays or {}
+        self.merged = merged or {}
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _request(self, kind, oclc_no):
+        with self._lock:
+            self.requests.append((kind, oclc_no))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delays.get(oclc_no, 0.01))
+        with self._lock:
+            self.active -= 1
+
+    def get_brief_bib(self, oclc_no):
+        self._request("brief", oclc_no)
+        number = oclc_no.lstrip("ocmn")
+        number = self.merged.get(number, number)
+        data = {"oclcNumber": number}
+        if number in self.isbns:
+            data["isbns"] = ["9780000000000"]
+        return StubResponse(data=data)
+
+    def get_full_bib(self, oclc_no):
+        self._request("full", oclc_no)
+        number = oclc_no.lstrip("ocmn")
+        number = self.merged.get(number, number)
+        bib = Record()
+        bib.add_field(Field(tag="001", data=f"ocm{number}"))
+        if number in self.isbns:
+            bib.add_field(
+                Field(
+                    tag="020",
+                    indicators=[" ", " "],
+                    subfields=[Subfield("a", "9780000000000")],
+                )
+            )
+        bib.add_field(
+            Field(
+                tag="245",
+                indicators=["0", "0"],
+                subfields=[Subfield("a", f"Worldcat {number}")],
+            )
+        )
+        bib.add_field(
+            Field(
+                tag="690",
+                indicators=[" ", " "],
+                subfields=[Subfield("a", "Local subject.")],
+            )
+        )
+        return StubResponse(content=record_to_xml(bib, namespace=True))
+
+
+def test_parse_identifiers():
+    bib = make_bib("b1", control_no="ocm00000001 ", lc_no="  2001012345 ")
+    bib.add_field(Field(tag="008", data="120827t20122004nyua          000 0 eng d"))
+    bib.add_field(
+        Field(
+            tag="110",
+            indicators=["2", " "],
+            subfields=[Subfield("a", "Some Society.")],
+        )
+    )
+    bib["245"].indicator2 = "4"
+    bib["245"]["a"] = "The title /"
+
+    assert parse_identifiers(bib) == (
+        "b1",
+        "ocm00000001",
+        "2001012345",
+        "Some Society.",
+        "title /",
+        "201",
+        "a",
+        "-",
+    )
+
+
+def test_parse_identifiers_missing_optional_fields():
+    bib = make_bib("b1")
+
+    assert parse_identifiers(bib) == (
+        "b1",
+        None,
+        None,
+        None,
+        "Title b1",
+        None,
+        "a",
+        "-",
+    )
+
+
+def test_enhance_record_with_isbn():
+    session = StubMetadataSession(isbns={"ocm00000001"})
+    outcome = enhance_record(session, make_bib("b1", control_no="ocm00000001"))
+
+    assert outcome.has_oclc_no
+    assert not outcome.has_lc_no
+    assert outcome.worldcat_bib["001"].data == "ocm00000001"
+    assert outcome.worldcat_bib["907"]["a"] == ".b1"
+    assert outcome.worldcat_bib["947"]["a"] == "tak/bot"
+    assert outcome.worldcat_bib["949"]["a"] == "*b2=a;"
+    assert "690" not in outcome.worldcat_bib
+    assert session.requests == [("brief", "ocm00000001"), ("full", "00000001")]
+
+
+def test_enhance_record_without_isbn():
+    session = StubMetadataSession(isbns=set())
+    outcome = enhance_record(session, make_bib("b1", control_no="ocm00000001"))
+
+    assert outcome.has_oclc_no
+    assert outcome.worldcat_bib is None
+    assert session.requests == [("brief", "ocm00000001")]
+
+
+def test_enhance_record_without_oclc_no():
+    session = StubMetadataSession(isbns=set())
+    outcome = enhance_record(session, make_bib("b1", lc_no="2001012345"))
+
+    assert not outcome.has_oclc_no
+    assert outcome.has_lc_no
+    assert outcome.worldcat_bib is None
+    assert session.requests == []
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_enhance_bibs(tmp_path, workers):
+    bibs = [
+        make_bib("b1", control_no="ocm00000001"),
+        make_bib("b2", lc_no="2001012345"),
+        make_bib("b3", control_no="ocm00000003"),
+        make_bib("b4", control_no="ocn00000004"),
+        make_bib("b5"),
+        make_bib("b6", control_no="ocm00000006"),
+    ]
+    # first lookups finish last to check order of saved records
+    session = StubMetadataSession(
+        isbns={"ocm00000001", "ocn00000004", "ocm00000006"},
+        delays={"ocm00000001": 0.1, "ocm00000003": 0.05},
+    )
+    enhanced_fh = str(tmp_path / "ENHANCED.mrc")
+    skipped_fh = str(tmp_path / "SKIPPED.mrc")
+
+    with MarcRouter({"enhanced": enhanced_fh, "skipped": skipped_fh}) as router:
+        counts = enhance_bibs(bibs, session, router, workers=workers)
+
+    assert counts == {"bibs": 6, "oclc_no": 4, "lc_no": 1, "enhanced": 3}
+    with open(enhanced_fh, "rb") as f:
+        assert [b["907"]["a"] for b in MARCReader(f)] == [".b1", ".b4", ".b6"]
+    with open(skipped_fh, "rb") as f:
+        assert [b["907"]["a"] for b in MARCReader(f)] == [".b2", ".b5"]
+    if workers > 1:
+        assert session.max_active > 1
+    else:
+        assert session.max_active == 1
+
+
+def test_enhance_bibs_reads_ahead_at_most_twice_workers(tmp_path):
+    read = []
+    saved = []
+
+    def reader():
+        for n in range(20):
+            read.append(n)
+            yield make_bib(f"b{n}", control_no=f"ocm{n:08}")
+
+    class TrackingRouter(MarcRouter):
+        def write(self, key, record):
+            saved.append(len(read))
+            super().write(key, record)
+
+    session = StubMetadataSession(isbns={f"ocm{n:08}" for n in range(20)})
+    with TrackingRouter({"enhanced": str(tmp_path / "ENHANCED.mrc")}) as router:
+        enhance_bibs(reader(), session, router, workers=2)
+
+    assert len(saved) == 20
+    # a record is saved before more than 4 are read past it
+    assert all(r - n <= 4 for n, r in enumerate(saved))
+
+
+def test_enhance_bibs_cached_rerun_and_offline(tmp_path):
+    bibs = [
+        make_bib("b1", control_no="ocm00000001"),
+        make_bib("b2", control_no="ocm00000002"),
+    ]
+    session = StubMetadataSession(isbns={"ocm00000001"})
+
+    with WorldcatCache(str(tmp_path / "cache.db")) as cache:
+        for n in range(2):
+            cached = CachedMetadataSession(session, cache)
+            with MarcRouter({"enhanced": str(tmp_path / f"{n}.mrc")}) as router:
+                counts = enhance_bibs(bibs, cached, router, workers=2)
+            assert counts["enhanced"] == 1
+        assert len(session.requests) == 3
+        assert cache.hits == 3
+
+        offline = CachedMetadataSession(None, cache, offline=True)
+        bibs.append(make_bib("b3", control_no="ocm00000003"))
+        with MarcRouter({"enhanced": str(tmp_path / "offline.mrc")}) as router:
+            counts = enhance_bibs(bibs, offline, router, workers=2)
+        assert counts == {"bibs": 3, "oclc_no": 3, "enhanced": 1}
+        assert len(session.requests) == 3
+
+
+def test_enhance_record_full_only():
+    session = StubMetadataSession(isbns={"00000002"}, merged={"00000001": "00000002"})
+    outcome = enhance_record(
+        session, make_bib("b1", control_no="ocm00000001"), full_only=True
+    )
+
+    assert outcome.brief_avoided
+    assert outcome.worldcat_bib["001"].data == "ocm00000002"
+    assert outcome.worldcat_bib["907"]["a"] == ".b1"
+    assert session.requests == [("full", "ocm00000001")]
+
+
+def test_enhance_record_full_only_without_isbn():
+    session = StubMetadataSession(isbns=set())
+    outcome = enhance_record(
+        session, make_bib("b1", control_no="ocm00000001"), full_only=True
+    )
+
+    assert outcome.brief_avoided
+    assert outcome.worldcat_bib is None
+    assert session.requests == [("full", "ocm00000001")]
+
+
+def test_enhance_record_full_only_cache_miss(tmp_path):
+    with WorldcatCache(str(tmp_path / "cache.db")) as cache:
+        session = CachedMetadataSession(None, cache, offline=True)
+        outcome = enhance_record(
+            session, make_bib("b1", control_no="ocm00000001"), full_only=True
+        )
+
+    assert not outcome.brief_avoided
+    assert outcome.worldcat_bib is None
+
+
+def test_enhance_bibs_full_only_matches_brief_lookups(tmp_path):
+    bibs = [
+        make_bib("b1", control_no="ocm00000001"),
+        make_bib("b2", lc_no="2001012345"),
+        make_bib("b3", control_no="ocm00000003"),
+        make_bib("b4", control_no="ocn00000004"),
+    ]
+    isbns = {"00000001", "00000005"}
+    merged = {"00000004": "00000005"}
+    written = []
+    for full_only in (False, True):
+        session = StubMetadataSession(isbns=isbns, merged=merged)
+        fh = str(tmp_path / f"{full_only}.mrc")
+        with MarcRouter({"enhanced": fh, "skipped": fh}) as router:
+            counts = enhance_bibs(bibs, session, router, 2, full_only)
+        with open(fh, "rb") as f:
+            written.append([b.as_marc() for b in MARCReader(f)])
+        assert counts["enhanced"] == 2
+
+    assert counts["brief_avoided"] == 3
+    assert len(session.requests) == 3
+    assert written[0] == written[1]
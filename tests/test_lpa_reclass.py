@@ -1,9 +1,19 @@
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
 
+from bookops_sierra.errors import BookopsSierraError
 import pytest
+import requests
 
 from src.lpa_reclass_utils import (
     MultiCallNumError,
+    analyze_items,
     change_item_varFields,
     construct_item_internal_note,
     construct_subfields_for_lcc,
@@ -15,12 +25,216 @@ from src.lpa_reclass_utils import (
     get_other_item_callnumbers,
     is_callnumber_field,
     is_lpa_ref_location,
+    item_is_updated,
     normalize_callnumber,
     split_into_batches,
     cleanup_bib_varFields,
 )
 
-from src.lpa_reclass import has_special_cutter
+from src.checkpoint import CheckpointJournal
+from src.lpa_reclass_index import ReclassIndex
+from src.rate_limit import RateLimiter
+from src.lpa_reclass import (
+    diff_bib,
+    diff_varFields,
+    dry_run_bibs,
+    fetch_bib,
+    fetch_items,
+    has_special_cutter,
+    is_rejected_request,
+    process_bib,
+    reclass_bibs,
+)
+from src.utils import CsvSink
+
+
+class StubResponse:
+    def __init__(self, data=None, url="", status_code=200):
+        self.data = data
+        self.url = url
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class StubSierraSession:
+    """
+    In-memory stand-in for `SierraSession` that records requests and answers
+    them with random latency so concurrent workers finish out of order
+    """
+
+    def __init__(self, bibs, items, fail_items=(), max_ids=50):
+        self.bibs = bibs
+        self.items = items
+        self.fail_items = set(fail_items)
+        self.max_ids = max_ids
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def _request(self, *args):
+        time.sleep(random.uniform(0, 0.005))
+        with self.lock:
+            self.requests.append(args)
+
+    def bib_get(self, sid, fields=None):
+        self._request("bib_get", sid)
+        if sid not in self.bibs:
+            raise BookopsSierraError(f"404: b{sid}a")
+        return StubResponse(self.bibs[sid])
+
+    def bibs_get(self, sids, fields=None):
+        self._request("bibs_get", sids)
+        entries = [{"id": i, **self.bibs[i]} for i in sids.split(",") if i in self.bibs]
+        if not entries:
+            raise BookopsSierraError("404: Record not found")
+        return StubResponse({"entries": entries})
+
+    def items_get(self, sids, fields=None):
+        self._request("items_get", sids)
+        if len(sids.split(",")) > self.max_ids:
+            raise BookopsSierraError("414: Request-URI Too Long")
+        return StubResponse({"entries": [self.items[i] for i in sids.split(",")]})
+
+    def item_update(self, sid, data):
+        self._request("item_update", sid)
+        if sid in self.fail_items:
+            raise BookopsSierraError(f"500: i{sid}")
+        self.items[sid] = {**self.items[sid], **data}
+        return StubResponse(url=f"https://sierra/items/{sid}", status_code=204)
+
+    def bib_update(self, sid, data, data_format=None):
+        self._request("bib_update", sid)
+        self.bibs[sid] = {**self.bibs[sid], **data}
+        return StubResponse(status_code=204)
+
+
+class StubSierraHandler(BaseHTTPRequestHandler):
+    """
+    Serves bibs and items of the server over HTTP. Responses listed in
+    `server.failures` for a method and path are sent first, in order.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, data=None, headers=None):
+        body = b"" if data is None else json.dumps(data).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        with self.server.lock:
+            self.server.requests.append((self.command, url.path, time.monotonic()))
+            failures = self.server.failures.get((self.command, url.path))
+            failure = failures.pop(0) if failures else None
+        if failure is not None:
+            return self._reply(*failure)
+
+        kind, _, sid = url.path.strip("/").partition("/")
+        records = self.server.bibs if kind == "bibs" else self.server.items
+        if self.command == "PUT":
+            data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            records[sid] = {**records[sid], **data}
+            self._reply(204)
+        elif sid:
+            if sid in records:
+                self._reply(200, records[sid])
+            else:
+                self._reply(404, {"description": "Record not found"})
+        else:
+            ids = parse_qs(url.query)["id"][0].split(",")
+            entries = [{"id": i, **records[i]} for i in ids if i in records]
+            self._reply(200 if entries else 404, {"entries": entries})
+
+    do_GET = do_PUT = do_POST = _handle
+
+
+class HttpSierraSession(requests.Session):
+    """
+    Stand-in for `SierraSession` sending real HTTP requests to
+    `StubSierraHandler` and raising `BookopsSierraError` on error responses
+    """
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise BookopsSierraError(f"{response.status_code}: {response.text}")
+        return response
+
+    def bib_get(self, sid, fields=None):
+        return self._check(self.get(f"{self.base_url}/bibs/{sid}"))
+
+    def bibs_get(self, sids, fields=None):
+        return self._check(self.get(f"{self.base_url}/bibs/", params={"id": sids}))
+
+    def items_get(self, sids, fields=None):
+        return self._check(self.get(f"{self.base_url}/items/", params={"id": sids}))
+
+    def item_update(self, sid, data):
+        return self._check(self.put(f"{self.base_url}/items/{sid}", json=data))
+
+    def bib_update(self, sid, data, data_format=None):
+        return self._check(self.put(f"{self.base_url}/bibs/{sid}", json=data))
+
+
+def stub_ref_item(item_id):
+    return {
+        "id": item_id,
+        "location": {"code": "pam11", "name": "LPA REF"},
+        "varFields": [
+            {
+                "fieldTag": "c",
+                "marcTag": "852",
+                "ind1": "8",
+                "ind2": " ",
+                "subfields": [{"tag": "h", "content": f"*MUS {item_id}"}],
+            },
+        ],
+    }
+
+
+@pytest.fixture
+def stub_sierra():
+    bibs, items = {}, {}
+    for n in range(1, 21):
+        sid = f"{n:08}"
+        item_ids = [f"{n}{i:02}" for i in range(n % 7 + 1)]
+        bibs[sid] = {
+            "varFields": [{"fieldTag": "a", "content": "Foo"}],
+            "items": [f"https://sierra/items/{i}" for i in item_ids],
+        }
+        items.update({i: stub_ref_item(i) for i in item_ids})
+    return StubSierraSession(bibs, items)
+
+
+@pytest.fixture
+def stub_sierra_server(stub_sierra):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSierraHandler)
+    server.bibs = stub_sierra.bibs
+    server.items = stub_sierra.items
+    server.failures = {}
+    server.requests = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read_log(fh):
+    with open(fh, "r", encoding="utf-8") as f:
+        return [line.strip().split(",")[1] for line in f]
 
 
 def test_change_item_varFields_no_existing_callnumber():
@@ -326,12 +540,23 @@ def test_is_lpa_ref_location(request, fixture_name, expectation):
     [
         (' *FOO bar .,()"baz +" ', "*FOO bar baz +"),
         (" *ZP-*PYO+ n.c. 2, no. 7 ", "*ZP*PYO+ nc 2 no 7"),
+        ("-- (1862) --", "1862"),
+        ("\t*MUS\n", "*MUS"),
+        ("", ""),
     ],
 )
 def test_normalize_callnumer(arg, expectation):
     assert normalize_callnumber(arg) == expectation
 
 
+def test_normalize_callnumber_cached():
+    normalize_callnumber.cache_clear()
+    for _ in range(3):
+        normalize_callnumber("*MUS (Beethoven, L. v. Works. 1862)")
+
+    assert normalize_callnumber.cache_info().hits == 2
+
+
 @pytest.mark.parametrize(
     "arg1,arg2,expectation",
     [(["a", "b", "c", "d", "e"], 2, [["a", "b"], ["c", "d"], ["e"]])],
@@ -343,19 +568,72 @@ def test_split_into_batches(arg1, arg2, expectation):
 @pytest.mark.parametrize(
     "arg,expectation",
     [
-        ({"FOO", "BAR", "BAZ"}, {"FOO", "BAR", "BAZ"}),
+        (["FOO", "BAR", "BAZ"], ["FOO", "BAR", "BAZ"]),
         (
-            {"FOO, BAZ", "BAR", "FO.O", "FOO BAZ"},
-            {
+            ["FOO, BAZ", "BAR", "FO.O", "FOO BAZ"],
+            [
                 "FOO, BAZ",
-                "FO.O",
                 "BAR",
-            },
+                "FO.O",
+            ],
         ),
+        (["FOO BAZ", "FOO, BAZ"], ["FOO BAZ"]),
+        ([], []),
     ],
 )
 def test_dedup_orphan_callnumbers(arg, expectation):
-    assert dedup_orphan_callnumbers(arg) == expectation
+    assert list(dedup_orphan_callnumbers(arg)) == expectation
+
+
+def test_dedup_orphan_callnumbers_variants():
+    assert dedup_orphan_callnumbers(
+        ["FOO, BAZ", "BAR", "FOO BAZ", "FOO, BAZ", "(FOO) BAZ"]
+    ) == {"FOO, BAZ": ["FOO, BAZ", "FOO BAZ", "(FOO) BAZ"], "BAR": ["BAR"]}
+
+
+def test_dedup_orphan_callnumbers_large_input():
+    callnumbers = [
+        f"*MUS{p} {n % 5000}{p}"
+        for p in ("", ".", ",", "-", "()")
+        for n in range(20_000)
+    ]
+
+    deduped = dedup_orphan_callnumbers(callnumbers)
+
+    assert list(deduped) == [f"*MUS {n}" for n in range(5000)]
+    assert deduped["*MUS 7"] == [
+        "*MUS 7",
+        "*MUS. 7.",
+        "*MUS, 7,",
+        "*MUS- 7-",
+        "*MUS() 7()",
+    ]
+
+
+def test_cleanup_bib_varFields_stable_947_order():
+    varFields = [
+        {
+            "fieldTag": "q",
+            "marcTag": "852",
+            "ind1": "8",
+            "ind2": " ",
+            "subfields": [{"tag": "h", "content": callnumber}],
+        }
+        for callnumber in ["*MUS Z", "*MUS A", "*MUS, Z", "*MUS M", "*MUS. A"]
+    ]
+    callnumbers4del = {"*MUS Z", "*MUS A", "*MUS M"}
+
+    results = [
+        cleanup_bib_varFields(varFields, callnumbers4del, set()) for _ in range(3)
+    ]
+
+    assert [f["subfields"][0]["content"] for f in results[0]] == [
+        "*MUS Z",
+        "*MUS A",
+        "*MUS M",
+    ]
+    assert all(f["marcTag"] == "947" for f in results[0])
+    assert results[0] == results[1] == results[2]
 
 
 def test_cleanup_bib_varFields(stub_bib_as_json):
@@ -451,3 +729,376 @@ def test_cleanup_bib_varFields(stub_bib_as_json):
 #         print(len(res["items"]))
 
 #         res = get_items(sid,)
+
+
+def test_process_bib_updates_items_before_bib(stub_sierra):
+    result = process_bib("00000008", False, "ML410.M5 L3", stub_sierra, 2)
+
+    assert result.error is None
+    assert result.log_row[1:4] == ["00000008", "ML410.M5 L3", 2]
+    assert result.log_row[4] == "800,801"
+    assert result.log_row[5] == 5
+    assert [r[0] for r in stub_sierra.requests] == [
+        "bib_get",
+        "items_get",
+        "item_update",
+        "item_update",
+        "bib_update",
+    ]
+
+
+def test_process_bib_not_found(stub_sierra):
+    result = process_bib("99999999", False, "ML410.M5 L3", stub_sierra, 2)
+
+    assert result.log_row[1:] == ["99999999", "ML410.M5 L3", "ERROR-BIB NOT FOUND"]
+    assert result.error is None
+
+
+def test_fetch_items_splits_rejected_batches(stub_sierra):
+    stub_sierra.items.update({str(n): stub_ref_item(str(n)) for n in range(1000, 1120)})
+    stub_sierra.max_ids = 20
+    itemNos = [str(n) for n in range(1000, 1120)]
+
+    items, req_no = fetch_items(itemNos, stub_sierra)
+
+    assert [i["id"] for i in items] == itemNos
+    assert req_no == len(stub_sierra.requests) == 12
+    assert [len(r[1].split(",")) for r in stub_sierra.requests[:3]] == [50, 25, 12]
+
+
+def test_fetch_items_single_item_error(stub_sierra):
+    stub_sierra.max_ids = 0
+    with pytest.raises(BookopsSierraError):
+        fetch_items(["100", "101", "102"], stub_sierra)
+
+
+def test_fetch_items_server_error_not_split(stub_sierra, monkeypatch):
+    def items_get(sids, fields=None):
+        stub_sierra.requests.append(("items_get", sids))
+        raise BookopsSierraError("503: Service Unavailable")
+
+    monkeypatch.setattr(stub_sierra, "items_get", items_get)
+    with pytest.raises(BookopsSierraError):
+        fetch_items(["100", "101", "102"], stub_sierra)
+
+    assert stub_sierra.requests == [("items_get", "100,101,102")]
+
+
+@pytest.mark.parametrize(
+    "arg,expectation",
+    [
+        ("414: Request-URI Too Long", True),
+        ("400: Bad Request", True),
+        ("404: Record not found", True),
+        ("500: Internal Server Error", False),
+        ("503: Service Unavailable", False),
+        ("Connection Error: <class 'requests.exceptions.Timeout'>", False),
+        ("", False),
+    ],
+)
+def test_is_rejected_request(arg, expectation):
+    assert is_rejected_request(BookopsSierraError(arg)) == expectation
+
+
+@pytest.mark.parametrize("workers,prefetch", [(1, 0), (3, 0), (8, 0), (3, 5)])
+def test_reclass_bibs_deterministic_audit_log(tmp_path, stub_sierra, workers, prefetch):
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 21)]
+    src_data.insert(5, ("99999999", False, "ML410.M5 L3"))
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+
+    with CsvSink(log_fh) as audit_log, CsvSink(errors_fh) as errors_log:
+        reclass_bibs(
+            src_data, stub_sierra, audit_log, errors_log, workers, prefetch=prefetch
+        )
+
+    assert read_log(log_fh) == [sid for sid, _, _ in src_data]
+    assert [r for r in stub_sierra.requests if r[0] in ("bib_get", "bibs_get")] == [
+        ("bibs_get", ",".join(sid for sid, _, _ in src_data)),
+        ("bib_get", "99999999"),
+    ]
+    updates = [r for r in stub_sierra.requests if r[0] != "items_get"]
+    for sid, bib in stub_sierra.bibs.items():
+        bib_update = updates.index(("bib_update", sid))
+        for url in bib["items"]:
+            assert updates.index(("item_update", url.rsplit("/", 1)[-1])) < bib_update
+
+
+def test_reclass_bibs_stops_on_item_update_error(tmp_path, stub_sierra):
+    stub_sierra.fail_items.add("300")
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 21)]
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+
+    with CsvSink(log_fh) as audit_log, CsvSink(errors_fh) as errors_log:
+        with pytest.raises(BookopsSierraError):
+            reclass_bibs(src_data, stub_sierra, audit_log, errors_log, workers=2)
+
+    logged = read_log(log_fh)
+    assert logged == [f"{n:08}" for n in range(1, len(logged) + 2) if n != 3]
+    assert len(logged) < 19
+    assert ("bib_update", "00000003") not in stub_sierra.requests
+    with open(errors_fh, "r", encoding="utf-8") as f:
+        assert f.read().strip() == "00000003,300"
+
+
+def test_reclass_bibs_over_http_throttled_and_retried(tmp_path, stub_sierra_server):
+    server = stub_sierra_server
+    server.failures = {
+        ("GET", "/bibs/"): [(503,)],
+        ("PUT", "/items/300"): [(503,)],
+        ("PUT", "/bibs/00000004"): [(429, None, {"Retry-After": "0"})],
+    }
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 7)]
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+
+    with (
+        HttpSierraSession(f"http://127.0.0.1:{server.server_port}") as conn,
+        CsvSink(log_fh) as audit_log,
+        CsvSink(errors_fh) as errors_log,
+    ):
+        RateLimiter(100).attach(conn)
+        reclass_bibs(src_data, conn, audit_log, errors_log, workers=4)
+
+    assert read_log(log_fh) == [sid for sid, _, _ in src_data]
+    sent = [(method, path) for method, path, _ in server.requests]
+    assert sent.count(("GET", "/bibs/")) == 2
+    assert sent.count(("PUT", "/items/300")) == 2
+    assert sent.count(("PUT", "/bibs/00000004")) == 2
+    assert all(
+        item_is_updated(server.items[url.rsplit("/", 1)[-1]])
+        for sid, _, _ in src_data
+        for url in server.bibs[sid]["items"]
+    )
+    times = [t for _, _, t in server.requests]
+    assert times[-1] - times[0] >= (len(times) - 1) / 100 * 0.9
+
+
+def test_rate_limiter_over_http_does_not_resend_post(stub_sierra_server):
+    server = stub_sierra_server
+    server.failures = {
+        ("POST", "/bibs/"): [(503,)],
+        ("GET", "/bibs/00000001"): [(503,), (502,)],
+    }
+
+    with HttpSierraSession(f"http://127.0.0.1:{server.server_port}") as conn:
+        RateLimiter(100).attach(conn)
+        assert conn.post(f"{conn.base_url}/bibs/", json={}).status_code == 503
+        assert conn.bib_get("00000001").json() == server.bibs["00000001"]
+
+    assert [(method, path) for method, path, _ in server.requests] == [
+        ("POST", "/bibs/"),
+        ("GET", "/bibs/00000001"),
+        ("GET", "/bibs/00000001"),
+        ("GET", "/bibs/00000001"),
+    ]
+
+
+def test_reclass_bibs_resume(tmp_path, stub_sierra):
+    expected = StubSierraSession(
+        {k: dict(v) for k, v in stub_sierra.bibs.items()},
+        {k: dict(v) for k, v in stub_sierra.items.items()},
+    )
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 21)]
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+    journal_fh = str(tmp_path / "journal.tsv")
+    with CsvSink(log_fh) as audit_log, CsvSink(errors_fh) as errors_log:
+        reclass_bibs(src_data, expected, audit_log, errors_log)
+
+    stub_sierra.fail_items.add("301")
+    with (
+        CsvSink(log_fh) as audit_log,
+        CsvSink(errors_fh) as errors_log,
+        CheckpointJournal(journal_fh) as journal,
+    ):
+        with pytest.raises(BookopsSierraError):
+            reclass_bibs(src_data, stub_sierra, audit_log, errors_log, journal=journal)
+
+    assert stub_sierra.bibs["00000003"] != expected.bibs["00000003"]
+    stub_sierra.fail_items.clear()
+    stub_sierra.requests.clear()
+    with (
+        CsvSink(log_fh) as audit_log,
+        CsvSink(errors_fh) as errors_log,
+        CheckpointJournal(journal_fh, resume=True) as journal,
+    ):
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log, journal=journal)
+        assert all(journal.done("bib", sid) for sid, _, _ in src_data)
+
+    bibs_read = [r[1] for r in stub_sierra.requests if r[0] == "bibs_get"]
+    assert bibs_read[0].split(",")[0] == "00000003"
+    assert ("item_update", "300") not in stub_sierra.requests
+    assert ("item_update", "301") in stub_sierra.requests
+    assert stub_sierra.bibs == expected.bibs
+    assert stub_sierra.items == expected.items
+
+
+def test_reclass_bibs_logs_on_disk_before_bib_journaled(tmp_path, stub_sierra):
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 11)]
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+    journaled = []
+
+    class CheckingJournal(CheckpointJournal):
+        def record(self, kind, key, *values):
+            if kind == "bib":
+                journaled.append(key)
+                assert key in read_log(log_fh)
+            super().record(kind, key, *values)
+
+    with (
+        CsvSink(log_fh, flush_rows=500, flush_interval=60) as audit_log,
+        CsvSink(errors_fh, flush_rows=500, flush_interval=60) as errors_log,
+        CheckingJournal(str(tmp_path / "journal.tsv")) as journal,
+    ):
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log, journal=journal)
+
+    assert journaled == [sid for sid, _, _ in src_data]
+
+
+def test_reclass_bibs_index_skips_reclassified_records(tmp_path, stub_sierra):
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 21)]
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+    with (
+        CsvSink(log_fh) as audit_log,
+        CsvSink(errors_fh) as errors_log,
+        ReclassIndex(str(tmp_path / "index.db")) as index,
+    ):
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log, index=index)
+        requests_made = len(stub_sierra.requests)
+        stub_sierra.requests.clear()
+
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log, index=index)
+        assert stub_sierra.requests == []
+        assert index.skipped_bibs == 20
+        assert index.requests_saved == requests_made - 1
+
+        src_data[1] = ("00000002", False, "ML410.M5 L4")
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log, index=index)
+        assert stub_sierra.requests == [
+            ("bibs_get", "00000002"),
+            ("items_get", "200,201,202"),
+        ]
+        assert index.skipped_bibs == 39
+
+
+def test_reclass_bibs_index_skips_bibs_not_updated(tmp_path, stub_sierra):
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 6)]
+    log_fh = str(tmp_path / "log.csv")
+    errors_fh = str(tmp_path / "errors.csv")
+    with CsvSink(log_fh) as audit_log, CsvSink(errors_fh) as errors_log:
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log)
+    # items updated but bibs not, as after a crash
+    for sid, _, _ in src_data:
+        stub_sierra.bibs[sid]["varFields"] = [{"fieldTag": "a", "content": "Foo"}]
+    stub_sierra.requests.clear()
+
+    with (
+        CsvSink(log_fh) as audit_log,
+        CsvSink(errors_fh) as errors_log,
+        ReclassIndex(str(tmp_path / "index.db")) as index,
+    ):
+        reclass_bibs(src_data, stub_sierra, audit_log, errors_log, index=index)
+
+        assert not [r for r in stub_sierra.requests if r[0] == "bib_update"]
+        assert all(
+            index.bib_requests(sid, "ML410.M5 L3") is None for sid, _, _ in src_data
+        )
+
+
+def test_diff_varFields():
+    old = [{"fieldTag": "b", "content": "1"}, {"fieldTag": "c", "content": "FOO"}]
+    new = [{"fieldTag": "b", "content": "1"}, {"fieldTag": "c", "content": "BAR"}]
+
+    assert diff_varFields(old, new) == {
+        "removed": [{"fieldTag": "c", "content": "FOO"}],
+        "added": [{"fieldTag": "c", "content": "BAR"}],
+    }
+
+
+def test_diff_bib(stub_sierra):
+    diff = diff_bib(
+        "00000008", False, "ML410.M5 L3", fetch_bib("00000008", stub_sierra)
+    )
+
+    assert diff["status"] == "update"
+    assert [i["id"] for i in diff["items"]] == ["800", "801"]
+    assert diff["items"][0]["removed"] == stub_sierra.items["800"]["varFields"]
+    assert diff["bib"]["removed"] == []
+    assert diff["bib"]["added"][0]["marcTag"] == "852"
+    assert diff["errors"] == []
+
+
+def test_dry_run_bibs_from_snapshots(tmp_path, stub_sierra):
+    src_data = [(f"{n:08}", False, "ML410.M5 L3") for n in range(1, 6)]
+    src_data.append(("99999999", False, "ML410.M5 L3"))
+    snapshot_dir = str(tmp_path / "snapshots")
+    bibs_before = {k: dict(v) for k, v in stub_sierra.bibs.items()}
+
+    first = io.StringIO()
+    assert dry_run_bibs(src_data, first, snapshot_dir, stub_sierra) == 6
+    assert not [r for r in stub_sierra.requests if r[0].endswith("update")]
+    assert stub_sierra.bibs == bibs_before
+
+    stub_sierra.requests.clear()
+    second = io.StringIO()
+    assert dry_run_bibs(src_data, second, snapshot_dir) == 0
+    assert stub_sierra.requests == []
+    assert first.getvalue() == second.getvalue()
+
+    diffs = [json.loads(line) for line in second.getvalue().splitlines()]
+    assert [(d["row"], d["bibNo"], d["status"]) for d in diffs] == [
+        (2, "00000001", "update"),
+        (3, "00000002", "update"),
+        (4, "00000003", "update"),
+        (5, "00000004", "update"),
+        (6, "00000005", "update"),
+        (7, "99999999", "not found"),
+    ]
+
+
+def test_dry_run_bibs_offline_missing_snapshot(tmp_path):
+    out = io.StringIO()
+    dry_run_bibs([("00000001", False, "ML410")], out, str(tmp_path))
+
+    assert json.loads(out.getvalue()) == {
+        "row": 2,
+        "bibNo": "00000001",
+        "lcc": "ML410",
+        "status": "no snapshot",
+    }
+
+
+def test_analyze_items(stub_lpa_item, stub_lpa_item_updated, stub_other_item):
+    conflict = stub_ref_item("300")
+    conflict["varFields"].append(conflict["varFields"][0])
+    items = [stub_lpa_item, stub_other_item, stub_lpa_item_updated, conflict]
+
+    summary = analyze_items(items)
+
+    assert summary.ref_items == [stub_lpa_item, stub_lpa_item_updated, conflict]
+    assert summary.other_items == [stub_other_item]
+    assert summary.ref_callnumbers == {"FOO BAR", "FOOBAR", "*MUS 300"}
+    assert summary.other_callnumbers == {"BAZ"}
+    assert summary.updated == {stub_lpa_item_updated["id"]}
+    assert summary.conflicts == {"300"}
+    assert summary.callnumbers4del == summary.ref_callnumbers
+
+
+def test_analyze_items_item_helpers(stub_lpa_item_updated, stub_other_item):
+    shared = stub_ref_item("200")
+    items = [
+        stub_ref_item("100"),
+        shared,
+        stub_lpa_item_updated,
+        stub_other_item | {"id": "X", "varFields": shared["varFields"]},
+        stub_other_item,
+    ]
+
+    assert determine_safe_to_delete_item_callnumbers(items) == {"*MUS 100", "FOOBAR"}
+    assert get_other_item_callnumbers(items) == {"*MUS 200", "BAZ"}
+    assert analyze_items(items).updated == {"3159578"}
+    assert [i["id"] for i in items if item_is_updated(i)] == ["3159578"]
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from src.lpa_reclass_index import ReclassIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    with ReclassIndex(str(tmp_path / "index.db")) as index:
+        yield index
+
+
+def test_reclass_index_bib(index):
+    index.record_bib("00000001", "ML410.M5 L3", 7)
+
+    assert index.bib_requests("00000001", "ML410.M5 L3") == 7
+    assert index.bib_requests("00000001", "ML410.M5 L4") is None
+    assert index.bib_requests("00000002", "ML410.M5 L3") is None
+
+
+def test_reclass_index_record_bib_replaces_lcc(index):
+    index.record_bib("00000001", "ML410.M5 L3", 7)
+    index.record_bib("00000001", "ML410.M5 L4", 3)
+
+    assert index.bib_requests("00000001", "ML410.M5 L3") is None
+    assert index.bib_requests("00000001", "ML410.M5 L4") == 3
+
+
+def test_reclass_index_skip_counts_saved_requests(index):
+    index.record_bib("00000001", "ML410.M5 L3", 7)
+
+    assert index.skip_bib("00000001", "ML410.M5 L3")
+    assert not index.skip_bib("00000002", "ML410.M5 L3")
+    assert (index.skipped_bibs, index.requests_saved) == (1, 7)
+
+
+def test_reclass_index_reset(index):
+    index.record_bib("00000001", "ML410.M5 L3", 7)
+    index.record_bib("00000002", "ML410.M5 L4", 3)
+    index.reset()
+
+    assert index.bib_requests("00000001", "ML410.M5 L3") is None
+    assert index.bib_requests("00000002", "ML410.M5 L4") is None
+
+
+def test_reclass_index_persists(tmp_path):
+    db_fh = str(tmp_path / "index.db")
+    with ReclassIndex(db_fh) as index:
+        index.record_bib("00000001", "ML410.M5 L3", 7)
+
+    with ReclassIndex(db_fh) as index:
+        assert index.bib_requests("00000001", "ML410.M5 L3") == 7
+
+
+def test_reclass_index_shared_by_threads(index):
+    def record(n):
+        for i in range(50):
+            index.record_bib(f"{n}{i:02}", "ML410.M5 L3", i)
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(1, 5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(index.bib_requests(f"4{i:02}", "ML410.M5 L3") == i for i in range(50))
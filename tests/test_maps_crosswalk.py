@@ -1,11 +1,21 @@
+import csv
+from datetime import datetime, timezone
+
+from pymarc import MARCReader
 import pytest
 
 
 from src.maps_crosswalk import (
+    BatchContext,
+    MapData,
+    chunk_rows,
+    clone_field,
     construct_subject_subfields,
     construct_personal_author_subfields,
     construct_corporate_author_subfields,
+    create_bibs,
     determine_control_number_sequence,
+    encode_subjects,
     encode_pub_date,
     encode_scale,
     has_invalid_last_chr,
@@ -14,14 +24,53 @@ from src.maps_crosswalk import (
     identify_t100_subfield_d,
     identify_t100_subfield_q_position,
     identify_t100_subfield_q,
+    make_bib,
+    make_bib_marc,
     norm_last_subfield,
     norm_scale_text,
     norm_pub_date_text,
     norm_subfield_separator,
     split_subject_elements,
+    subdivision_subfield_code,
+    to_subfields,
 )
 
 
+@pytest.fixture
+def stub_map_row():
+    return MapData(
+        barcode="33433000000001",
+        t100="Wyld, James, 1812-1887",
+        t110="",
+        t245="Map of the United States",
+        t246="",
+        t250="",
+        t255="1:800,000",
+        t260="[186-]",
+        t490="",
+        t500="Folded",
+        t505="",
+        t600="",
+        t610="",
+        t611="",
+        t650="",
+        t651="United States -- Maps; Minnesota - Maps",
+        t655="Maps",
+        t852="Map Div. 21-12345",
+    )
+
+
+@pytest.fixture
+def stub_map_csv(tmp_path, stub_map_row):
+    fh = tmp_path / "maps.csv"
+    with open(fh, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Barcode"] + [""] * 17)
+        for n in range(7):
+            writer.writerow(stub_map_row._replace(t245=f"Map {n}"))
+    return str(fh)
+
+
 @pytest.mark.parametrize("arg,expectation", [(1, "00000001"), (123, "00000123")])
 def test_determine_control_number_sequence(arg, expectation):
     assert determine_control_number_sequence(arg) == expectation
@@ -127,6 +176,36 @@ def test_construct_subject_subfields(arg, expectation):
     assert construct_subject_subfields(arg) == expectation
 
 
+def test_construct_subject_subfields_custom_subdivisions():
+    assert construct_subject_subfields(
+        "Alaska -- Gold discoveries -- Pictorial works -- Maps",
+        subdivisions={"pictorial": "x"},
+    ) == [
+        "a",
+        "Alaska",
+        "z",
+        "Gold discoveries",
+        "x",
+        "Pictorial works",
+        "v",
+        "Maps.",
+    ]
+
+
+@pytest.mark.parametrize(
+    "arg,expectation",
+    [
+        ("History", "x"),
+        ("Gold DISCOVERIES", "x"),
+        ("Civil War, 1861-1865", "y"),
+        ("History of war", "x"),
+        ("Minnesota", "z"),
+    ],
+)
+def test_subdivision_subfield_code(arg, expectation):
+    assert subdivision_subfield_code(arg) == expectation
+
+
 @pytest.mark.parametrize(
     "arg,expectation",
     [
@@ -192,7 +271,14 @@ def test_has_invalid_last_chr(arg, expectation):
 
 @pytest.mark.parametrize(
     "arg,expectation",
-    [("foo", "foo."), ("foo.", "foo."), ("foo..", "foo."), ("foo ", "foo.")],
+    [
+        ("foo", "foo."),
+        ("foo.", "foo."),
+        ("foo..", "foo."),
+        ("foo ", "foo."),
+        ("foo ;. ,", "foo."),
+        ("foo.bar", "foo.bar."),
+    ],
 )
 def test_norm_last_subfield(arg, expectation):
     assert norm_last_subfield(arg) == expectation
@@ -286,3 +372,147 @@ def test_construct_personal_author_subfields(arg, expectation):
 )
 def test_construct_corporate_author_subfields(arg, expectation):
     assert construct_personal_author_subfields(arg) == expectation
+
+
+def test_to_subfields():
+    subfields = to_subfields(["a", "foo", "v", "bar."])
+    assert [(s.code, s.value) for s in subfields] == [("a", "foo"), ("v", "bar.")]
+
+
+def test_make_bib(stub_map_row):
+    bib = make_bib(stub_map_row, "00000001")
+
+    assert bib["001"].data == "bkops-map-00000001"
+    assert str(bib["100"]) == "=100  1\\$aWyld, James,$d1812-1887,$ecartographer."
+    assert [str(f) for f in bib.get_fields("651")] == [
+        "=651  \\0$aUnited States$vMaps.",
+        "=651  \\0$aMinnesota$vMaps.",
+    ]
+    assert str(bib["852"]) == "=852  8\\$hMap Div. 21-12345"
+    tags = [f.tag for f in bib.fields]
+    assert tags == sorted(tags)
+
+
+def test_chunk_rows_assigns_sequence_in_source_order():
+    chunks = list(chunk_rows(iter(["a", "b", "c", "d", "e"]), 10, 2))
+    assert chunks == [[(10, "a"), (11, "b")], [(12, "c"), (13, "d")], [(14, "e")]]
+
+
+def read_marc(fh):
+    with open(fh, "rb") as f:
+        return [bib for bib in MARCReader(f)]
+
+
+@pytest.mark.parametrize("workers,chunk_size", [(2, 2), (3, 1), (None, 500)])
+def test_create_bibs_parallel_same_as_serial(
+    tmp_path, stub_map_csv, workers, chunk_size
+):
+    serial_fh = str(tmp_path / "serial.mrc")
+    parallel_fh = str(tmp_path / "parallel.mrc")
+    create_bibs(stub_map_csv, serial_fh, 830)
+    create_bibs(stub_map_csv, parallel_fh, 830, workers=workers, chunk_size=chunk_size)
+
+    serial = read_marc(serial_fh)
+    parallel = read_marc(parallel_fh)
+    assert [b["001"].data for b in parallel] == [
+        f"bkops-map-{n:08}" for n in range(830, 837)
+    ]
+    assert [b["245"]["a"] for b in parallel] == [f"Map {n}." for n in range(7)]
+    for s_bib, p_bib in zip(serial, parallel):
+        s_bib.remove_fields("005")
+        p_bib.remove_fields("005")
+        assert s_bib.as_marc() == p_bib.as_marc()
+
+
+def test_encode_subjects_cached_fields_are_not_shared():
+    first = encode_subjects("Ohio -- Maps; Ohio -- Maps", "651")
+    second = encode_subjects("Ohio -- Maps", "651")
+    first[0].add_subfield("2", "foo")
+
+    assert str(first[0]) == "=651  \\0$aOhio$vMaps.$2foo"
+    assert str(first[1]) == "=651  \\0$aOhio$vMaps."
+    assert str(second[0]) == "=651  \\0$aOhio$vMaps."
+
+
+def test_create_bibs_reports_subject_cache_usage(tmp_path, stub_map_csv, capsys):
+    create_bibs(stub_map_csv, str(tmp_path / "out.mrc"), 1)
+    captured = capsys.readouterr()
+
+    assert "Subject cache: " in captured.out
+    hits = int(captured.out.split("Subject cache: ")[1].split(" hits")[0])
+    assert hits >= 12
+
+
+def test_batch_context_frozen_values():
+    created = datetime(2024, 3, 5, 9, 30, 15, tzinfo=timezone.utc)
+    batch = BatchContext(created)
+
+    assert batch.timestamp == "20240305093015.0"
+    assert batch.date_created == "240305"
+    assert batch.field("005").data == "20240305093015.0"
+    assert str(batch.field("901")) == (
+        "=901  \\\\$aMAP DIV folded maps project$n20240305"
+    )
+
+
+def test_batch_context_fields_are_copies():
+    batch = BatchContext()
+    field = batch.field("910")
+    field.add_subfield("b", "foo")
+
+    assert str(batch.field("910")) == "=910  \\\\$aRL"
+    assert batch.field("003") is not batch.field("003")
+
+
+def test_clone_field():
+    batch = BatchContext()
+    original = batch.fields["336"]
+    clone = clone_field(original)
+
+    assert str(clone) == str(original)
+    assert clone.subfields is not original.subfields
+
+
+def test_make_bib_with_batch_context(stub_map_row):
+    created = datetime(2024, 3, 5, 9, 30, 15, tzinfo=timezone.utc)
+    batch = BatchContext(created)
+    bib1 = make_bib(stub_map_row, "00000001", batch)
+    bib2 = make_bib(stub_map_row, "00000002", batch)
+
+    for bib in (bib1, bib2):
+        assert bib["005"].data == "20240305093015.0"
+        assert bib["008"].data.startswith("240305s186u")
+        assert bib["901"]["n"] == "20240305"
+        assert str(bib["949"]) == "=949  \\\\$a*b2=e;b3=k;bn=map;"
+    assert bib1["300"] is not bib2["300"]
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {},
+        {"t100": "", "t110": "Rand McNally and Company"},
+        {"t100": "", "t245": "", "t852": ""},
+        {"t650": "Kraków (Poland) -- History -- Maps", "t600": "Wyld, James"},
+        {"t255": "Scales vary", "t260": "", "t505": "Sheet 1 -- Sheet 2"},
+    ],
+)
+def test_make_bib_marc_same_as_make_bib(stub_map_row, changes):
+    row = stub_map_row._replace(**changes)
+    batch = BatchContext()
+
+    assert make_bib_marc(row, "00000001", batch) == (
+        make_bib(row, "00000001", batch).as_marc()
+    )
+
+
+def test_make_bib_marc_does_not_build_fields(stub_map_row, monkeypatch):
+    batch = BatchContext()
+    expected = make_bib(stub_map_row, "00000001", batch).as_marc()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("pymarc.Field created")
+
+    monkeypatch.setattr("src.maps_crosswalk.Field", fail)
+
+    assert make_bib_marc(stub_map_row, "00000001", batch) == expected
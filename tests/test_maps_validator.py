@@ -0,0 +1,86 @@
+import csv
+
+import pandas as pd
+import pytest
+
+from src.maps_validator import load_map_data, validate_map_data
+
+
+def map_row(barcode, t245="Foo", t650="", t651="", t852="Map Div. 21-1"):
+    row = [barcode, "", "", t245] + [""] * 14
+    row[14] = t650
+    row[15] = t651
+    row[17] = t852
+    return row
+
+
+@pytest.fixture
+def stub_map_csv(tmp_path):
+    fh = tmp_path / "maps.csv"
+    with open(fh, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Barcode"] + [""] * 17)
+        writer.writerow(map_row("1"))
+        writer.writerow(map_row("2", t245=""))
+        writer.writerow(map_row("3", t852="  "))
+        writer.writerow(map_row("4", t852="21-12345"))
+        writer.writerow(
+            map_row("5", t651="Ohio -- Maps; Cuyahoga-River -- Maps; Erie-Lake")
+        )
+        writer.writerow(map_row("6", t650="World War, 1939-1945"))
+    return str(fh)
+
+
+def test_load_map_data(stub_map_csv):
+    df = load_map_data(stub_map_csv)
+
+    assert list(df["barcode"]) == ["1", "2", "3", "4", "5", "6"]
+    assert list(df["row"]) == [2, 3, 4, 5, 6, 7]
+
+
+def test_validate_map_data(stub_map_csv):
+    report = validate_map_data(stub_map_csv)
+
+    assert report[["row", "barcode", "column", "issue", "value"]].values.tolist() == [
+        [3, "2", "t245", "missing title", ""],
+        [4, "3", "t852", "missing 852 tag", "  "],
+        [5, "4", "t852", "malformed call number", "21-12345"],
+        [6, "5", "t651", "hyphen in subject", "Erie-Lake"],
+        [7, "6", "t650", "hyphen in subject", "World War, 1939-1945"],
+    ]
+
+
+def test_validate_map_data_control_numbers(stub_map_csv):
+    report = validate_map_data(stub_map_csv, start_sequence=830)
+
+    assert list(report["control_no"]) == [
+        "bkops-map-00000831",
+        "bkops-map-00000832",
+        "bkops-map-00000833",
+        "bkops-map-00000834",
+        "bkops-map-00000835",
+    ]
+
+
+def test_validate_map_data_writes_report(tmp_path, stub_map_csv):
+    report_fh = tmp_path / "report.csv"
+    report = validate_map_data(stub_map_csv, str(report_fh))
+
+    saved = pd.read_csv(report_fh, dtype=str, keep_default_na=False)
+    assert list(saved.columns) == [
+        "row",
+        "barcode",
+        "control_no",
+        "column",
+        "issue",
+        "value",
+    ]
+    assert len(saved) == len(report)
+
+
+def test_validate_map_data_no_issues(tmp_path):
+    fh = tmp_path / "maps.csv"
+    with open(fh, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow(map_row("1", t651="Ohio -- Maps"))
+
+    assert validate_map_data(str(fh)).empty
@@ -0,0 +1,119 @@
+from io import BytesIO
+import os
+
+from pymarc import Field, Record, Subfield, parse_xml_to_array, record_to_xml
+import pytest
+
+from src.marcxml import MarcXmlDecoder, iter_marcxml, iter_marcxml_documents
+
+
+TEST_RECORD_FH = os.path.join(os.path.dirname(__file__), "test_record.xml")
+
+
+def make_record(n):
+    record = Record()
+    record.add_field(Field(tag="001", data=f"ocm{n:08}"))
+    record.add_field(
+        Field(
+            tag="245",
+            indicators=["1", "4"],
+            subfields=[Subfield("a", f"The title & <{n}>"), Subfield("c", "Zoë.")],
+        )
+    )
+    record.add_field(
+        Field(tag="020", indicators=[" ", " "], subfields=[Subfield("a", "")])
+    )
+    return record
+
+
+def make_document(n, collection=True):
+    records = b"".join(
+        record_to_xml(make_record(i), namespace=not collection) for i in range(n)
+    )
+    if collection:
+        records = (
+            b'<collection xmlns="http://www.loc.gov/MARC21/slim">'
+            + records
+            + b"</collection>"
+        )
+    return b"<?xml version='1.0' encoding='UTF-8'?>\n" + records
+
+
+def as_marc(records):
+    return [r.as_marc() for r in records]
+
+
+def test_iter_marcxml_same_as_pymarc_file():
+    expected = parse_xml_to_array(TEST_RECORD_FH)
+    records = list(iter_marcxml(TEST_RECORD_FH))
+
+    assert len(records) == 1
+    assert as_marc(records) == as_marc(expected)
+    assert str(records[0].leader) == str(expected[0].leader)
+
+
+@pytest.mark.parametrize("collection", [True, False])
+def test_iter_marcxml_same_as_pymarc_document(collection):
+    n = 1 if not collection else 5
+    document = make_document(n, collection)
+
+    records = list(iter_marcxml(document))
+
+    assert len(records) == n
+    assert as_marc(records) == as_marc(parse_xml_to_array(BytesIO(document)))
+    assert records[0]["245"].indicator2 == "4"
+    assert records[0]["245"]["a"] == "The title & <0>"
+    assert records[0]["020"]["a"] == ""
+
+
+def test_iter_marcxml_file_object():
+    document = make_document(3)
+    records = list(iter_marcxml(BytesIO(document)))
+
+    assert as_marc(records) == as_marc(parse_xml_to_array(BytesIO(document)))
+
+
+def test_iter_marcxml_concatenated_documents():
+    documents = [make_document(1, collection=False), make_document(2)]
+    expected = [r for d in documents for r in parse_xml_to_array(BytesIO(d))]
+
+    records = list(iter_marcxml(b"\n".join(documents)))
+
+    assert as_marc(records) == as_marc(expected)
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1000])
+def test_iter_marcxml_documents_in_chunks(size):
+    data = make_document(3) + make_document(1, collection=False)
+    chunks = [data[i : i + size] for i in range(0, len(data), size)]
+
+    records = list(iter_marcxml_documents(chunks))
+
+    assert [r["001"].data for r in records] == [
+        "ocm00000000",
+        "ocm00000001",
+        "ocm00000002",
+        "ocm00000000",
+    ]
+
+
+def test_marc_xml_decoder_yields_records_as_completed():
+    decoder = MarcXmlDecoder()
+    document = make_document(2)
+    end = document.index(b"</record>") + len(b"</record>")
+
+    decoder.feed(document[:end])
+    assert [r["001"].data for r in decoder.read_records()] == ["ocm00000000"]
+    decoder.feed(document[end:])
+    assert [r["001"].data for r in decoder.read_records()] == ["ocm00000001"]
+    assert decoder.close() == []
+
+
+def test_marc_xml_decoder_drops_decoded_elements():
+    decoder = MarcXmlDecoder()
+    for _ in range(3):
+        decoder.feed(make_document(10))
+        list(decoder.read_records())
+
+    assert len(decoder._stack) == 1
+    assert len(decoder._stack[0]) == 0
@@ -0,0 +1,198 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+import pytest
+import requests
+
+from src.rate_limit import RateLimiter, is_retryable, parse_retry_after
+
+
+class StubResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("arg", [0, -1])
+def test_rate_limiter_invalid_rate(arg):
+    with pytest.raises(ValueError):
+        RateLimiter(arg)
+
+
+def test_rate_limiter_invalid_burst():
+    with pytest.raises(ValueError):
+        RateLimiter(1, burst=0)
+
+
+def test_rate_limiter_acquire_shared_by_threads():
+    limiter = RateLimiter(100)
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)])
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_acquire_burst():
+    limiter = RateLimiter(1, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.parametrize(
+    "arg,expectation",
+    [
+        (None, None),
+        ("", None),
+        ("2", 2.0),
+        ("0.5", 0.5),
+        ("-3", 0.0),
+        ("foo", None),
+    ],
+)
+def test_parse_retry_after(arg, expectation):
+    assert parse_retry_after(arg) == expectation
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_rate_limiter_feedback_aimd():
+    limiter = RateLimiter(10, min_rate=1)
+    limiter.feedback(429)
+    assert limiter.rate == 5
+    limiter.feedback(503)
+    limiter.feedback(500)
+    limiter.feedback(502)
+    assert limiter.rate == 1
+    limiter.feedback(200)
+    assert limiter.rate == 1.5
+    for _ in range(100):
+        limiter.feedback(200)
+    assert limiter.rate == 10
+
+
+def test_rate_limiter_feedback_retry_after():
+    limiter = RateLimiter(1000)
+    limiter.feedback(429, retry_after=0.1)
+    start = time.monotonic()
+    limiter.acquire()
+
+    assert time.monotonic() - start >= 0.1
+
+
+def test_rate_limiter_attach(monkeypatch):
+    sent = []
+    session = requests.Session()
+    monkeypatch.setattr(
+        session, "send", lambda request, **kwargs: sent.append(1) or StubResponse()
+    )
+    limiter = RateLimiter(50)
+
+    assert limiter.attach(session) is session
+    start = time.monotonic()
+    for _ in range(3):
+        session.send(None)
+
+    assert len(sent) == 3
+    assert time.monotonic() - start >= 0.04
+
+
+def test_rate_limiter_attach_retries(monkeypatch):
+    responses = [
+        StubResponse(429, {"Retry-After": "0.05"}),
+        StubResponse(503),
+        StubResponse(200),
+    ]
+    session = requests.Session()
+    monkeypatch.setattr(session, "send", lambda request, **kwargs: responses.pop(0))
+    RateLimiter(1000).attach(session)
+
+    assert (
+        session.send(requests.Request("GET", "http://x").prepare()).status_code == 200
+    )
+    assert responses == []
+
+
+def test_rate_limiter_attach_retries_exhausted(monkeypatch):
+    sent = []
+    session = requests.Session()
+    monkeypatch.setattr(
+        session, "send", lambda request, **kwargs: sent.append(1) or StubResponse(500)
+    )
+    RateLimiter(1000).attach(session, retries=2)
+
+    assert (
+        session.send(requests.Request("PUT", "http://x").prepare()).status_code == 500
+    )
+    assert len(sent) == 3
+
+
+@pytest.mark.parametrize(
+    "status,headers,expectation",
+    [
+        (500, {}, 1),
+        (502, {}, 1),
+        (429, {}, 1),
+        (429, {"Retry-After": "0"}, 2),
+    ],
+)
+def test_rate_limiter_attach_post_not_resent(monkeypatch, status, headers, expectation):
+    responses = [StubResponse(status, headers), StubResponse(201)]
+    session = requests.Session()
+    monkeypatch.setattr(session, "send", lambda request, **kwargs: responses.pop(0))
+    RateLimiter(1000).attach(session)
+
+    session.send(requests.Request("POST", "http://x").prepare())
+    assert len(responses) == 2 - expectation
+
+
+def test_rate_limiter_attach_retries_off(monkeypatch):
+    sent = []
+    session = requests.Session()
+    monkeypatch.setattr(
+        session, "send", lambda request, **kwargs: sent.append(1) or StubResponse(503)
+    )
+    RateLimiter(1000).attach(session, retries=0)
+
+    assert (
+        session.send(requests.Request("GET", "http://x").prepare()).status_code == 503
+    )
+    assert len(sent) == 1
+
+
+@pytest.mark.parametrize(
+    "method,status,retry_after,expectation",
+    [
+        ("GET", 200, None, False),
+        ("GET", 503, None, True),
+        ("get", 429, None, True),
+        ("HEAD", 500, None, True),
+        ("PUT", 504, None, True),
+        ("DELETE", 502, None, True),
+        ("POST", 500, None, False),
+        ("POST", 503, 1.0, False),
+        ("POST", 429, None, False),
+        ("POST", 429, 0.0, True),
+        ("PATCH", 429, 1.0, True),
+        (None, 503, None, False),
+    ],
+)
+def test_is_retryable(method, status, retry_after, expectation):
+    assert is_retryable(method, status, retry_after) is expectation
@@ -0,0 +1,265 @@
+import random
+
+from pymarc import Field, MARCReader, Record, Subfield
+
+import pytest
+
+from src.utils import (
+    CsvSink,
+    FieldIndex,
+    MarcRouter,
+    MarcWriter,
+    RawMarcBuilder,
+    add_ordered_fields,
+    encode_field,
+    save2csv,
+    save2marc,
+)
+
+
+@pytest.fixture
+def stub_record():
+    bib = Record()
+    bib.leader = "00000cem a2200000Mi 4500"
+    bib.add_field(Field(tag="001", data="bkops-map-00000001"))
+    bib.add_field(
+        Field(
+            tag="245",
+            indicators=["0", "0"],
+            subfields=[Subfield(code="a", value="Foo.")],
+        )
+    )
+    return bib
+
+
+def test_marc_writer_does_not_create_file_without_records(tmp_path):
+    out = tmp_path / "out.mrc"
+    with MarcWriter(str(out)):
+        pass
+
+    assert not out.exists()
+
+
+def test_marc_writer_appends_records(tmp_path, stub_record):
+    out = tmp_path / "out.mrc"
+    with MarcWriter(str(out)) as writer:
+        writer.write(stub_record)
+        writer.write(stub_record)
+
+    assert writer.count == 2
+    assert out.read_bytes() == stub_record.as_marc() * 2
+
+
+def test_marc_writer_flush(tmp_path, stub_record):
+    out = tmp_path / "out.mrc"
+    writer = MarcWriter(str(out))
+    writer.write(stub_record)
+    writer.flush()
+
+    assert out.read_bytes() == stub_record.as_marc()
+    writer.close()
+
+
+def test_marc_writer_write_raw(tmp_path, stub_record):
+    out = tmp_path / "out.mrc"
+    with MarcWriter(str(out), buffer_size=16) as writer:
+        writer.write_raw(stub_record.as_marc())
+
+    with open(out, "rb") as f:
+        bibs = [bib for bib in MARCReader(f)]
+    assert len(bibs) == 1
+    assert bibs[0]["001"].data == "bkops-map-00000001"
+
+
+def test_save2marc_appends_to_existing_file(tmp_path, stub_record):
+    out = tmp_path / "out.mrc"
+    with MarcWriter(str(out)) as writer:
+        writer.write(stub_record)
+    save2marc(str(out), stub_record)
+
+    assert out.read_bytes() == stub_record.as_marc() * 2
+
+
+def test_marc_router_opens_destinations_lazily(tmp_path, stub_record):
+    destinations = {
+        "ser": str(tmp_path / "out-ser.mrc"),
+        "mon": str(tmp_path / "out-mon.mrc"),
+    }
+    with MarcRouter(destinations) as router:
+        router.write("mon", stub_record)
+        router.write("mon", stub_record)
+
+    assert not (tmp_path / "out-ser.mrc").exists()
+    assert (tmp_path / "out-mon.mrc").read_bytes() == stub_record.as_marc() * 2
+    assert router.counts == {"ser": 0, "mon": 2}
+
+
+def test_marc_router_unknown_destination(tmp_path, stub_record):
+    with MarcRouter({"PRC": str(tmp_path / "out-PRC.mrc")}) as router:
+        with pytest.raises(KeyError):
+            router.write("DUP", stub_record)
+
+
+def test_csv_sink_buffers_rows_until_flush(tmp_path):
+    out = tmp_path / "out.csv"
+    with CsvSink(str(out), flush_rows=3, flush_interval=60) as sink:
+        sink.writerow(["foo", "bar"])
+        sink.writerow(["spam", "1,2"])
+        assert out.read_text(encoding="utf-8") == ""
+        sink.writerow(["baz", ""])
+        assert out.read_text(encoding="utf-8") == 'foo,bar\nspam,"1,2"\nbaz,\n'
+
+    assert sink.count == 3
+
+
+def test_csv_sink_flushes_on_interval(tmp_path):
+    out = tmp_path / "out.csv"
+    with CsvSink(str(out), flush_rows=100, flush_interval=0) as sink:
+        sink.writerow(["foo"])
+        assert out.read_text(encoding="utf-8") == "foo\n"
+
+
+def test_csv_sink_reports_unencodable_rows(tmp_path):
+    out = tmp_path / "out.csv"
+    with pytest.warns(UserWarning, match="Unable to encode row"):
+        with CsvSink(str(out)) as sink:
+            sink.writerow(["foo"])
+            sink.writerow(["bad \ud800"])
+            sink.writerow(["bar"])
+
+    assert sink.rejected == [["bad \ud800"]]
+    assert sink.count == 2
+    assert out.read_text(encoding="utf-8") == "foo\nbar\n"
+
+
+def test_save2csv_appends_row(tmp_path):
+    out = tmp_path / "out.csv"
+    save2csv(str(out), ["foo", "bar"])
+    save2csv(str(out), ["spam"])
+
+    assert out.read_text(encoding="utf-8") == "foo,bar\nspam\n"
+
+
+def test_raw_marc_builder_same_as_pymarc(stub_record):
+    stub_record.add_field(
+        Field(
+            tag="651",
+            indicators=[" ", "0"],
+            subfields=[
+                Subfield(code="a", value="Kraków (Poland)"),
+                Subfield(code="v", value="Maps."),
+            ],
+        )
+    )
+    builder = RawMarcBuilder(stub_record.leader)
+    for field in stub_record.fields:
+        builder.add_field(field)
+
+    assert builder.as_marc() == stub_record.as_marc()
+
+
+def test_raw_marc_builder_add_encoded(stub_record):
+    builder = RawMarcBuilder(stub_record.leader)
+    for field in stub_record.fields:
+        builder.add_encoded(field.tag, encode_field(field))
+
+    data = builder.as_marc()
+    assert data == stub_record.as_marc()
+    bib = next(MARCReader(data))
+    assert bib["245"]["a"] == "Foo."
+
+
+def test_raw_marc_builder_empty_record():
+    data = RawMarcBuilder("00000cem a2200000Mi 4500").as_marc()
+
+    assert data == b"00026cem a2200025Mi 4500\x1e\x1d"
+
+
+def make_fields(tags):
+    return [
+        Field(tag=tag, subfields=[Subfield(code="a", value=f"{tag}-{n}")])
+        for n, tag in enumerate(tags)
+    ]
+
+
+def field_ids(record):
+    return [f["a"] for f in record.fields]
+
+
+@pytest.mark.parametrize(
+    "existing,new",
+    [
+        ([], ["949", "245", "100", "245", "020"]),
+        (["100", "245", "650"], ["907", "947", "949"]),
+        (["100", "245", "650"], ["020", "650", "600", "245"]),
+        (["245", "100", "650", "500"], ["300", "050", "700"]),
+        (["100", "LDR", "245"], ["050", "300", "ABC", "010"]),
+        ([], ["ABC", "245", "100"]),
+    ],
+)
+def test_add_ordered_fields_same_as_add_ordered_field(existing, new):
+    expected = Record()
+    expected.add_field(*make_fields(existing))
+    for field in make_fields(new):
+        expected.add_ordered_field(field)
+
+    bib = Record()
+    bib.add_field(*make_fields(existing))
+    add_ordered_fields(bib, make_fields(new))
+
+    assert field_ids(bib) == field_ids(expected)
+
+
+def test_add_ordered_fields_random_same_as_add_ordered_field():
+    rnd = random.Random(8)
+    tags = ["001", "008", "020", "100", "245", "245", "300", "650", "949", "XYZ"]
+    for _ in range(500):
+        existing = make_fields(rnd.choices(tags, k=rnd.randint(0, 8)))
+        new = make_fields(rnd.choices(tags, k=rnd.randint(0, 8)))
+
+        expected = Record()
+        expected.add_field(*existing)
+        for field in new:
+            expected.add_ordered_field(field)
+
+        bib = Record()
+        bib.add_field(*existing)
+        add_ordered_fields(bib, new)
+
+        assert bib.fields == expected.fields
+
+
+def test_field_index_same_as_record_lookups():
+    bib = Record()
+    bib.add_field(*make_fields(["001", "020", "245", "020", "650", "600", "650"]))
+    fields = FieldIndex(bib)
+
+    for tag in ("001", "020", "245", "650", "999"):
+        assert (tag in fields) == (tag in bib)
+        assert fields.get(tag) is bib.get(tag)
+        assert fields.get_fields(tag) == bib.get_fields(tag)
+    assert fields["020"] is bib["020"]
+    assert fields.get_fields("600", "650") == [
+        bib.fields[5],
+        bib.fields[4],
+        bib.fields[6],
+    ]
+
+
+def test_field_index_missing_tag():
+    fields = FieldIndex(Record())
+
+    assert "245" not in fields
+    assert fields.get("245") is None
+    assert fields.get_fields("245") == []
+    with pytest.raises(KeyError):
+        fields["245"]
+
+
+def test_field_index_get_fields_returns_copy():
+    bib = Record()
+    bib.add_field(*make_fields(["650", "650"]))
+    fields = FieldIndex(bib)
+    fields.get_fields("650").clear()
+
+    assert len(fields.get_fields("650")) == 2
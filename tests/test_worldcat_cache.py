@@ -0,0 +1,211 @@
+import threading
+
+from bookops_worldcat.errors import WorldcatRequestError
+import pytest
+import requests
+
+from src.worldcat_cache import CachedMetadataSession, CacheMiss, WorldcatCache
+
+
+class StubResponse:
+    def __init__(self, status_code=200, content=b"{}"):
+        self.status_code = status_code
+        self.content = content
+
+
+class StubMetadataSession:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.requests = []
+        self.closed = False
+
+    def _send(self, response):
+        # raises the same way as bookops_worldcat Query on 404
+        if response.status_code == 404:
+            try:
+                raise requests.HTTPError("404 Client Error", response=response)
+            except requests.HTTPError:
+                raise WorldcatRequestError("404 Client Error")
+        return response
+
+    def get_brief_bib(self, oclcNumber):
+        self.requests.append(("brief", oclcNumber))
+        return self._send(
+            StubResponse(self.status_code, f'{{"oclcNumber": "{oclcNumber}"}}'.encode())
+        )
+
+    def get_full_bib(self, oclcNumber):
+        self.requests.append(("full", oclcNumber))
+        return self._send(StubResponse(self.status_code, b"<record/>"))
+
+    def search_brief_bibs(self, q, **kwargs):
+        self.requests.append(("search", q))
+        return StubResponse(self.status_code, b'{"numberOfRecords": 0}')
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with WorldcatCache(str(tmp_path / "cache.db")) as cache:
+        yield cache
+
+
+def test_cache_get_missing(cache):
+    assert cache.get("brief", "1") is None
+    assert cache.misses == 1
+
+
+def test_cache_put_and_get(cache):
+    cache.put("brief", "1", StubResponse(200, b'{"oclcNumber": "1"}'))
+    response = cache.get("brief", "1")
+
+    assert response.status_code == 200
+    assert response.json() == {"oclcNumber": "1"}
+    assert cache.get("full", "1") is None
+    assert cache.hits == 1
+    assert cache.size == 19
+
+
+@pytest.mark.parametrize("arg", [429, 500, 503])
+def test_cache_put_not_cacheable_status(cache, arg):
+    cache.put("brief", "1", StubResponse(arg))
+    assert len(cache) == 0
+
+
+def test_cache_persists_between_runs(tmp_path):
+    fh = str(tmp_path / "cache.db")
+    with WorldcatCache(fh) as cache:
+        cache.put("full", "1", StubResponse(200, b"<record/>"))
+    with WorldcatCache(fh) as cache:
+        assert cache.get("full", "1").content == b"<record/>"
+        assert cache.size == 9
+
+
+def test_cache_ttl(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr("src.worldcat_cache.time.time", lambda: now)
+    with WorldcatCache(str(tmp_path / "cache.db"), ttl=60) as cache:
+        cache.put("brief", "1", StubResponse())
+        now += 59
+        assert cache.get("brief", "1") is not None
+        now += 2
+        cache.put("brief", "2", StubResponse())
+        assert cache.get("brief", "1") is None
+        assert cache.purge_expired() == 1
+        assert len(cache) == 1
+        assert cache.size == 2
+
+
+def test_cache_purges_expired_on_open(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr("src.worldcat_cache.time.time", lambda: now)
+    fh = str(tmp_path / "cache.db")
+    with WorldcatCache(fh, ttl=60) as cache:
+        cache.put("brief", "1", StubResponse())
+        now += 30
+        cache.put("brief", "2", StubResponse())
+    now += 31
+    with WorldcatCache(fh, ttl=60) as cache:
+        assert len(cache) == 1
+        assert cache.size == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr("src.worldcat_cache.time.time", lambda: now)
+    with WorldcatCache(str(tmp_path / "cache.db"), max_size=30) as cache:
+        for key in ("1", "2", "3"):
+            now += 1
+            cache.put("full", key, StubResponse(200, b"x" * 10))
+        now += 1
+        cache.get("full", "1")
+        now += 1
+        cache.put("full", "4", StubResponse(200, b"x" * 10))
+
+        assert cache.size == 30
+        assert cache.get("full", "2") is None
+        assert all(cache.get("full", key) for key in ("1", "3", "4"))
+
+
+def test_cache_shared_by_threads(cache):
+    def put(n):
+        for key in range(20):
+            cache.put("brief", f"{n}-{key}", StubResponse())
+            assert cache.get("brief", f"{n}-{key}") is not None
+
+    threads = [threading.Thread(target=put, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(cache) == 80
+    assert cache.size == 160
+
+
+def test_cached_session_requires_session_online(cache):
+    with pytest.raises(ValueError):
+        CachedMetadataSession(None, cache)
+
+
+def test_cached_session_sends_each_request_once(cache):
+    stub = StubMetadataSession()
+    session = CachedMetadataSession(stub, cache)
+    for _ in range(2):
+        assert session.get_brief_bib("1").content == b'{"oclcNumber": "1"}'
+        assert session.get_full_bib("1").content == b"<record/>"
+        session.search_brief_bibs(q="bn:9780000000000", limit=1)
+    session.search_brief_bibs(q="bn:9780000000000", limit=2)
+
+    assert stub.requests == [
+        ("brief", "1"),
+        ("full", "1"),
+        ("search", "bn:9780000000000"),
+        ("search", "bn:9780000000000"),
+    ]
+
+
+def test_cached_session_normalizes_oclc_numbers(cache):
+    stub = StubMetadataSession()
+    session = CachedMetadataSession(stub, cache)
+    for oclc_no in ("ocm00012345", "12345", "ocn000012345", 12345):
+        session.get_brief_bib(oclc_no)
+
+    assert stub.requests == [("brief", "ocm00012345")]
+
+
+def test_cached_session_caches_not_found(cache):
+    stub = StubMetadataSession(status_code=404)
+    session = CachedMetadataSession(stub, cache)
+    for _ in range(2):
+        with pytest.raises(WorldcatRequestError):
+            session.get_full_bib("1")
+
+    assert stub.requests == [("full", "1")]
+    assert cache.get("full", "1").status_code == 404
+
+
+def test_cached_session_does_not_cache_errors(cache):
+    stub = StubMetadataSession(status_code=503)
+    session = CachedMetadataSession(stub, cache)
+    session.get_brief_bib("1")
+    session.get_brief_bib("1")
+
+    assert len(stub.requests) == 2
+
+
+def test_cached_session_offline(cache):
+    cache.put("brief", "1", StubResponse(200, b'{"oclcNumber": "1"}'))
+    with CachedMetadataSession(None, cache, offline=True) as session:
+        assert session.get_brief_bib("1").json() == {"oclcNumber": "1"}
+        with pytest.raises(CacheMiss):
+            session.get_full_bib("1")
+
+
+def test_cached_session_close(cache):
+    stub = StubMetadataSession()
+    with CachedMetadataSession(stub, cache):
+        pass
+    assert stub.closed